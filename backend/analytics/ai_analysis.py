@@ -1,16 +1,23 @@
-from ragflow_sdk import RAGFlow
-from ragflow_sdk.modules.dataset import DataSet
+import hashlib
 import time
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Union, Optional
+from typing import Dict, List, Tuple, Union, Optional
 from dotenv import load_dotenv
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.general_config import DB_CONFIG, RAGFLOW_CONFIG, ANALYSIS_CONFIG, setup_logger
-from minio import Minio
-from config.db_connector import DBConnector
+from config.general_config import RAGFLOW_CONFIG, ANALYSIS_CONFIG, setup_logger
+from config.db_connector import DBPoolError, get_db_pool
+from config.schema import ensure_schema
+from utils.answer_stream import AnswerCheckpointer
+from utils.cache_warmer import warm_report_cache
+from utils.sheet_diff import summarize_changes
+from utils.snapshot import materialize_report
+from utils.storage import ensure_bucket, get_minio_client, upload_file
+from analytics.parse_poller import ParsePoller, parse_duration_stats
+from analytics.ragflow_registry import RagflowRegistry, get_registry
 
 
 
@@ -20,63 +27,329 @@ load_dotenv()
 logger = setup_logger(__name__)
 
 MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT")
-MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY")
-MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY")
 MINIO_BUCKET = os.getenv("MINIO_BUCKET", "excel-reports")
-MINIO_SECURE = os.getenv("MINIO_SECURE", "False").lower() == "true"
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER")
 RAGFLOW_API_KEY = os.getenv("RAGFLOW_API_KEY")
-# 初始化RAGFlow
-rag_object = RAGFlow(
-    api_key=os.getenv("RAGFLOW_API_KEY"), 
-    base_url=RAGFLOW_CONFIG["base_url"]
-)
-
-# 创建解析器配置
-parser_config = DataSet.ParserConfig(
-    rag_object, 
-    res_dict={"chunk_token_num": RAGFLOW_CONFIG["chunk_token_num"]}
-)
-
 # 数据集名称
 dataset_name = RAGFLOW_CONFIG["dataset_name"]
 
 # 保存Minio文件路径和分析内容到数据库
-def save_data_to_db(report_name, ai_description, minio_report_path):
+def save_data_to_db(report_name, ai_description, minio_report_path, file_hash=None):
     try:
-        # 创建数据库连接
-        db_connector = DBConnector(DB_CONFIG["mysql"])
-        db_connector._reconnect_if_needed()
-        if not db_connector.connection:
-            logger.error("数据库连接失败")
-            return False
-        logger.info("数据库连接成功")
-        cursor = db_connector.connection.cursor()
-        # 检查数据库中是否已经存在
-        check_sql = "SELECT id FROM ai_analysis WHERE report_name = %s"
-        cursor.execute(check_sql, (report_name,))
-        existing_record = cursor.fetchone()
-        
-        if existing_record:
-            # 如果存在更新数据
-            update_sql = "UPDATE ai_analysis SET ai_description = %s, minio_report_path = %s, update_time=NOW() WHERE report_name = %s"
-            cursor.execute(update_sql, (ai_description, minio_report_path, report_name))   
-            db_connector.connection.commit()
-            cursor.close()
-            logger.info(f"更新已存在的记录: {report_name}")
-            return True
-        else:
-            # 如果不存在就插入数据
-            insert_sql = "INSERT INTO ai_analysis (report_name, ai_description, minio_report_path, create_time, update_time) VALUES (%s, %s, %s, NOW(), NOW())"
-            cursor.execute(insert_sql, (report_name, ai_description, minio_report_path))
-            db_connector.connection.commit()
-            cursor.close()
-            logger.info(f"插入新记录: {report_name}")
-            return True
+        # 从连接池借出数据库连接
+        with get_db_pool().connection() as connection:
+            logger.info("数据库连接成功")
+            ensure_schema(connection)
+            cursor = connection.cursor()
+            # 检查数据库中是否已经存在
+            check_sql = "SELECT id FROM ai_analysis WHERE report_name = %s"
+            cursor.execute(check_sql, (report_name,))
+            existing_record = cursor.fetchone()
+            
+            if existing_record:
+                # 如果存在更新数据
+                update_sql = "UPDATE ai_analysis SET ai_description = %s, minio_report_path = %s, file_hash = %s, update_time=NOW() WHERE report_name = %s"
+                cursor.execute(update_sql, (ai_description, minio_report_path, file_hash, report_name))   
+                connection.commit()
+                cursor.close()
+                logger.info(f"更新已存在的记录: {report_name}")
+                return True
+            else:
+                # 如果不存在就插入数据
+                insert_sql = "INSERT INTO ai_analysis (report_name, ai_description, minio_report_path, file_hash, create_time, update_time) VALUES (%s, %s, %s, %s, NOW(), NOW())"
+                cursor.execute(insert_sql, (report_name, ai_description, minio_report_path, file_hash))
+                connection.commit()
+                cursor.close()
+                logger.info(f"插入新记录: {report_name}")
+                return True
+    except DBPoolError:
+        logger.error("数据库连接失败")
+        return False
     except Exception as e:
         logger.error(f"保存到数据库时出错: {e}")
         return False
+
+
+# 读取数据库中已保存的分析结果
+def get_stored_analysis(report_name) -> Optional[Dict]:
+    """
+    返回报告已保存的file_hash和ai_description，不存在或查询失败时返回None
+    """
+    try:
+        with get_db_pool().connection() as connection:
+            ensure_schema(connection)
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT file_hash, ai_description FROM ai_analysis WHERE report_name = %s", (report_name,))
+            row = cursor.fetchone()
+            cursor.close()
+            return row
+    except Exception as e:
+        logger.warning(f"读取已保存的分析结果失败: {e}")
+        return None
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """分块计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reuse_if_unchanged(file_name: str, file_hash: str, result: Dict) -> Tuple[bool, Optional[str]]:
+    """
+    文件内容与上次分析时一致，直接返回已保存的分析结果
+
+    返回:
+        (是否直接复用了已保存的结果, 数据库中保存的file_hash)
+    """
+    stored = get_stored_analysis(file_name)
+    stored_hash = stored.get("file_hash") if stored else None
+    if stored_hash == file_hash and stored.get("ai_description"):
+        logger.info(f"{file_name} 内容未变化，直接使用已保存的分析结果")
+        result["answer"] = stored["ai_description"]
+        result["success"] = True
+        result["skipped"] = True
+        return True, stored_hash
+    return False, stored_hash
+
+
+def _delete_stale_documents(dataset, docs, file_name: str):
+    """删除RAGFlow中内容已过期的同名文档"""
+    doc_ids = [doc.id for doc in docs]
+    if doc_ids:
+        dataset.delete_documents(ids=doc_ids)
+        logger.info(f"{file_name} 内容已变化，删除旧文档: {doc_ids}")
+
+
+def _record_timing(result, stage, start):
+    """记录某个阶段的耗时(秒)"""
+    result["timings"][stage] = round(time.monotonic() - start, 3)
+
+
+def new_result() -> Dict:
+    """单个报告的分析结果，各阶段把错误和耗时写入其中"""
+    return {
+        "success": False,
+        "answer": "",
+        "error": "",
+        "timings": {}
+    }
+
+
+def build_question(file_name: str, changes: Optional[str] = None) -> str:
+    """根据文件名自动生成提问，有上一期数据时附带变化摘要"""
+    file_name_without_ext = os.path.splitext(file_name)[0]
+    # 不同文件对应不同的提示词
+    question = f"帮我分析{file_name_without_ext}数据生成一份详细报告"
+    if changes:
+        question += f"\n\n与上一期相比的主要变化如下，请重点分析这些变化：\n{changes}"
+    return question
+
+
+def _minio_report_path(file_name: str) -> str:
+    return f"http://{MINIO_ENDPOINT}/{MINIO_BUCKET}/{file_name}"
+
+
+def _upload_to_minio(file_path: str, file_name: str, result: Dict) -> bool:
+    """
+    流式上传一份到Minio并从本地文件生成列式快照，失败时把错误写入result并返回False，
+    与上一版本相比的变化摘要写入result["changes"]
+    """
+    try:
+        minio_client = get_minio_client()
+        # 确保存储桶存在
+        ensure_bucket(MINIO_BUCKET)
+    except Exception as e:
+        logger.error(f"Minio客户端初始化失败: {str(e)}")
+        result["error"] = f"Minio客户端初始化失败: {str(e)}"
+        return False
+    
+    try:
+        upload_result = upload_file(minio_client, MINIO_BUCKET, file_name, file_path)
+        logger.info(f"文件 {file_name} 已成功上传到 MinIO 路径: {_minio_report_path(file_name)}")
+    except Exception as upload_error:
+        logger.error(f"上传文件到Minio失败: {str(upload_error)}")
+        result["error"] = f"上传文件到Minio失败: {str(upload_error)}"
+        return False
+    
+    # 生成列式快照，供可视化接口直接读取；只有变化的工作表会重新写入
+    changes = materialize_report(minio_client, MINIO_BUCKET, file_name, file_path, upload_result.etag)
+    summary = summarize_changes(changes)
+    if summary:
+        logger.info(f"{file_name} 与上一版本相比的变化:\n{summary}")
+        result["changes"] = summary
+    return True
+
+
+def upload_report(dataset, file_path: str, result: Dict) -> Optional[Dict]:
+    """
+    上传阶段：文件未变化时直接复用已保存的结果，内容变化时替换RAGFlow中的旧文档，
+    新文件先上传到Minio并生成快照，再上传到RAGFlow；失败时把错误写入result
+
+    返回:
+        {"file_hash", "document_id"}，已复用结果(result["skipped"])或失败时返回None
+    """
+    if not os.path.exists(file_path):
+        result["error"] = f"文件不存在: {file_path}"
+        return None
+    
+    stage_start = time.monotonic()
+    file_name = os.path.basename(file_path)
+    file_hash = file_sha256(file_path)
+    unchanged, stored_hash = _reuse_if_unchanged(file_name, file_hash, result)
+    if unchanged:
+        return None
+    
+    existing_docs = [doc for doc in dataset.list_documents(keywords=file_name) if doc.name == file_name]
+    # 内容变化时替换RAGFlow中的旧文档
+    if existing_docs and stored_hash != file_hash:
+        _delete_stale_documents(dataset, existing_docs, file_name)
+        existing_docs = []
     
+    if existing_docs:
+        document_id = existing_docs[0].id
+    else:
+        # 先上传一份到Minio，将Minio的文件路径保存到数据库
+        if not _upload_to_minio(file_path, file_name, result):
+            return None
+        # RAGFlow SDK只接受完整内容，上传时才读取文件
+        uploaded = dataset.upload_documents([{"display_name": file_name, "blob": Path(file_path).read_bytes()}])
+        if not uploaded:
+            result["error"] = "未找到已上传的文档"
+            return None
+        document_id = uploaded[0].id
+    _record_timing(result, "upload", stage_start)
+    return {"file_hash": file_hash, "document_id": document_id}
+
+
+def start_parsing(dataset, document_id: str, result: Dict) -> Optional[bool]:
+    """
+    文档尚未解析时触发解析
+
+    返回:
+        是否触发了解析，文档不存在时把错误写入result并返回None
+    """
+    docs = dataset.list_documents(id=document_id)
+    if not docs:
+        result["error"] = f"RAGFlow文档不存在: {document_id}"
+        return None
+    if getattr(docs[0], 'run', None) == "DONE":
+        return False
+    dataset.async_parse_documents([document_id])
+    return True
+
+
+def wait_until_parsed(dataset, document_id: str, result: Dict,
+                      max_wait_time: int = ANALYSIS_CONFIG["max_wait_time"]) -> bool:
+    """等待文档解析完成，解析失败、被取消或超时时把错误写入result并返回False"""
+    poller = ParsePoller(dataset, max_wait_time=max_wait_time)
+    poller.track([document_id])
+    for _, run_status in poller.iter_results():
+        if run_status == "DONE":
+            logger.info("✅ 文档解析已完成! 开始生成分析报告...")
+        elif run_status == "FAIL":
+            result["error"] = f"文档解析错误: {run_status}"
+            logger.info("❌ 文档解析失败!")
+        elif run_status == "CANCEL":
+            result["error"] = f"文档解析被取消: {run_status}"
+            logger.info("⚠️ 文档解析被取消!")
+        else:
+            result["error"] = "文档解析超时，可能无法提供准确答案"
+        return run_status == "DONE"
+    return True
+
+
+def answer_and_save(registry: RagflowRegistry, dataset, file_name: str, question: str,
+                    save_to_db: bool, result: Dict, file_hash: Optional[str] = None) -> Dict:
+    """
+    查找或创建助手，获取回答并保存到数据库
+    """
+    stage_start = time.monotonic()
+    # 查找或创建助手
+    assistant = registry.get_assistant(f"{file_name}", dataset.id)
+    
+    # 为每个文件创建独立的会话名称
+    file_name_without_ext = os.path.splitext(file_name)[0]
+    unique_session_name = f"数据分析_{file_name_without_ext}_{int(time.time())}"
+    logger.info(f"创建新会话: {unique_session_name}")
+    
+    # 创建新会话
+    session = assistant.create_session(unique_session_name)
+    logger.info("创建会话成功")
+    
+    # 获取助手回答
+    print(f"\n================ 正在生成 {file_name} 的分析报告 ================\n", flush=True)
+    print(f"问题: {question}\n", flush=True)
+    print("正在思考中...", flush=True)
+    
+    # 生成过程分批写入数据库，中断时不丢失已生成的内容，前端也可以实时查看
+    checkpointer = AnswerCheckpointer(file_name)
+    checkpointer.start()
+    answer_content = ""
+    try:
+        # 流式输出回答，每个分片的content是截至目前的完整回答，只处理新增部分
+        for ans in session.ask(question, stream=True):
+            new_content = ans.content[len(answer_content):]
+            answer_content = ans.content
+            if new_content:
+                print(new_content, end='', flush=True)
+                checkpointer.append(new_content)
+        checkpointer.flush()
+        _record_timing(result, "answer", stage_start)
+        
+        print("\n\n================ 分析报告生成完成 ================\n", flush=True)
+        
+        # 检查回答内容是否为空
+        if not answer_content:
+            logger.warning("警告: 助手返回的回答内容为空")
+            result["error"] = "助手返回的回答内容为空"
+            checkpointer.fail(result["error"])
+            return result
+        
+        # 将回答内容插入数据库
+        if save_to_db:
+            stage_start = time.monotonic()
+            db_error = None
+            try:
+                logger.info(f"开始保存{file_name}的分析结果到数据库")
+                if save_data_to_db(file_name, answer_content, _minio_report_path(file_name), file_hash):
+                    logger.info(f"✅ {file_name}的分析结果和Minio路径已成功保存到数据库")
+                else:
+                    db_error = f"无法保存{file_name}的分析结果和Minio路径到数据库"
+            except Exception as e:
+                db_error = f"数据库操作失败: {str(e)}"
+            _record_timing(result, "save", stage_start)
+            
+            # 回答没有保存时视为失败，任务队列据此重试，不会把任务标记为完成
+            if db_error:
+                logger.error(db_error)
+                result["answer"] = answer_content
+                result["error"] = db_error
+                checkpointer.fail(db_error)
+                return result
+            
+            # 报告已可访问，预热API服务的缓存，首次打开无需冷加载
+            stage_start = time.monotonic()
+            warm_report_cache([file_name])
+            _record_timing(result, "warm", stage_start)
+        checkpointer.finish()
+        
+        # 设置成功结果
+        result["answer"] = answer_content
+        result["success"] = True
+        return result
+        
+    except Exception as e:
+        error_msg = f"获取助手回答失败: {str(e)}"
+        logger.error(error_msg)
+        msg = f"❌ {error_msg}"
+        logger.info(msg)
+        result["error"] = error_msg
+        checkpointer.fail(error_msg)
+        return result
+
 
 def ai_analysis(
     file_path: str = UPLOAD_FOLDER,
@@ -102,243 +375,45 @@ def ai_analysis(
         save_to_db: 是否将结果保存到数据库
         
     返回:
-        包含回答内容和状态的字典
+        包含回答内容、状态和各阶段耗时的字典
     """
-    result = {
-        "success": False,
-        "answer": "",
-        "error": ""
-    }
+    result = new_result()
         
     try:
-        # 初始化RAGFlow对象
-        rag_object = RAGFlow(api_key=api_key, base_url=base_url)
-        
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            result["error"] = f"文件不存在: {file_path}"
-            return result
-        
-        # 创建解析器配置
-        parser_config = DataSet.ParserConfig(
-            rag_object, 
-            res_dict={"chunk_token_num": RAGFLOW_CONFIG["chunk_token_num"]}
-        )
+        # 获取共享的RAGFlow句柄
+        registry = get_registry(api_key, base_url, dataset_name)
         
         file_name = os.path.basename(file_path)
         
         # 如果没有提供问题，则根据文件名自动生成
-        if question is None:
-            # 解析文件名和扩展名
-            file_extension = os.path.splitext(file_name)[1].lower()
-            file_name_without_ext = os.path.splitext(file_name)[0]
-            # 不同文件对应不同的提示词
-            question = f"帮我分析{file_name_without_ext}数据生成一份详细报告"
+        auto_question = question is None
+        if auto_question:
+            question = build_question(file_name)
         
         logger.info(f"处理文件: {file_name}, 将使用提问: {question}")
         
         # 创建或获取数据集
         try:
-            # 先尝试获取同名数据集
-            owned_datasets = rag_object.list_datasets()
-            dataset_exists = False
-            dataset = None
-            
-            # 检查是否存在同名数据集
-            if owned_datasets:
-                for ds in owned_datasets:
-                    if hasattr(ds, 'name') and ds.name == dataset_name:
-                        dataset_exists = True
-                        dataset = ds
-                        break
-            
-            # 如果不存在则创建新数据集
-            if not dataset_exists:
-                dataset = rag_object.create_dataset(
-                    name=dataset_name,
-                    avatar="",
-                    description="周报数据集",
-                    embedding_model=RAGFLOW_CONFIG["embedding_model"],
-                    permission="me",
-                    chunk_method="naive",
-                    parser_config=parser_config
-                )
-            # 检查该文件是否已存在于数据集中
-            existing_docs = dataset.list_documents(keywords=file_name)
-            if not existing_docs:
-                # 读取文件内容
-                with open(file_path, "rb") as f:
-                    file_content = f.read()
-                    # 先上传一份到Minio，将Minio的文件路径保存到数据库
-                    try:
-                        minio_client = Minio(
-                             MINIO_ENDPOINT,
-                             access_key=MINIO_ACCESS_KEY,
-                             secret_key=MINIO_SECRET_KEY,
-                             secure=MINIO_SECURE
-                        )
-                         
-                        # 确保存储桶存在
-                        if not minio_client.bucket_exists(MINIO_BUCKET):
-                            minio_client.make_bucket(MINIO_BUCKET)
-                            logger.info(f"创建Minio存储桶: {MINIO_BUCKET}")
-
-                            logger.info(f"Minio客户端初始化成功，连接到: {MINIO_ENDPOINT}")
-                        
-                        try:
-                            minio_report_path = f"http://{MINIO_ENDPOINT}/{MINIO_BUCKET}/{file_name}"
-                            minio_client.fput_object(
-                                MINIO_BUCKET, 
-                                file_name, 
-                                f"{UPLOAD_FOLDER}\\{file_name}",
-                            )
-                            logger.info(f"文件 {file_name} 已成功上传到 MinIO 路径: {minio_report_path}")
-                        except Exception as upload_error:
-                            logger.error(f"上传文件到Minio失败: {str(upload_error)}")
-                            result["error"] = f"上传文件到Minio失败: {str(upload_error)}"
-                            return result
-                    except Exception as e:
-                        logger.error(f"Minio客户端初始化失败: {str(e)}")
-                        result["error"] = f"Minio客户端初始化失败: {str(e)}"
-                        return result
-                    # 上传文档
-                    dataset.upload_documents([{"display_name": file_name, "blob": file_content}])
-                
-                # 获取上传的文档ID
-                doc_list = dataset.list_documents(keywords=file_name)
-                document_ids = [doc.id for doc in doc_list]
-            else:
-                document_ids = [doc.id for doc in existing_docs]
-            
-            if not document_ids:
-                result["error"] = "未找到已上传的文档"
+            dataset = registry.get_dataset()
+            # 文件内容没有变化时直接复用上次的分析结果，否则上传
+            uploaded = upload_report(dataset, file_path, result)
+            if uploaded is None:
                 return result
-                
-            # 检查文档是否已经解析过
-            doc_status = dataset.list_documents(id=document_ids[0])
-            
-            if doc_status and len(doc_status) > 0:
-                run_status = getattr(doc_status[0], 'run', None)
-                if run_status != "DONE":
-                    # 解析文档
-                    dataset.async_parse_documents(document_ids)
-                    
-                    if wait_for_parsing:
-                        # 等待解析完成
-                        wait_interval = ANALYSIS_CONFIG["wait_interval"]
-                        parsing_done = False
-                        
-                        for i in range(int(max_wait_time / wait_interval)):
-                            # 检查解析状态
-                            doc_status = dataset.list_documents(id=document_ids[0])
-                            
-                            if doc_status and len(doc_status) > 0:
-                                run_status = getattr(doc_status[0], 'run', None)
-                                logger.info(f"文档处理状态: {run_status}")
-                                print(f"文档处理进度: {run_status} ({i+1}/{int(max_wait_time / wait_interval)})", flush=True)
-                                
-                                if run_status == "DONE":
-                                    parsing_done = True
-                                    msg = f"✅ 文档解析已完成! 开始生成分析报告..."
-                                    logger.info(msg)
-                                    break
-                                elif run_status == "FAIL":
-                                    result["error"] = f"文档解析错误: {run_status}"
-                                    msg = f"❌ 文档解析失败! 将尝试继续处理..."
-                                    logger.info(msg)
-                                    return result
-                                elif run_status == "CANCEL": 
-                                    result["error"] = f"文档解析被取消: {run_status}"
-                                    msg = f"⚠️ 文档解析被取消! 将尝试继续处理..."
-                                    logger.info(msg)
-                                    return result
-                            time.sleep(wait_interval)
-                        
-                        if not parsing_done:
-                            result["error"] = "文档解析超时，可能无法提供准确答案"
-                            return result
-            
-            
-            owned_assistants = rag_object.list_chats()
-            assistant = None
-            assistant_name = f"{file_name}"
-            
-            # 查找或创建助手
-            for asst in owned_assistants:
-                if hasattr(asst, 'name') and asst.name == assistant_name:
-                    assistant = asst
-                    logger.info(f"找到已存在的助手: {assistant_name}")
-                    break
-            
-            if not assistant:
-                logger.info(f"创建新助手: {assistant_name}")
-                assistant = rag_object.create_chat(assistant_name, dataset_ids=[dataset.id])
-                logger.info(f"创建助手成功")
-            
-            # 为每个文件创建独立的会话名称
-            file_name_without_ext = os.path.splitext(file_name)[0]
-            unique_session_name = f"数据分析_{file_name_without_ext}_{int(time.time())}"
-            logger.info(f"创建新会话: {unique_session_name}")
-            
-            # 创建新会话
-            session = assistant.create_session(unique_session_name)
-            logger.info(f"创建会话成功")
+            if auto_question and result.get("changes"):
+                question = build_question(file_name, result["changes"])
             
-            # 获取助手回答
-            print(f"\n================ 正在生成 {file_name} 的分析报告 ================\n", flush=True)
-            print(f"问题: {question}\n", flush=True)
-            print("正在思考中...", flush=True)
-            
-            answer_content = ""
-            try:
-                # 流式输出回答
-                cont = ""
-                for ans in session.ask(question, stream=True):
-                    new_content = ans.content[len(cont):]
-                    print(new_content, end='', flush=True)
-                    cont = ans.content
-                
-                # 保存完整回答
-                answer_content = cont
-                
-                print("\n\n================ 分析报告生成完成 ================\n", flush=True)
-                
-                # 检查回答内容是否为空
-                if not answer_content:
-                    logger.warning("警告: 助手返回的回答内容为空")
-                    result["error"] = "助手返回的回答内容为空"
-                    return result
-                
-                # 将回答内容插入数据库
-                if save_to_db:
-                    try:
-                        logger.info(f"开始保存{file_name}的分析结果到数据库")
-                        db_success = save_data_to_db(file_name, answer_content, minio_report_path)
-                        if db_success:
-                            logger.info(f"{file_name}的分析结果已成功保存到数据库")
-                            msg = f"✅ {file_name}的分析结果和Minio路径已成功保存到数据库"
-                            logger.info(msg)
-                        else:
-                            logger.warning(f"无法保存{file_name}的分析结果和Minio路径到数据库")
-                            msg = f"\n⚠️ 无法保存{file_name}的分析结果和Minio路径到数据库"
-                            logger.info(msg)
-                    except Exception as e:
-                        logger.error(f"数据库操作失败: {str(e)}")
-                        msg = f"❌ 数据库操作失败: {str(e)}"
-                        logger.info(msg)
-                
-                # 设置成功结果
-                result["answer"] = answer_content
-                result["success"] = True
-                return result
-                
-            except Exception as e:
-                error_msg = f"获取助手回答失败: {str(e)}"
-                logger.error(error_msg)
-                msg = f"❌ {error_msg}"
-                logger.info(msg)
-                result["error"] = error_msg
+            # 检查文档是否已经解析过
+            stage_start = time.monotonic()
+            parsing = start_parsing(dataset, uploaded["document_id"], result)
+            if parsing is None:
                 return result
+            if parsing and wait_for_parsing:
+                if not wait_until_parsed(dataset, uploaded["document_id"], result, max_wait_time):
+                    return result
+            _record_timing(result, "parse", stage_start)
+            
+            return answer_and_save(registry, dataset, file_name, question, save_to_db, result,
+                                   uploaded["file_hash"])
             
         except Exception as e:
             result["error"] = f"处理数据集或会话时出错: {str(e)}"
@@ -351,6 +426,170 @@ def ai_analysis(
         return result
 
 
+def ai_analysis_batch(
+    file_paths: List[str],
+    api_key: str = RAGFLOW_API_KEY,
+    base_url: str = RAGFLOW_CONFIG["base_url"],
+    dataset_name: str = RAGFLOW_CONFIG["dataset_name"],
+    max_wait_time: int = ANALYSIS_CONFIG["max_wait_time"],
+    max_workers: int = ANALYSIS_CONFIG["max_workers"],
+    save_to_db: bool = True
+) -> Dict[str, Dict]:
+    """
+    批量获取RAGFlow对多个报告的数据分析回答
+    
+    所有新文件通过一次upload_documents上传并一次触发解析，
+    之后统一轮询解析状态，每个文档解析完成后立即开始提问
+    
+    参数:
+        file_paths: 文件路径列表
+        max_workers: 同时提问的最大文档数
+        其余参数同ai_analysis
+        
+    返回:
+        文件路径到分析结果的字典，每个结果的格式同ai_analysis
+    """
+    results = {file_path: new_result() for file_path in file_paths}
+    
+    try:
+        registry = get_registry(api_key, base_url, dataset_name)
+        dataset = registry.get_dataset()
+    except Exception as e:
+        for result in results.values():
+            result["error"] = f"处理数据集或会话时出错: {str(e)}"
+        logger.error(f"处理数据集或会话时出错: {str(e)}")
+        return results
+    
+    # 检查文件是否存在，并找出数据集中已有的文档
+    stage_start = time.monotonic()
+    pending = {}  # 文件路径 -> (当前file_hash, 数据库中的file_hash)
+    claimed = {}  # 报告名 -> 文件路径，报告在Minio、数据库和RAGFlow中都以文件名标识
+    for file_path in file_paths:
+        if not os.path.exists(file_path):
+            results[file_path]["error"] = f"文件不存在: {file_path}"
+            continue
+        file_name = os.path.basename(file_path)
+        # 不同目录下的同名文件会覆盖同一份报告，只处理第一个并把其余的记为失败
+        if file_name in claimed:
+            results[file_path]["error"] = f"与 {claimed[file_name]} 的报告名相同，未处理"
+            logger.error(f"{file_path} 与 {claimed[file_name]} 的报告名相同，跳过")
+            continue
+        claimed[file_name] = file_path
+        # 文件内容没有变化时直接复用上次的分析结果
+        file_hash = file_sha256(file_path)
+        unchanged, stored_hash = _reuse_if_unchanged(file_name, file_hash, results[file_path])
+        if unchanged:
+            continue
+        pending[file_path] = (file_hash, stored_hash)
+    
+    try:
+        # 只按文件名查询需要的文档，不遍历整个数据集
+        existing_docs = {}  # 文件路径 -> 文档
+        stale_docs = []
+        for file_path, (file_hash, stored_hash) in pending.items():
+            file_name = os.path.basename(file_path)
+            docs = [doc for doc in dataset.list_documents(keywords=file_name) if doc.name == file_name]
+            # 内容变化时替换RAGFlow中的旧文档
+            if docs and file_hash != stored_hash:
+                stale_docs.extend(docs)
+            elif docs:
+                existing_docs[file_path] = docs[0]
+        
+        if stale_docs:
+            _delete_stale_documents(dataset, stale_docs, ", ".join(sorted({doc.name for doc in stale_docs})))
+        
+        # 新文件先上传到Minio，再一次性上传到RAGFlow
+        new_documents = []
+        for file_path in pending:
+            if file_path in existing_docs:
+                continue
+            file_name = os.path.basename(file_path)
+            if not _upload_to_minio(file_path, file_name, results[file_path]):
+                continue
+            new_documents.append({"display_name": file_name, "blob": Path(file_path).read_bytes()})
+        
+        if new_documents:
+            uploaded = dataset.upload_documents(new_documents)
+            for doc in uploaded or []:
+                if doc.name in claimed:
+                    existing_docs[claimed[doc.name]] = doc
+            logger.info(f"批量上传 {len(new_documents)} 个文档")
+    except Exception as e:
+        for file_path in pending:
+            results[file_path]["error"] = f"处理数据集或会话时出错: {str(e)}"
+        logger.error(f"批量上传文档时出错: {str(e)}")
+        return results
+    
+    # 文档ID -> 文件路径 / 当前解析状态
+    doc_files = {}
+    doc_runs = {}
+    for file_path in pending:
+        if results[file_path]["error"]:
+            continue
+        doc = existing_docs.get(file_path)
+        if doc is None:
+            results[file_path]["error"] = "未找到已上传的文档"
+            continue
+        doc_files[doc.id] = file_path
+        doc_runs[doc.id] = getattr(doc, 'run', None)
+        _record_timing(results[file_path], "upload", stage_start)
+    
+    # 一次性触发所有未解析文档的解析
+    stage_start = time.monotonic()
+    ready = [doc_id for doc_id in doc_files if doc_runs[doc_id] == "DONE"]
+    to_parse = [doc_id for doc_id in doc_files if doc_runs[doc_id] != "DONE"]
+    if to_parse:
+        try:
+            dataset.async_parse_documents(to_parse)
+            logger.info(f"批量触发 {len(to_parse)} 个文档的解析")
+        except Exception as e:
+            for doc_id in to_parse:
+                results[doc_files[doc_id]]["error"] = f"处理数据集或会话时出错: {str(e)}"
+            logger.error(f"批量解析文档时出错: {str(e)}")
+            to_parse = []
+    
+    def answer(doc_id):
+        file_path = doc_files[doc_id]
+        file_name = os.path.basename(file_path)
+        try:
+            question = build_question(file_name, results[file_path].get("changes"))
+            return answer_and_save(registry, dataset, file_name, question,
+                                   save_to_db, results[file_path], pending[file_path][0])
+        except Exception as e:
+            results[file_path]["error"] = f"处理数据集或会话时出错: {str(e)}"
+            logger.error(f"处理 {file_name} 时出错: {str(e)}")
+            return results[file_path]
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="answer") as executor:
+        futures = []
+        # 已解析完成的文档直接开始提问
+        for doc_id in ready:
+            _record_timing(results[doc_files[doc_id]], "parse", stage_start)
+            futures.append(executor.submit(answer, doc_id))
+        
+        # 统一轮询剩余文档的解析状态，解析完成一个就提问一个
+        poller = ParsePoller(dataset, max_wait_time=max_wait_time)
+        poller.track(to_parse)
+        for doc_id, run_status in poller.iter_results():
+            file_path = doc_files[doc_id]
+            if run_status == "DONE":
+                logger.info(f"✅ {os.path.basename(file_path)} 文档解析已完成! 开始生成分析报告...")
+                _record_timing(results[file_path], "parse", stage_start)
+                futures.append(executor.submit(answer, doc_id))
+            elif run_status == "FAIL":
+                results[file_path]["error"] = f"文档解析错误: {run_status}"
+            elif run_status == "CANCEL":
+                results[file_path]["error"] = f"文档解析被取消: {run_status}"
+            else:
+                results[file_path]["error"] = "文档解析超时，可能无法提供准确答案"
+        logger.info(f"解析耗时统计: {parse_duration_stats()}")
+        
+        for future in futures:
+            future.result()
+    
+    return results
+
+
 def main():
     result = ai_analysis(file_path=UPLOAD_FOLDER, save_to_db=True)
     print(result)
@@ -0,0 +1,171 @@
+"""
+分析任务的工作进程
+
+    python analytics/job_worker.py --workers 2
+
+每个进程循环领取 analysis_jobs 中的任务，按阶段执行并记录进度：
+queued -> uploaded -> parsing -> parsed -> answering -> saved。
+进程中断后租约到期，其他进程从最后完成的阶段继续，不会重复上传和解析。
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+from typing import Any, Dict, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.general_config import JOB_CONFIG, RAGFLOW_CONFIG, setup_logger
+from analytics.ai_analysis import (RAGFLOW_API_KEY, answer_and_save, build_question, new_result, start_parsing,
+                                   upload_report, wait_until_parsed)
+from analytics.ragflow_registry import get_registry
+from utils.cache_warmer import warm_report_cache
+from utils.job_queue import (STAGE_ANSWERING, STAGE_PARSED, STAGE_PARSING, STAGE_QUEUED, STAGE_UPLOADED,
+                             advance_stage, claim_job, complete_job, fail_job, renew_lease)
+
+logger = setup_logger(__name__)
+
+
+class JobError(Exception):
+    """任务执行失败，记录原因后按剩余次数重试"""
+
+
+class LeaseLost(Exception):
+    """租约已被其他进程接手，当前进程放弃该任务"""
+
+
+class LeaseKeeper(threading.Thread):
+    """执行任务期间定期续约"""
+
+    def __init__(self, job_id: int, worker_id: str,
+                 interval: float = JOB_CONFIG["heartbeat_interval"],
+                 lease_seconds: int = JOB_CONFIG["lease_seconds"]):
+        super().__init__(name=f"lease-{job_id}", daemon=True)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                if not renew_lease(self.job_id, self.worker_id, self.lease_seconds):
+                    logger.warning(f"任务 {self.job_id} 的租约已失效")
+                    self.lost = True
+                    return
+            except Exception as e:
+                # 数据库暂时不可用时继续尝试，租约到期前恢复即可
+                logger.warning(f"任务 {self.job_id} 续约失败: {str(e)}")
+
+    def stop(self):
+        self._stopped.set()
+
+
+def _advance(job: Dict[str, Any], worker_id: str, keeper: LeaseKeeper, stage: str, **fields):
+    if keeper.lost or not advance_stage(job["id"], worker_id, stage, **fields):
+        raise LeaseLost(f"任务 {job['id']} 已被其他进程接手")
+    job.update(stage=stage, **fields)
+
+
+def run_job(job: Dict[str, Any], worker_id: str, keeper: LeaseKeeper) -> Dict:
+    """从任务最后完成的阶段继续执行，返回分析结果"""
+    result = new_result()
+    registry = get_registry(RAGFLOW_API_KEY, RAGFLOW_CONFIG["base_url"], RAGFLOW_CONFIG["dataset_name"])
+    dataset = registry.get_dataset()
+
+    if job["stage"] == STAGE_QUEUED:
+        fields = upload_report(dataset, job["file_path"], result)
+        if result.get("skipped"):
+            # 未变化的报告同样预热，API服务首次打开无需冷加载
+            warm_report_cache([job["report_name"]])
+            return result
+        if fields is None:
+            raise JobError(result["error"])
+        _advance(job, worker_id, keeper, STAGE_UPLOADED,
+                 question=build_question(job["report_name"], result.get("changes")), **fields)
+
+    if job["stage"] == STAGE_UPLOADED:
+        if start_parsing(dataset, job["document_id"], result) is None:
+            raise JobError(result["error"])
+        _advance(job, worker_id, keeper, STAGE_PARSING)
+
+    if job["stage"] == STAGE_PARSING:
+        if not wait_until_parsed(dataset, job["document_id"], result):
+            raise JobError(result["error"])
+        _advance(job, worker_id, keeper, STAGE_PARSED)
+
+    # 回答无法从中途继续，中断后重新提问，上一轮已生成的部分内容会被清空
+    if job["stage"] in (STAGE_PARSED, STAGE_ANSWERING):
+        _advance(job, worker_id, keeper, STAGE_ANSWERING)
+        question = job.get("question") or build_question(job["report_name"])
+        answer_and_save(registry, dataset, job["report_name"], question, True, result, job.get("file_hash"))
+        if not result["success"]:
+            raise JobError(result["error"])
+    return result
+
+
+def process_job(job: Dict[str, Any], worker_id: str):
+    """执行单个任务并记录结果"""
+    keeper = LeaseKeeper(job["id"], worker_id)
+    keeper.start()
+    try:
+        result = run_job(job, worker_id, keeper)
+        if keeper.lost or not complete_job(job["id"], worker_id):
+            raise LeaseLost(f"任务 {job['id']} 已被其他进程接手")
+        logger.info(f"任务 {job['id']} 完成: {job['report_name']} {result.get('timings')}")
+    except LeaseLost as e:
+        logger.warning(str(e))
+    except Exception as e:
+        logger.error(f"任务 {job['id']} 执行失败: {str(e)}")
+        try:
+            fail_job(job["id"], worker_id, str(e))
+        except Exception as db_error:
+            # 无法记录时等租约到期后由其他进程重试
+            logger.error(f"记录任务 {job['id']} 失败状态时出错: {str(db_error)}")
+    finally:
+        keeper.stop()
+
+
+def run_worker(worker_id: Optional[str] = None, poll_interval: float = JOB_CONFIG["poll_interval"],
+               stop_event: Optional[threading.Event] = None):
+    """循环领取并执行任务"""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    stop_event = stop_event or threading.Event()
+    logger.info(f"工作进程 {worker_id} 已启动")
+    while not stop_event.is_set():
+        try:
+            job = claim_job(worker_id)
+        except Exception as e:
+            logger.error(f"领取任务失败: {str(e)}")
+            job = None
+        if job is None:
+            stop_event.wait(poll_interval)
+            continue
+        process_job(job, worker_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析任务工作进程")
+    parser.add_argument("--workers", type=int, default=JOB_CONFIG["workers"], help="工作进程数")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        run_worker()
+        return
+
+    processes = [multiprocessing.Process(target=run_worker, name=f"job-worker-{i}") for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
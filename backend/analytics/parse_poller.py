@@ -0,0 +1,232 @@
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.general_config import ANALYSIS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 解析结束的状态
+FINAL_STATUSES = ("DONE", "FAIL", "CANCEL")
+
+
+class WaitStrategy(ABC):
+    """
+    解析状态轮询的等待策略，根据已轮询次数和解析进度给出下一次等待时间
+    """
+
+    @abstractmethod
+    def next_interval(self, attempt: int, history: List[Tuple[float, float]]) -> float:
+        """
+        参数:
+            attempt: 已轮询次数，从0开始
+            history: 该文档的 (时间, 进度) 记录，进度取值0~1
+
+        返回:
+            下一次轮询前等待的秒数
+        """
+
+
+class FixedInterval(WaitStrategy):
+    """固定间隔轮询"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+
+    def next_interval(self, attempt, history):
+        return self.interval
+
+
+class ExponentialBackoff(WaitStrategy):
+    """指数退避，带随机抖动，避免多个文档同时轮询"""
+
+    def __init__(self, min_interval: float, max_interval: float,
+                 multiplier: float = 1.5, jitter: float = 0.2):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.multiplier = multiplier
+        self.jitter = jitter
+
+    def next_interval(self, attempt, history):
+        interval = min(self.max_interval, self.min_interval * (self.multiplier ** attempt))
+        return _apply_jitter(interval, self.jitter, self.min_interval, self.max_interval)
+
+
+class ProgressAware(WaitStrategy):
+    """
+    根据RAGFlow返回的解析进度估算剩余时间，没有进度信息时退化为指数退避
+    """
+
+    def __init__(self, min_interval: float, max_interval: float,
+                 multiplier: float = 1.5, jitter: float = 0.2):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.fallback = ExponentialBackoff(min_interval, max_interval, multiplier, jitter)
+
+    def next_interval(self, attempt, history):
+        if len(history) >= 2:
+            (start_time, start_progress), (last_time, last_progress) = history[0], history[-1]
+            elapsed = last_time - start_time
+            advanced = last_progress - start_progress
+            if elapsed > 0 and advanced > 0:
+                # 按当前速度估算剩余时间，在预计完成时再查询
+                remaining = (1 - last_progress) * elapsed / advanced
+                return _apply_jitter(remaining, self.jitter, self.min_interval, self.max_interval)
+        return self.fallback.next_interval(attempt, history)
+
+
+def _apply_jitter(interval: float, jitter: float, low: float, high: float) -> float:
+    if jitter:
+        interval *= 1 + random.uniform(-jitter, jitter)
+    return max(low, min(high, interval))
+
+
+def build_wait_strategy(config: Dict = ANALYSIS_CONFIG) -> WaitStrategy:
+    """根据配置创建等待策略"""
+    name = config.get("wait_strategy", "fixed")
+    if name == "backoff":
+        return ExponentialBackoff(config["min_wait_interval"], config["max_wait_interval"],
+                                  config["backoff_multiplier"], config["wait_jitter"])
+    if name == "progress":
+        return ProgressAware(config["min_wait_interval"], config["max_wait_interval"],
+                             config["backoff_multiplier"], config["wait_jitter"])
+    return FixedInterval(config["wait_interval"])
+
+
+class _TrackedDocument:
+    def __init__(self, doc_id: str):
+        self.doc_id = doc_id
+        self.started = time.monotonic()
+        self.attempt = 0
+        self.history: List[Tuple[float, float]] = []
+        self.next_poll = self.started
+
+
+# 进程内记录的解析耗时，用于调整等待参数
+_parse_durations: List[float] = []
+_durations_lock = threading.Lock()
+
+
+def record_parse_duration(doc_id: str, seconds: float, polls: int):
+    """记录一个文档从开始等待到解析完成的耗时"""
+    with _durations_lock:
+        _parse_durations.append(seconds)
+    logger.info(f"文档 {doc_id} 解析完成耗时: {seconds:.1f}秒，轮询 {polls} 次")
+
+
+def parse_duration_stats() -> Dict[str, float]:
+    """返回已记录的解析耗时统计"""
+    with _durations_lock:
+        durations = list(_parse_durations)
+    if not durations:
+        return {"count": 0}
+    durations.sort()
+    return {
+        "count": len(durations),
+        "mean": round(statistics.mean(durations), 2),
+        "p50": round(durations[len(durations) // 2], 2),
+        "p90": round(durations[min(len(durations) - 1, int(len(durations) * 0.9))], 2),
+        "max": round(durations[-1], 2),
+    }
+
+
+def list_documents_by_ids(dataset, document_ids: Iterable[str], page_size: int = 100) -> Dict:
+    """
+    取回多个文档的状态：先按创建时间倒序读取一页（刚上传的文档都在其中），
+    不在这一页的文档再按ID单独查询，请求数只与文档数有关，与数据集大小无关
+
+    返回:
+        文档ID到文档对象的字典，查询不到的文档不包含在内
+    """
+    wanted = set(document_ids)
+    found = {}
+    if len(wanted) > 1:
+        docs = dataset.list_documents(page=1, page_size=max(page_size, len(wanted)),
+                                      orderby="create_time", desc=True)
+        found = {doc.id: doc for doc in docs if doc.id in wanted}
+    for doc_id in wanted - found.keys():
+        try:
+            docs = dataset.list_documents(id=doc_id)
+        except Exception as e:
+            logger.warning(f"查询文档 {doc_id} 失败: {str(e)}")
+            continue
+        if docs:
+            found[doc_id] = docs[0]
+    return found
+
+
+class ParsePoller:
+    """
+    同时跟踪多个文档的解析状态，每次轮询只发一次列表请求
+    """
+
+    def __init__(self, dataset, strategy: Optional[WaitStrategy] = None,
+                 max_wait_time: float = ANALYSIS_CONFIG["max_wait_time"]):
+        self.dataset = dataset
+        self.strategy = strategy or build_wait_strategy()
+        self.max_wait_time = max_wait_time
+        self._tracked: Dict[str, _TrackedDocument] = {}
+
+    def track(self, document_ids: Iterable[str]):
+        """开始跟踪文档"""
+        for doc_id in document_ids:
+            tracked = _TrackedDocument(doc_id)
+            tracked.next_poll = tracked.started + self.strategy.next_interval(0, tracked.history)
+            self._tracked[doc_id] = tracked
+
+    def iter_results(self) -> Iterator[Tuple[str, str]]:
+        """
+        依次产出解析结束的文档
+
+        返回:
+            (文档ID, 状态) 的迭代器，状态为DONE、FAIL、CANCEL或TIMEOUT
+        """
+        while self._tracked:
+            now = time.monotonic()
+            next_poll = min(t.next_poll for t in self._tracked.values())
+            deadline = min(t.started for t in self._tracked.values()) + self.max_wait_time
+            time.sleep(max(0.0, min(next_poll, deadline) - now))
+
+            now = time.monotonic()
+            for doc_id in [d for d, t in self._tracked.items() if now - t.started >= self.max_wait_time]:
+                del self._tracked[doc_id]
+                yield doc_id, "TIMEOUT"
+            if not self._tracked:
+                return
+
+            # 只查询到了轮询时间的文档，其他文档保持各自的等待间隔
+            due = {doc_id: tracked for doc_id, tracked in self._tracked.items() if tracked.next_poll <= now}
+            if not due:
+                continue
+
+            try:
+                docs = list_documents_by_ids(self.dataset, due.keys())
+            except Exception as e:
+                logger.warning(f"获取文档解析状态失败: {str(e)}")
+                docs = {}
+
+            now = time.monotonic()
+            for doc_id, tracked in due.items():
+                tracked.attempt += 1
+                doc = docs.get(doc_id)
+                run_status = getattr(doc, 'run', None) if doc is not None else None
+                progress = float(getattr(doc, 'progress', 0) or 0) if doc is not None else 0.0
+                logger.info(f"文档 {doc_id} 处理状态: {run_status}，进度: {progress:.0%}")
+
+                if run_status in FINAL_STATUSES:
+                    del self._tracked[doc_id]
+                    if run_status == "DONE":
+                        record_parse_duration(doc_id, now - tracked.started, tracked.attempt)
+                    yield doc_id, run_status
+                    continue
+
+                tracked.history.append((now, progress))
+                tracked.next_poll = now + self.strategy.next_interval(tracked.attempt, tracked.history)
@@ -0,0 +1,158 @@
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from ragflow_sdk import RAGFlow
+from ragflow_sdk.modules.dataset import DataSet
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.general_config import RAGFLOW_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class RagflowRegistry:
+    """
+    进程内共享的RAGFlow句柄缓存，数据集只解析一次，助手按名称建立索引
+
+    索引超过TTL后整体刷新，查找不到时先按名称精确查询一次再创建
+    """
+
+    def __init__(self, api_key: str, base_url: str, dataset_name: str,
+                 ttl: float = RAGFLOW_CONFIG["registry_ttl"], page_size: int = 100):
+        self.client = RAGFlow(api_key=api_key, base_url=base_url)
+        self.dataset_name = dataset_name
+        self.ttl = ttl
+        self.page_size = page_size
+        self._dataset = None
+        self._dataset_loaded_at = 0.0
+        self._assistants: Dict = {}
+        self._assistants_loaded_at = 0.0
+        # _lock只保护内存中的索引，网络请求在各自的锁外或按名称加锁进行，回答线程之间互不阻塞
+        self._lock = threading.Lock()
+        self._dataset_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._name_locks: Dict[str, threading.Lock] = {}
+
+    def _expired(self, loaded_at: float) -> bool:
+        return time.monotonic() - loaded_at > self.ttl
+
+    def get_dataset(self):
+        """获取同名数据集，不存在则创建"""
+        with self._dataset_lock:
+            if self._dataset is None or self._expired(self._dataset_loaded_at):
+                self._dataset = self._find_or_create_dataset()
+                self._dataset_loaded_at = time.monotonic()
+            return self._dataset
+
+    def _find_or_create_dataset(self):
+        # 按名称查询不存在的数据集时RAGFlow返回错误码，SDK会抛出异常，视为不存在
+        try:
+            datasets = self.client.list_datasets(name=self.dataset_name)
+        except Exception as e:
+            logger.info(f"未找到数据集 {self.dataset_name}: {str(e)}")
+            datasets = []
+        for ds in datasets or []:
+            if getattr(ds, 'name', None) == self.dataset_name:
+                return ds
+
+        # 如果不存在则创建新数据集
+        parser_config = DataSet.ParserConfig(
+            self.client,
+            res_dict={"chunk_token_num": RAGFLOW_CONFIG["chunk_token_num"]}
+        )
+        logger.info(f"创建数据集: {self.dataset_name}")
+        return self.client.create_dataset(
+            name=self.dataset_name,
+            avatar="",
+            description="周报数据集",
+            embedding_model=RAGFLOW_CONFIG["embedding_model"],
+            permission="me",
+            chunk_method="naive",
+            parser_config=parser_config
+        )
+
+    def _refresh_assistants(self):
+        """分页拉取全部助手，重建名称索引"""
+        assistants = {}
+        page = 1
+        while True:
+            chats = self.client.list_chats(page=page, page_size=self.page_size)
+            for chat in chats:
+                assistants.setdefault(getattr(chat, 'name', None), chat)
+            if len(chats) < self.page_size:
+                break
+            page += 1
+        with self._lock:
+            self._assistants = assistants
+            self._assistants_loaded_at = time.monotonic()
+        logger.info(f"刷新助手索引，共 {len(assistants)} 个助手")
+
+    def _name_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._name_locks.setdefault(name, threading.Lock())
+
+    def get_assistant(self, name: str, dataset_id: str, create: bool = True):
+        """
+        按名称获取助手
+
+        参数:
+            name: 助手名称
+            dataset_id: 创建助手时关联的数据集ID
+            create: 不存在时是否创建
+        """
+        # 索引过期时只由一个线程刷新
+        with self._refresh_lock:
+            if self._expired(self._assistants_loaded_at):
+                self._refresh_assistants()
+
+        # 同名助手的查询和创建串行进行，避免重复创建，不同助手互不等待
+        with self._name_lock(name):
+            with self._lock:
+                assistant = self._assistants.get(name)
+            if assistant is None:
+                # 索引可能过期，按名称精确查询一次
+                try:
+                    found = self.client.list_chats(name=name)
+                except Exception:
+                    found = []
+                assistant = next((chat for chat in found if getattr(chat, 'name', None) == name), None)
+
+            if assistant is None and create:
+                logger.info(f"创建新助手: {name}")
+                assistant = self.client.create_chat(name, dataset_ids=[dataset_id])
+                logger.info("创建助手成功")
+            elif assistant is not None:
+                logger.info(f"找到已存在的助手: {name}")
+
+            if assistant is not None:
+                with self._lock:
+                    self._assistants[name] = assistant
+            return assistant
+
+    def invalidate(self):
+        """清空缓存的数据集和助手"""
+        with self._dataset_lock, self._lock:
+            self._dataset = None
+            self._assistants = {}
+            self._assistants_loaded_at = 0.0
+
+
+_registries: Dict[Tuple[str, str, str], RagflowRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(api_key: Optional[str] = None, base_url: str = RAGFLOW_CONFIG["base_url"],
+                 dataset_name: str = RAGFLOW_CONFIG["dataset_name"]) -> RagflowRegistry:
+    """
+    获取进程内共享的RAGFlow句柄缓存，定时任务和接口调用共用
+    """
+    api_key = api_key or os.getenv("RAGFLOW_API_KEY")
+    key = (api_key, base_url, dataset_name)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = RagflowRegistry(api_key, base_url, dataset_name)
+        return _registries[key]
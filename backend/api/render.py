@@ -1,241 +1,202 @@
-from flask import Flask, render_template, request, jsonify, send_file
-import pandas as pd
-import json
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 import os
 import dotenv
 import sys
+import time
+import threading
 import logging
 from flask_cors import CORS
-from io import BytesIO
-from pyecharts import options as opts
-from pyecharts.charts import Bar
-from pyecharts.components import Table
-from pyecharts.globals import ThemeType
 
 app = Flask(__name__)
 CORS(app)
 dotenv.load_dotenv()
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config.general_config import DB_CONFIG
-from minio import Minio
-from config.db_connector import DBConnector
+from config.general_config import CACHE_CONFIG, SERVER_CONFIG
+from config.db_connector import DBPoolError, get_db_pool
+from utils.report_cache import ReportCache
+from utils.serialization import (FORMAT_ARROW, FORMAT_COLUMNAR, FORMAT_RECORDS, arrow_response, build_schema,
+                                 NDJSON_MIMETYPE, dumps, encode_frame, finalize_response, format_response,
+                                 json_response, ndjson_line, negotiate_format, not_modified, request_etag)
+from utils.answer_stream import STATUS_DONE, STATUS_STREAMING, answer_stream_status, read_answer_stream
+from utils.chart_options import build_sheet_charts
+from utils.job_queue import enqueue_job, get_job, list_jobs
+from utils.parse_executor import ParseBusy, get_parse_executor
+from utils.report_metrics import (CategoryIndex, build_category_indexes, build_period_ratios,
+                                  detect_category_column, get_category_column)
+from utils.shared_cache import create_shared_cache, private_bytes
+from utils.sheet_loader import parse_excel_sheets
+from utils.single_flight import FlightBusy, SingleFlight
+from utils.snapshot import read_snapshot, snapshot_stats, write_snapshot
+from utils.storage import get_minio_client, minio_pool_metrics, open_object
 # 配置日志
 logging.basicConfig(
     level=logging.DEBUG,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT")
-MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY")
-MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY")
 MINIO_BUCKET = os.getenv("MINIO_BUCKET")
-MINIO_SECURE = os.getenv("MINIO_SECURE", "False").lower() == "true"
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER")
+
+# 进程内报告缓存
+report_cache = ReportCache(CACHE_CONFIG["max_bytes"])
+# 多个工作进程共享的内存映射缓存
+shared_cache = create_shared_cache(CACHE_CONFIG["shared_dir"], CACHE_CONFIG["shared_max_bytes"])
+# 合并同一报告的并发加载
+report_flights = SingleFlight(SERVER_CONFIG["flight_max_waiters"], SERVER_CONFIG["parse_retry_after"])
+# SSE连接会一直占用请求线程，限制同时推送的连接数，避免占满线程池
+stream_slots = threading.BoundedSemaphore(SERVER_CONFIG["stream_max_clients"])
 
 # 数据加载函数
+def load_report(report_name: str):
+    """
+    读取Minio中的Excel的所有工作表，按ETag缓存处理后的结果
+
+    返回:
+        (缓存条目, 错误信息)，缓存条目包含sheets和基于它的派生数据
+    """
+    logger.info("开始读取excel中的所有sheet")
+    try:
+        minio_client = get_minio_client()
+    except Exception as e:
+        logger.error(f"Minio客户端初始化失败: {str(e)}")
+        return None, f"Minio客户端初始化失败: {str(e)}"
+
+    # 使用对象的ETag/修改时间作为版本号，文件更新后缓存自动失效
+    try:
+        stat = minio_client.stat_object(MINIO_BUCKET, report_name)
+        version = stat.etag or str(stat.last_modified)
+    except Exception as e:
+        logger.error(f"从MinIO获取文件失败: {str(e)}")
+        return None, f"从MinIO获取文件失败: {str(e)}"
+
+    entry = report_cache.get(report_name, version)
+    if entry is not None:
+        logger.info(f"命中报告缓存: {report_name} ({version})")
+        return entry, None
+
+    # 同一报告同一版本的并发请求只加载一次，其余请求等待并共享结果
+    try:
+        entry = report_flights.do((report_name, version), load_missing_report, minio_client, report_name, version)
+    except (ParseBusy, FlightBusy) as e:
+        # 响应统一改为503并带上Retry-After，见api_finalize_response
+        logger.warning(f"报告 {report_name} 解析繁忙: {str(e)}")
+        g.retry_after = e.retry_after
+        return None, f"服务繁忙，请稍后重试: {str(e)}"
+    except Exception as e:
+        logger.error(f"从MinIO获取文件失败: {str(e)}")
+        return None, f"从MinIO获取文件失败: {str(e)}"
+
+    return entry, None
+
+
+def load_missing_report(minio_client, report_name: str, version: str):
+    """
+    加载未命中缓存的报告并写入缓存，其他工作进程已加载过的报告直接映射共享缓存
+
+    启用共享缓存时进程内缓存保存映射出的数据，仍引用映射页面的数值列由各进程共用，
+    其余列按实际占用计入进程内预算，派生数据生成后也计入；写入共享缓存失败时退回保存解析结果
+    """
+    sheets = shared_cache.get(report_name, version) if shared_cache is not None else None
+    if sheets is not None:
+        return report_cache.put(report_name, version, sheets, size=private_bytes(sheets))
+
+    # 读取和解析在独立的线程池中执行，请求线程最多等待parse_wait秒，
+    # 超时后解析在后台继续并写入缓存，客户端按Retry-After重试时直接命中
+    return get_parse_executor().run((report_name, version), parse_report, minio_client, report_name, version)
+
+
+def parse_report(minio_client, report_name: str, version: str):
+    """在解析线程池中读取报告并写入缓存，返回缓存条目"""
+    sheets = read_report_sheets(minio_client, report_name, version)
+    if shared_cache is not None and shared_cache.put(report_name, version, sheets):
+        mapped = shared_cache.get(report_name, version)
+        if mapped is not None:
+            return report_cache.put(report_name, version, mapped, size=private_bytes(mapped))
+    return report_cache.put(report_name, version, sheets)
+
+
+def read_report_sheets(minio_client, report_name: str, version: str):
+    """读取报告的所有工作表：优先读取列式快照，快照缺失或过期时再解析原始xlsx"""
+    sheets = read_snapshot(minio_client, MINIO_BUCKET, report_name, version)
+    if sheets is None:
+        with open_object(minio_client, MINIO_BUCKET, report_name) as excel_file:
+            sheets = parse_excel_sheets(excel_file)
+
+        # 首次读取时生成快照，后续请求直接读取
+        write_snapshot(minio_client, MINIO_BUCKET, report_name, sheets, version)
+    return sheets
+
+
 def load_data(report_name: str):
-         # 读取Minio中的Excel的所有工作表
-        logger.info(f"开始读取excel中的所有sheet")
-        try:
-             minio_client = Minio(
-                 MINIO_ENDPOINT,
-                 access_key=MINIO_ACCESS_KEY,
-                 secret_key=MINIO_SECRET_KEY,
-                 secure=MINIO_SECURE
-            )
-        except Exception as e:
-            logger.error(f"Minio客户端初始化失败: {str(e)}")
-            return None, f"Minio客户端初始化失败: {str(e)}"
-        
-        try:
-            response = minio_client.get_object(MINIO_BUCKET, report_name)
-            data = response.read()
-            excel_file = BytesIO(data)
-            
-            # 使用ExcelFile获取sheets列表
-            xls = pd.ExcelFile(excel_file)
-            all_sheets = xls.sheet_names
-            logger.info(f"Excel文件中的工作表: {all_sheets}")
-            
-            # 读取所有工作表
-            sheets = {}
-            for sheet_name in all_sheets:
-                try:
-                    # 使用ExcelFile对象读取每个工作表
-                    sheets[sheet_name] = xls.parse(sheet_name)
-                    logger.info(f"成功加载工作表: {sheet_name}")
-                except Exception as e:
-                    logger.error(f"加载工作表 {sheet_name} 失败: {str(e)}")
-                    continue
-        except Exception as e:
-            logger.error(f"从MinIO获取文件失败: {str(e)}")
-            return None, f"从MinIO获取文件失败: {str(e)}"
-        
-        # 对每个数据框进行基本处理
-        processed_sheets = {}  # 创建一个新字典来存储处理过的数据框
-        for sheet_name, df in list(sheets.items()):  # 转换为列表避免迭代过程中修改字典
-            # 填充缺失值
-            processed_df = df.fillna(0)
-            processed_sheets[sheet_name] = processed_df
-            
-            # 按现期和基期时间划分数据
-            if "时间" in df.columns:
-                # 分别提取现期和基期数据
-                current_period_df = df[df["时间"] == "现期"].copy()
-                base_period_df = df[df["时间"] == "基期"].copy()
-                
-                # 将两个期间的数据存储到字典中
-                if not current_period_df.empty:
-                    processed_sheets[sheet_name] = current_period_df.fillna(0)
-                
-                # 添加基期数据，使用"{sheet_name}_基期"作为键
-                if not base_period_df.empty:
-                    processed_sheets[f"{sheet_name}_基期"] = base_period_df.fillna(0)
-        
-        # 用处理过的字典替换原来的字典
-        sheets = processed_sheets
-        
-        logger.info(f"成功加载所有工作表，共 {len(sheets)} 个工作表")
-        logger.info(f"工作表列表: {list(sheets.keys())}")
-        
-        return sheets, None
+    """读取报告的所有工作表，返回 (sheets, 错误信息)"""
+    entry, error = load_report(report_name)
+    if error:
+        return None, error
+    return entry.sheets, None
 
-# 图表创建函数
-def create_bar_chart(df, x_col, y_col, title=None, is_percentage=False, orientation="v"):
-    """创建柱状图"""
-    # 处理数据
-    df_chart = df.copy()
-    
-    # 检查是否为货值或销售相关图表，转换为万元单位
-    is_value_chart = '货值' in y_col or '销售' in y_col
-    unit_text = ""
-    
-    if is_value_chart and not is_percentage:
-        # 转换为万元
-        df_chart[y_col] = df_chart[y_col] / 10000
-        unit_text = "(万元)"
-    
-    # 创建柱状图
-    chart = Bar(init_opts=opts.InitOpts(width="100%", height="400px", theme=ThemeType.LIGHT))
-    
-    # 设置图表数据
-    if orientation == "h":
-        # 水平方向
-        chart.add_xaxis(df_chart[y_col].tolist())
-        chart.add_yaxis("", df_chart[x_col].tolist())
-    else:
-        # 垂直方向
-        chart.add_xaxis(df_chart[x_col].tolist())
-        chart.add_yaxis("", df_chart[y_col].tolist())
-    
-    # 添加单位到标题
-    if title and is_value_chart and not is_percentage:
-        title = f"{title}{unit_text}"
-    
-    # 设置标题和样式
-    chart.set_global_opts(
-        title_opts=opts.TitleOpts(title=title),
-        toolbox_opts=opts.ToolboxOpts(),
-        tooltip_opts=opts.TooltipOpts(trigger="axis"),
-        datazoom_opts=[opts.DataZoomOpts()],
+
+def get_sheet_charts(entry, sheet_name):
+    """按报告版本缓存工作表的ECharts配置"""
+    ratios = entry.get_derived("period_ratios", build_period_ratios)
+    return entry.get_derived(
+        f"charts:{sheet_name}",
+        lambda _: build_sheet_charts(ratios[sheet_name], sheet_name)
     )
-    
-    # 为环比和占比添加百分比格式化
-    if is_percentage:
-        chart.set_series_opts(
-            label_opts=opts.LabelOpts(formatter="{c}%", position="top"),
-        )
-    else:
-        # 为货值和销售额图表添加单位提示
-        if is_value_chart:
-            chart.set_series_opts(
-                label_opts=opts.LabelOpts(formatter="{c} 万元", position="top"),
-            )
-        else:
-            chart.set_series_opts(
-                label_opts=opts.LabelOpts(formatter="{c}", position="top"),
-            )
-    
-    return chart
+
+
+def get_sheet_schemas(entry):
+    """按报告版本缓存每个工作表（含环比列）的序列化方式"""
+    ratios = entry.get_derived("period_ratios", build_period_ratios)
+    return entry.get_derived(
+        "sheet_schemas",
+        lambda _: {sheet_name: build_schema(df) for sheet_name, df in ratios.items()}
+    )
+
+def warm_report(report_name: str):
+    """加载报告并生成全部派生数据（环比、序列化方式、分类聚合、图表），返回错误信息"""
+    entry, error = load_report(report_name)
+    if error:
+        return error
+    get_sheet_schemas(entry)
+    entry.get_derived("category_index", build_category_indexes)
+    for sheet_name in entry.sheets:
+        get_sheet_charts(entry, sheet_name)
+    return None
 
 # 处理分类标签页数据
-def process_category_data(df, category_col, sheet_name=None):
-    """处理分类数据，返回图表和指标"""
+def process_category_data(df, category_col, sheet_name=None, index=None, schema=None, fmt=FORMAT_RECORDS):
+    """
+    处理分类数据，返回指标和数据
+
+    参数:
+        index: 预先构建的分类聚合索引，未提供时现场构建
+        schema: 预先计算的列序列化方式，未提供时现场计算
+        fmt: 数据格式，records为按行输出，columnar为列式输出
+    """
     try:
-        # 获取唯一分类值
-        categories = df[category_col].unique()
-        
-        # 检查是否为货盘概况的特殊情况
-        is_huopan = (sheet_name == "货盘概况" and category_col == "是否动销")
-        
-        # 只保留主分类（过滤掉"是"/"否"等子分类），但货盘概况要保留"是"和"否"
-        if is_huopan:
-            # 货盘概况特殊处理，保留"是"和"否"
-            main_categories = categories
-            logger.info(f"货盘概况特殊处理，保留所有分类值: {main_categories}")
-        else:
-            # 其他情况，过滤掉"是"和"否"
-            main_categories = [cat for cat in categories if not (cat == "是" or cat == "否")]
-        
-        # 过滤数据
-        df_main = df[df[category_col].isin(main_categories)]
-        
-        # 检查总计行是否已存在
-        has_total_row = False
-        total_row_index = None
-        
-        # 查找是否有名为"总计"的行
-        if category_col in df.columns:
-            total_rows = df[df[category_col] == "总计"]
-            if not total_rows.empty:
-                has_total_row = True
-                total_row_index = total_rows.index[0]
-                logger.info(f"检测到总计行: {total_rows.iloc[0].to_dict()}")
-        
-        # 计算主要指标总和 - 避免重复计算
-        if has_total_row:
-            # 使用已有的总计行数据
-            total_row = df.loc[total_row_index]
-            logger.info(f"使用已有总计行: {total_row.to_dict()}")
-            
-            # 将货值和销售额转换为万元单位
-            total_value = float(total_row["上周货值"] if "上周货值" in total_row else 0) / 10000
-            total_sales = float(total_row["上周销售"] if "上周销售" in total_row else 0) / 10000
-            
-            metrics = {
-                "total_goods": int(total_row["上周货号数"] if "上周货号数" in total_row else 0),
-                "total_value": total_value,  # 已转换为万元单位
-                "total_inventory": int(total_row["库存数"] if "库存数" in total_row else 0),
-                "total_sales": total_sales  # 已转换为万元单位
-            }
-        else:
-            # 计算除总计行外的所有数据总和
-            df_no_total = df[df[category_col] != "总计"]
-            
-            # 将货值和销售额转换为万元单位
-            total_value = float(df_no_total["上周货值"].sum() if "上周货值" in df_no_total.columns else 0) / 10000
-            total_sales = float(df_no_total["上周销售"].sum() if "上周销售" in df_no_total.columns else 0) / 10000
-            
-            metrics = {
-                "total_goods": int(df_no_total["上周货号数"].sum() if "上周货号数" in df_no_total.columns else 0),
-                "total_value": total_value,  # 已转换为万元单位
-                "total_inventory": int(df_no_total["库存数"].sum() if "库存数" in df_no_total.columns else 0),
-                "total_sales": total_sales  # 已转换为万元单位
+        if category_col not in df.columns:
+            # 工作表没有对应的分类列时不返回数据，指标为0
+            logger.warning(f"工作表 {sheet_name} 中没有分类列 {category_col}")
+            return {
+                "metrics": {"total_goods": 0, "total_value": 0, "total_inventory": 0, "total_sales": 0},
+                "data": [],
+                "category_col": category_col
             }
-            
-            logger.info(f"计算得到的总计: {metrics}")
-    
+        
+        if index is None or index.category_col != category_col:
+            index = CategoryIndex(df, category_col)
+        metrics = index.metrics()
         
         return {
             "metrics": metrics,
-            "data": df.to_dict(orient="records"),
+            "data": encode_frame(df, fmt, schema, [category_col]),
             "category_col": category_col  # 添加分类列信息
         }
     except Exception as e:
         logger.error(f"处理分类数据出错: {str(e)}")
         return {
             "metrics": {"total_goods": 0, "total_value": 0, "total_inventory": 0, "total_sales": 0},
-            "charts": {},
             "data": [],
             "category_col": category_col
         }
@@ -260,19 +221,125 @@ def api_get_sheet_data():
     if not report_name:
         return jsonify({"success": False, "error": "缺少report_name参数"})
     
-    data, error = load_data(report_name)
+    entry, error = load_report(report_name)
     if error:
         return jsonify({"success": False, "error": error})
     
-    # 将DataFrame转为字典
-    sheets_data = {}
-    for sheet_name, df in data.items():
-        sheets_data[sheet_name] = df.to_dict(orient='records')   
+    sheet_name = request.args.get('sheet')
+    fmt = negotiate_format(request)
+    if not sheet_name and fmt == FORMAT_ARROW:
+        # Arrow流一次只能携带一个工作表
+        fmt = FORMAT_RECORDS
+    
+    # 报告未更新时直接返回304，无需重新序列化
+    etag = request_etag(entry.version, request, fmt)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    
+    # 现期数据附带服务端计算好的环比，前端无需逐行匹配基期
+    data = entry.get_derived("period_ratios", build_period_ratios)
+    schemas = get_sheet_schemas(entry)
+    
+    if not sheet_name:
+        # 未指定工作表时返回全部数据，兼容旧版前端
+        sheets_data = {}
+        for sheet_name, df in data.items():
+            sheets_data[sheet_name] = encode_frame(df, fmt, schemas.get(sheet_name))
 
-    return jsonify({
-        "success": True, 
-        "data": sheets_data
-    })
+        response = format_response({
+            "success": True, 
+            "data": sheets_data
+        }, fmt)
+        response.set_etag(etag, weak=True)
+        return response
+    
+    if sheet_name not in data:
+        return jsonify({"success": False, "error": "工作表不存在"})
+    
+    try:
+        page = slice_sheet(data[sheet_name], sheet_name, request.args)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)})
+    
+    meta = {
+        "success": True,
+        "sheet": sheet_name,
+        "sheets": list(data.keys()),
+        "columns": page["columns"],
+        "category_col": page["category_col"],
+        "total": page["total"],
+        "offset": page["offset"],
+        "limit": page["limit"],
+        "next_cursor": page["next_cursor"],
+    }
+    if fmt == FORMAT_ARROW:
+        response = arrow_response(page["frame"], schemas.get(sheet_name), meta)
+    else:
+        dictionary_columns = [page["category_col"]] if page["category_col"] else None
+        response = format_response({
+            **meta,
+            "data": encode_frame(page["frame"], fmt, schemas.get(sheet_name), dictionary_columns),
+        }, fmt)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def _split_param(value):
+    """解析逗号分隔的查询参数"""
+    if not value:
+        return []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def slice_sheet(df, sheet_name, args):
+    """
+    按查询参数对工作表做分类过滤、列投影和分页
+
+    参数:
+        args: 请求参数，支持 columns、categories、offset/cursor、limit
+
+    返回:
+        包含切片后数据和分页信息的字典，参数非法时抛出ValueError
+    """
+    category_col = detect_category_column(df, sheet_name)
+    
+    # 按分类过滤
+    categories = _split_param(args.get('categories'))
+    if categories:
+        if category_col is None:
+            raise ValueError("该工作表没有分类列，无法按分类过滤")
+        df = df[df[category_col].astype(str).isin(categories)]
+    
+    # 列投影
+    columns = _split_param(args.get('columns'))
+    if columns:
+        missing = [col for col in columns if col not in df.columns]
+        if missing:
+            raise ValueError(f"列不存在: {', '.join(missing)}")
+        df = df[columns]
+    
+    # 分页，cursor为上一页返回的next_cursor
+    try:
+        offset = int(args.get('cursor') or args.get('offset') or 0)
+        limit = args.get('limit')
+        limit = int(limit) if limit not in (None, '') else None
+    except ValueError:
+        raise ValueError("offset/limit参数必须为整数")
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset/limit参数不能为负数")
+    
+    total = len(df)
+    end = total if limit is None else min(total, offset + limit)
+    return {
+        "frame": df.iloc[offset:end],
+        "columns": [str(col) for col in df.columns],
+        "category_col": category_col,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_cursor": str(end) if end < total else None,
+    }
 
 # 路由：获取分类数据
 @app.route('/category/<category>')
@@ -282,18 +349,31 @@ def api_category(category):
         if not report_name:
             return jsonify({"success": False, "error": "缺少report_name参数"})
             
-        data, error = load_data(report_name)
+        entry, error = load_report(report_name)
         if error:
             return jsonify({"success": False, "error": error})
         
+        data = entry.sheets
         if category not in data:
             logger.error(f"请求的分类 {category} 不存在")
             return jsonify({"success": False, "error": "分类不存在"})
         
+        fmt = negotiate_format(request)
+        if fmt == FORMAT_ARROW:
+            fmt = FORMAT_COLUMNAR
+        etag = request_etag(entry.version, request, fmt)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        
         # 获取当前工作表的分类列
         category_column = get_category_column(category)
         
-        category_data = process_category_data(data[category], category_column, sheet_name=category)
+        # 使用随报告缓存的分类聚合索引
+        indexes = entry.get_derived("category_index", build_category_indexes)
+        category_data = process_category_data(data[category], category_column, sheet_name=category,
+                                              index=indexes.get(category),
+                                              schema=get_sheet_schemas(entry).get(category), fmt=fmt)
         
         # 确保返回给前端的是可序列化的数据
         safe_metrics = {}
@@ -303,48 +383,19 @@ def api_category(category):
             else:
                 safe_metrics[key] = 0
         
-        # 处理数据框为可序列化格式
-        safe_data = []
-        for item in category_data["data"]:
-            safe_item = {}
-            for k, v in item.items():
-                if isinstance(v, (str, int, float, bool)) and not pd.isna(v):
-                    safe_item[k] = v
-                elif pd.isna(v):
-                    safe_item[k] = None
-                else:
-                    safe_item[k] = str(v)
-            safe_data.append(safe_item)
-        
         logger.info(f"成功处理分类 {category} 的数据，使用分类列: {category_column}")
-        return jsonify({
+        response = format_response({
             "success": True,
             "metrics": safe_metrics,
-            "data": safe_data,
+            "data": category_data["data"],
             "category_col": category_data.get("category_col", category_column)
-        })
+        }, fmt)
+        response.set_etag(etag, weak=True)
+        return response
     except Exception as e:
         logger.error(f"处理分类 {category} 数据时出错: {str(e)}")
         return jsonify({"success": False, "error": f"处理分类数据失败: {str(e)}"})
 
-# 根据工作表名获取对应的分类列
-def get_category_column(sheet_name):
-    """根据工作表名称返回对应的分类列名称"""
-    
-    category_mapping = {
-        "是否动销": "价格段",
-        "季节": "是否动销",
-        "活动栏目": "资源分布",
-        "货盘概况": "是否动销"
-    }
-    
-    # 如果是特殊工作表，返回映射的分类列名
-    if sheet_name in category_mapping:
-        return category_mapping[sheet_name]
-    
-    # 对于其他工作表，默认使用工作表名作为分类列
-    return sheet_name
-
 # 路由：获取图表数据
 @app.route('/chart/<category>/<chart_type>/<sub_type>')
 def api_chart(category, chart_type, sub_type):
@@ -353,34 +404,62 @@ def api_chart(category, chart_type, sub_type):
         if not report_name:
             return jsonify({"success": False, "error": "缺少report_name参数"})
             
-        data, error = load_data(report_name)
+        entry, error = load_report(report_name)
         if error:
             return jsonify({"success": False, "error": error})
         
-        if category not in data:
+        if category not in entry.sheets:
             return jsonify({"success": False, "error": "分类不存在"})
         
-        # 获取当前工作表的分类列
-        category_column = get_category_column(category)
-        
-        category_data = process_category_data(data[category], category_column, sheet_name=category)
+        # 图表配置随报告版本缓存
+        sheet_charts = get_sheet_charts(entry, category)
+        charts = sheet_charts["charts"]
         
-        if chart_type not in category_data["charts"] or sub_type not in category_data["charts"][chart_type]:
+        if chart_type not in charts or sub_type not in charts[chart_type]:
             return jsonify({"success": False, "error": "图表类型不存在"})
         
-        chart = category_data["charts"][chart_type][sub_type]
-        if chart is None:
-            return jsonify({"success": False, "error": "数据不可用"})
+        # 返回图表选项，用于Echarts渲染，并添加分类列信息到响应
+        return json_response({
+            **charts[chart_type][sub_type]["options"],
+            "category_col": sheet_charts["category_col"]
+        })
+    except Exception as e:
+        logger.error(f"获取图表数据出错: {str(e)}")
+        return jsonify({"success": False, "error": f"获取图表数据失败: {str(e)}"})
+
+# 路由：获取工作表的全部图表
+@app.route('/charts/<category>')
+def api_sheet_charts(category):
+    try:
+        report_name = request.args.get('report_name')
+        if not report_name:
+            return jsonify({"success": False, "error": "缺少report_name参数"})
+        
+        entry, error = load_report(report_name)
+        if error:
+            return jsonify({"success": False, "error": error})
         
-        # 返回图表选项，用于Echarts渲染 
-        options_str = chart.dump_options()
-        options_dict = json.loads(options_str)
+        if category not in entry.sheets:
+            return jsonify({"success": False, "error": "分类不存在"})
         
-        # 添加分类列信息到响应
-        return jsonify({
-            **options_dict,
-            "category_col": category_column
+        etag = request_etag(entry.version, request, FORMAT_RECORDS)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        
+        sheet_charts = get_sheet_charts(entry, category)
+        charts = [
+            {"chart_type": chart_type, "sub_type": sub_type, **chart}
+            for chart_type, sub_charts in sheet_charts["charts"].items()
+            for sub_type, chart in sub_charts.items()
+        ]
+        response = json_response({
+            "success": True,
+            "category_col": sheet_charts["category_col"],
+            "charts": charts
         })
+        response.set_etag(etag, weak=True)
+        return response
     except Exception as e:
         logger.error(f"获取图表数据出错: {str(e)}")
         return jsonify({"success": False, "error": f"获取图表数据失败: {str(e)}"})
@@ -389,20 +468,17 @@ def api_chart(category, chart_type, sub_type):
 @app.route('/get/report', methods=['GET'])
 def api_get_report():
     try:
-        db_connector = DBConnector(DB_CONFIG["mysql"])
-        db_connector._reconnect_if_needed()
-        
-        if not db_connector.connection:
-            return jsonify({"success": False, "error": "数据库连接失败"}), 500
-        cursor = db_connector.connection.cursor(dictionary=True)
-        # 执行查询
-        query = "SELECT id,report_name, create_time FROM ai_analysis WHERE report_name IS NOT NULL"
-        cursor.execute(query)
-        results = cursor.fetchall()
-        cursor.close()
-        db_connector.close()
+        with get_db_pool().connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            # 执行查询
+            query = "SELECT id,report_name, create_time FROM ai_analysis WHERE report_name IS NOT NULL"
+            cursor.execute(query)
+            results = cursor.fetchall()
+            cursor.close()
         
         return jsonify({"success": True, "data": results})
+    except DBPoolError:
+        return jsonify({"success": False, "error": "数据库连接失败"}), 500
     except Exception as e:
         logger.error(f"获取报告时出错: {str(e)}")
         return jsonify({"success": False, "error": f"获取报告失败: {str(e)}"})
@@ -411,52 +487,333 @@ def api_get_report():
 @app.route('/get/report/name', methods=['GET'])
 def api_get_report_name():
     try:
-        db_connector = DBConnector(DB_CONFIG["mysql"])
-        db_connector._reconnect_if_needed()
-        
-        if not db_connector.connection:
-            return jsonify({"success": False, "error": "数据库连接失败"}), 500
-        cursor = db_connector.connection.cursor(dictionary=True)
-        # 执行查询
-        query = "SELECT DISTINCT report_name FROM ai_analysis WHERE report_name IS NOT NULL"
-        cursor.execute(query)
-        results = cursor.fetchall()
-        cursor.close()
-        db_connector.close()
+        with get_db_pool().connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            # 执行查询
+            query = "SELECT DISTINCT report_name FROM ai_analysis WHERE report_name IS NOT NULL"
+            cursor.execute(query)
+            results = cursor.fetchall()
+            cursor.close()
         
         # 将结果转换为列表
         report_names = [row.get("report_name") for row in results if row.get("report_name")]
         
         return jsonify({"success": True, "report_names": report_names})
+    except DBPoolError:
+        return jsonify({"success": False, "error": "数据库连接失败"}), 500
     except Exception as e:
         logger.error(f"获取报告名称时出错: {str(e)}")
         return jsonify({"success": False, "error": f"获取报告名称失败: {str(e)}"})
 
-# 获取分析内容
-@app.route('/get/report/description/<report_name>', methods=['GET'])
-def api_get_analysis_content(report_name: str):
-    try:
-        db_connector = DBConnector(DB_CONFIG["mysql"])
-        db_connector._reconnect_if_needed()
-        if not db_connector.connection:
-            return jsonify({"success": False, "error": "数据库连接失败"}), 500
-        cursor = db_connector.connection.cursor(dictionary=True)
+def fetch_report_description(report_name: str):
+    """查询报告的AI分析内容，报告不存在时返回None"""
+    with get_db_pool().connection() as connection:
+        cursor = connection.cursor(dictionary=True)
         # 执行查询
         query = "SELECT ai_description FROM ai_analysis WHERE report_name = %s"
         cursor.execute(query, (report_name,))
         result = cursor.fetchall()
         cursor.close()
-        db_connector.close()
-        
-        if not result:
+    
+    if not result:
+        return None
+    # 修复：正确处理fetchall返回的结果列表，获取第一个结果的ai_description字段
+    return result[0].get("ai_description")
+
+# 获取分析内容
+@app.route('/get/report/description/<report_name>', methods=['GET'])
+def api_get_analysis_content(report_name: str):
+    try:
+        description = fetch_report_description(report_name)
+        if description is None:
             return jsonify({"success": False, "error": "报告不存在"})
         
-        # 修复：正确处理fetchall返回的结果列表，获取第一个结果的ai_description字段
-        return jsonify({"success": True, "description": result[0].get("ai_description")})
+        return jsonify({"success": True, "description": description})
+    except DBPoolError:
+        return jsonify({"success": False, "error": "数据库连接失败"}), 500
     except Exception as e:
         logger.error(f"获取报告描述失败: {str(e)}")
         return jsonify({"success": False, "error": f"获取报告描述失败: {str(e)}"}), 500
+
+# 报告详情页的合并接口
+@app.route('/report/<report_name>/bundle', methods=['GET'])
+def api_report_bundle(report_name: str):
+    """
+    一次返回详情页需要的全部内容，按NDJSON分段流式输出：
+    description -> sheets -> metrics -> charts -> sheet_data -> done，出错时输出error段
+
+    参数:
+        sheet: 初始工作表，默认第一个；同时支持 /get_sheet_data 的 columns、categories、offset、limit
+    """
+    def generate():
+        # 分析内容只查数据库，最先返回，前端可以先渲染Markdown
+        try:
+            description = fetch_report_description(report_name)
+            # 正在生成新的分析时，前端通过 /report/<name>/stream 实时展示
+            streaming = answer_stream_status(report_name) == STATUS_STREAMING
+            yield ndjson_line({"section": "description", "success": description is not None or streaming,
+                               "description": description or "", "streaming": streaming})
+        except Exception as e:
+            logger.error(f"获取报告描述失败: {str(e)}")
+            yield ndjson_line({"section": "description", "success": False, "error": f"获取报告描述失败: {str(e)}"})
+        
+        entry, error = load_report(report_name)
+        if error:
+            # 响应已开始，无法再改为503，解析繁忙时通过retry_after通知前端稍后重新请求
+            yield ndjson_line({"section": "error", "error": error, "retry_after": g.pop("retry_after", None)})
+            return
+        sheet_names = list(entry.sheets.keys())
+        yield ndjson_line({"section": "sheets", "sheets": sheet_names})
+        
+        sheet_name = request.args.get('sheet') or (sheet_names[0] if sheet_names else None)
+        if sheet_name not in entry.sheets:
+            yield ndjson_line({"section": "error", "error": "工作表不存在"})
+            return
+        
+        try:
+            index = entry.get_derived("category_index", build_category_indexes).get(sheet_name)
+            yield ndjson_line({"section": "metrics", "sheet": sheet_name,
+                               "metrics": index.metrics() if index is not None else {}})
+            
+            sheet_charts = get_sheet_charts(entry, sheet_name)
+            yield ndjson_line({
+                "section": "charts",
+                "sheet": sheet_name,
+                "category_col": sheet_charts["category_col"],
+                "charts": [
+                    {"chart_type": chart_type, "sub_type": sub_type, **chart}
+                    for chart_type, sub_charts in sheet_charts["charts"].items()
+                    for sub_type, chart in sub_charts.items()
+                ]
+            })
+            
+            ratios = entry.get_derived("period_ratios", build_period_ratios)
+            page = slice_sheet(ratios[sheet_name], sheet_name, request.args)
+            yield ndjson_line({
+                "section": "sheet_data",
+                "sheet": sheet_name,
+                "columns": page["columns"],
+                "category_col": page["category_col"],
+                "total": page["total"],
+                "offset": page["offset"],
+                "limit": page["limit"],
+                "next_cursor": page["next_cursor"],
+                "data": encode_frame(page["frame"], FORMAT_RECORDS, get_sheet_schemas(entry).get(sheet_name)),
+            })
+        except Exception as e:
+            logger.error(f"生成报告 {report_name} 的合并数据失败: {str(e)}")
+            yield ndjson_line({"section": "error", "error": f"获取工作表数据失败: {str(e)}"})
+            return
+        
+        yield ndjson_line({"section": "done"})
     
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+def _sse_event(event: str, data, event_id=None) -> bytes:
+    """编码一条Server-Sent Events消息"""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append(f"data: {dumps(data).decode('utf-8')}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+def _parse_stream_position(value: str):
+    """解析SSE事件id "<run>:<offset>"，旧格式只有offset"""
+    run, _, offset = (value or "").rpartition(":")
+    try:
+        return run or None, int(offset or 0)
+    except ValueError:
+        return None, 0
+
+def _stream_answer(report_name: str, run, offset: int):
+    """轮询回答进度并编码为SSE消息，超过stream_max_duration后结束，由浏览器带Last-Event-ID重连"""
+    sent = offset
+    start = last_sent = time.monotonic()
+    while time.monotonic() - start < SERVER_CONFIG["stream_max_duration"]:
+        try:
+            state = read_answer_stream(report_name, sent)
+            if state is None:
+                description = fetch_report_description(report_name)
+                if description is None:
+                    yield _sse_event("failed", {"error": "报告不存在"})
+                    return
+                if description[sent:]:
+                    yield _sse_event("delta", {"text": description[sent:]}, len(description))
+                yield _sse_event("done", {"status": STATUS_DONE, "error": None})
+                return
+            current_run = str(int(state["run"] or 0))
+            if run is not None and run != current_run:
+                # 重试开始了新一轮生成，之前推送的内容已被清空，从头推送
+                sent = 0
+                yield _sse_event("reset", {}, f"{current_run}:0")
+                state = read_answer_stream(report_name, sent)
+            run = current_run
+        except Exception as e:
+            logger.error(f"读取报告 {report_name} 的生成进度失败: {str(e)}")
+            yield _sse_event("failed", {"error": f"读取生成进度失败: {str(e)}"})
+            return
+        
+        if state["delta"]:
+            sent += len(state["delta"])
+            yield _sse_event("delta", {"text": state["delta"]}, f"{run}:{sent}")
+            last_sent = time.monotonic()
+        if state["status"] != STATUS_STREAMING:
+            yield _sse_event("done", {"status": state["status"], "error": state["error"]})
+            return
+        if time.monotonic() - last_sent >= SERVER_CONFIG["stream_keepalive"]:
+            # 心跳注释，防止代理断开空闲连接
+            yield b": keepalive\n\n"
+            last_sent = time.monotonic()
+        time.sleep(SERVER_CONFIG["stream_poll_interval"])
+
+# 实时推送AI分析内容的生成进度
+@app.route('/report/<report_name>/stream', methods=['GET'])
+def api_report_stream(report_name: str):
+    """
+    SSE接口，事件类型:
+        delta: {"text": 新增内容}，id为"<本轮开始时间>:<已推送的字符数>"，断线重连时浏览器通过Last-Event-ID续传
+        reset: {}，重试开始了新一轮生成，前端应清空已收到的内容
+        done: {"status": done/failed, "error": 失败原因}，收到后前端应关闭连接
+        failed: {"error": 错误信息}
+    没有生成记录时推送已保存的分析内容后结束；生成中的记录超时未更新时按失败结束。
+    每个连接最多保持stream_max_duration秒，同时推送的连接数超过stream_max_clients时
+    只返回retry提示，浏览器稍后自动重连
+    """
+    run, offset = _parse_stream_position(request.headers.get('Last-Event-ID') or request.args.get('offset'))
     
+    def generate():
+        # retry告诉浏览器断开后多久重连，连接超时或推送已满时都依赖它续传
+        retry = f"retry: {SERVER_CONFIG['stream_retry']}\n\n".encode("utf-8")
+        if not stream_slots.acquire(blocking=False):
+            logger.warning(f"SSE连接数已满，通知 {report_name} 的客户端稍后重连")
+            yield retry
+            return
+        try:
+            yield retry
+            yield from _stream_answer(report_name, run, offset)
+        finally:
+            stream_slots.release()
+    
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+# 统一处理ETag和压缩
+@app.after_request
+def api_finalize_response(response):
+    # 报告解析繁忙时返回503，客户端按Retry-After重试，不占用请求线程等待
+    retry_after = g.pop("retry_after", None)
+    if retry_after is not None and not response.is_streamed:
+        response.status_code = 503
+        response.headers["Retry-After"] = str(retry_after)
+    return finalize_response(response, request)
+
+# 查看报告缓存状态
+@app.route('/cache/stats', methods=['GET'])
+def api_cache_stats():
+    return jsonify({
+        "success": True,
+        "stats": report_cache.stats(),
+        "flights": report_flights.stats(),
+        "shared": shared_cache.stats() if shared_cache is not None else None,
+        "snapshot": snapshot_stats(),
+    })
+
+# 预热报告缓存，分析任务完成后调用
+@app.route('/cache/warm', methods=['POST'])
+def api_cache_warm():
+    payload = request.get_json(silent=True) or {}
+    report_names = payload.get("report_names") or _split_param(request.args.get('report_name'))
+    if not report_names:
+        return jsonify({"success": False, "error": "缺少report_names参数"})
+    
+    results = {}
+    for report_name in report_names:
+        start = time.monotonic()
+        try:
+            error = warm_report(report_name)
+        except Exception as e:
+            error = str(e)
+        if error:
+            logger.error(f"预热报告 {report_name} 失败: {error}")
+        results[report_name] = {
+            "success": error is None,
+            "error": error,
+            # 解析超时的报告仍在后台继续加载，不把整个预热请求改为503
+            "retry_after": g.pop("retry_after", None),
+            "elapsed": round(time.monotonic() - start, 3),
+        }
+    return jsonify({"success": all(r["success"] for r in results.values()), "results": results})
+
+# 添加分析任务，由 analytics/job_worker.py 的工作进程执行
+@app.route('/jobs', methods=['POST'])
+def api_enqueue_job():
+    payload = request.get_json(silent=True) or {}
+    file_name = payload.get("file_name") or request.args.get('file_name')
+    if not file_name:
+        return jsonify({"success": False, "error": "缺少file_name参数"})
+    if not UPLOAD_FOLDER:
+        return jsonify({"success": False, "error": "未配置UPLOAD_FOLDER"}), 500
+
+    # 只允许上传目录下的Excel文件
+    file_name = os.path.basename(file_name)
+    file_path = os.path.join(UPLOAD_FOLDER, file_name)
+    if not file_name.endswith('.xlsx') or not os.path.isfile(file_path):
+        return jsonify({"success": False, "error": f"文件不存在: {file_name}"}), 404
+
+    try:
+        job = enqueue_job(file_path)
+    except DBPoolError:
+        return jsonify({"success": False, "error": "数据库连接失败"}), 500
+    except Exception as e:
+        logger.error(f"添加分析任务失败: {str(e)}")
+        return jsonify({"success": False, "error": f"添加分析任务失败: {str(e)}"}), 500
+    return jsonify({"success": True, "created": job.pop("created"), "job": job}), 202
+
+# 查看分析任务列表
+@app.route('/jobs', methods=['GET'])
+def api_list_jobs():
+    status = request.args.get('status')
+    limit = min(request.args.get('limit', default=50, type=int), 500)
+    try:
+        jobs = list_jobs(status, limit)
+    except DBPoolError:
+        return jsonify({"success": False, "error": "数据库连接失败"}), 500
+    except Exception as e:
+        logger.error(f"获取分析任务失败: {str(e)}")
+        return jsonify({"success": False, "error": f"获取分析任务失败: {str(e)}"}), 500
+    return jsonify({"success": True, "jobs": jobs})
+
+# 查看单个分析任务的进度
+@app.route('/jobs/<int:job_id>', methods=['GET'])
+def api_get_job(job_id: int):
+    try:
+        job = get_job(job_id)
+    except DBPoolError:
+        return jsonify({"success": False, "error": "数据库连接失败"}), 500
+    except Exception as e:
+        logger.error(f"获取分析任务失败: {str(e)}")
+        return jsonify({"success": False, "error": f"获取分析任务失败: {str(e)}"}), 500
+    if job is None:
+        return jsonify({"success": False, "error": "任务不存在"}), 404
+    return jsonify({"success": True, "job": job})
+
+# 查看数据库连接池状态
+@app.route('/db/stats', methods=['GET'])
+def api_db_stats():
+    return jsonify({"success": True, "stats": get_db_pool().metrics()})
+
+# 查看Minio连接池状态
+@app.route('/minio/stats', methods=['GET'])
+def api_minio_stats():
+    return jsonify({"success": True, "stats": minio_pool_metrics()})
+
+# 查看Excel解析线程池状态
+@app.route('/parse/stats', methods=['GET'])
+def api_parse_stats():
+    return jsonify({"success": True, "stats": get_parse_executor().metrics()})
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0',debug=True, port=5000) 
\ No newline at end of file
+    # 开发模式；生产环境使用 api/serve.py 启动多线程服务
+    app.run(host=SERVER_CONFIG["host"], debug=True, port=SERVER_CONFIG["port"], threaded=True) 
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+生产环境启动入口
+
+    python api/serve.py
+
+默认使用 waitress 多线程WSGI服务（Windows/Linux通用），线程数、连接数和
+Excel解析线程池大小通过 SERVER_CONFIG 及对应环境变量配置。
+Linux下也可以使用多进程部署，每个进程各自持有报告缓存和解析线程池，
+配置 SHARED_CACHE_DIR 后各进程通过内存映射共享已处理的报告：
+
+    gunicorn -w 4 --threads 8 -b 0.0.0.0:5000 --chdir backend api.render:app
+"""
+import logging
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.render import app
+from config.general_config import SERVER_CONFIG
+from utils.parse_executor import get_parse_executor
+
+try:
+    from waitress import serve
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    host = SERVER_CONFIG["host"]
+    port = SERVER_CONFIG["port"]
+    threads = SERVER_CONFIG["threads"]
+
+    # 启动前创建解析线程池，首个请求无需等待初始化
+    get_parse_executor()
+
+    if WAITRESS_AVAILABLE:
+        logger.info(f"使用waitress启动服务: {host}:{port}, {threads} 个请求线程")
+        serve(
+            app,
+            host=host,
+            port=port,
+            threads=threads,
+            connection_limit=SERVER_CONFIG["connection_limit"],
+        )
+    else:
+        # 未安装waitress时退回Werkzeug多线程模式
+        logger.warning("未安装waitress，使用Werkzeug多线程模式启动")
+        app.run(host=host, port=port, threaded=True, debug=False)
+
+
+if __name__ == '__main__':
+    main()
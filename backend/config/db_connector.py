@@ -1,6 +1,10 @@
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errors
 import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from typing import Optional, Dict, Any
 import os
 
@@ -105,4 +109,185 @@ class DBConnector:
             return True
         except Exception as e:
             self.logger.error(f"执行更新失败: {str(e)}")
-            return False 
\ No newline at end of file
+            return False
+
+
+class DBPoolError(Exception):
+    """连接池获取连接失败（超时或无法建立连接）"""
+
+
+class DBConnectionPool:
+    """
+    线程安全的数据库连接池，在Flask路由和分析流程之间共享连接
+    """
+
+    def __init__(self, config: Dict[str, Any], pool_size: int = 5,
+                 checkout_timeout: float = 10, health_check_interval: float = 30):
+        """
+        初始化连接池
+
+        参数:
+            config: 数据库配置，与DBConnector相同
+            pool_size: 最大连接数
+            checkout_timeout: 获取连接的最长等待时间(秒)
+            health_check_interval: 连接空闲超过该时间(秒)后，使用前先做健康检查
+        """
+        self.config = config
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self.logger = logging.getLogger(__name__)
+
+        # 空闲连接，元素为 (connection, 归还时间)
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        # 控制总连接数，包括已借出和空闲的
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+        self._stats = {
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "in_use": 0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "wait_time_total": 0.0,
+        }
+
+    def _create_connection(self):
+        connection = mysql.connector.connect(
+            host=self.config["host"],
+            port=self.config["port"],
+            user=self.config["user"],
+            password=self.config["password"],
+            database=self.config["database"],
+            charset=self.config["charset"]
+        )
+        self._incr("created")
+        return connection
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        self._incr("closed")
+
+    def _incr(self, key: str, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def _is_healthy(self, connection, idle_since: float) -> bool:
+        """空闲时间过长的连接先ping一次，确认仍然可用"""
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            self._incr("health_check_failures")
+            return False
+
+    def acquire(self):
+        """
+        从连接池借出一个连接，超时抛出DBPoolError
+        """
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            self._incr("timeouts")
+            raise DBPoolError(f"获取数据库连接超时({self.checkout_timeout}秒)")
+
+        try:
+            connection = None
+            while connection is None:
+                try:
+                    candidate, idle_since = self._idle.get_nowait()
+                except queue.Empty:
+                    connection = self._create_connection()
+                    break
+                if self._is_healthy(candidate, idle_since):
+                    connection = candidate
+                else:
+                    self._discard(candidate)
+        except Exception as e:
+            self._slots.release()
+            self.logger.error(f"数据库连接失败: {e}")
+            raise DBPoolError(f"数据库连接失败: {e}") from e
+
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["wait_time_total"] += time.monotonic() - start
+        return connection
+
+    def release(self, connection, broken: bool = False):
+        """
+        归还连接，broken为True时直接关闭
+        """
+        try:
+            if broken or not connection.is_connected():
+                self._discard(connection)
+            else:
+                # 结束未提交的事务，避免把脏状态留给下一个使用者
+                connection.rollback()
+                self._idle.put((connection, time.monotonic()))
+        except Exception:
+            self._discard(connection)
+        finally:
+            self._incr("in_use", -1)
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        以上下文管理器方式借出连接
+
+        示例:
+            with pool.connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+        """
+        connection = self.acquire()
+        broken = False
+        try:
+            yield connection
+        except (errors.InterfaceError, errors.OperationalError):
+            broken = True
+            raise
+        finally:
+            self.release(connection, broken=broken)
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+    def metrics(self) -> Dict[str, Any]:
+        """返回连接池使用情况"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pool_size"] = self.pool_size
+        stats["idle"] = self._idle.qsize()
+        stats["avg_wait_time"] = (
+            round(stats["wait_time_total"] / stats["checkouts"], 6) if stats["checkouts"] else 0.0
+        )
+        return stats
+
+
+_pool: Optional[DBConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_db_pool() -> DBConnectionPool:
+    """
+    获取进程内共享的数据库连接池
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from config.general_config import DB_CONFIG, DB_POOL_CONFIG
+                _pool = DBConnectionPool(DB_CONFIG["mysql"], **DB_POOL_CONFIG)
+    return _pool
@@ -16,6 +16,13 @@ DB_CONFIG = {
     }
 }
 
+# 数据库连接池配置
+DB_POOL_CONFIG = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+    "checkout_timeout": 10,        # 获取连接的最长等待时间(秒)
+    "health_check_interval": 30,   # 空闲超过该时间(秒)的连接使用前先ping
+}
+
 # 程序信息配置
 APP_CONFIG = {
     "version": "1.0.0",
@@ -38,14 +45,89 @@ RAGFLOW_CONFIG = {
     "base_url": "http://localhost",
     "dataset_name": "weekly_report",
     "chunk_token_num": 2048,
-    "embedding_model": "embedding-3"
+    "embedding_model": "embedding-3",
+    "registry_ttl": 600  # 数据集和助手句柄缓存的刷新间隔(秒)
 }
 
 # 分析配置
 ANALYSIS_CONFIG = {
     "wait_for_parsing": True,
     "max_wait_time": 300,  # 最大等待时间(秒)
-    "wait_interval": 10,   # 轮询间隔(秒)
+    "wait_interval": 10,   # 轮询间隔(秒)，fixed策略使用
+    "wait_strategy": "progress",  # 轮询策略: fixed / backoff / progress
+    "min_wait_interval": 2,       # 最小轮询间隔(秒)
+    "max_wait_interval": 30,      # 最大轮询间隔(秒)
+    "backoff_multiplier": 1.5,    # 指数退避倍数
+    "wait_jitter": 0.2,           # 轮询间隔的随机抖动比例
+    "max_workers": 4,      # 定时任务同时分析的最大文件数
+    "batch_parse": True,   # 定时任务一次上传并解析所有文件，再逐个提问
+    "stream_checkpoint_interval": 2,    # 回答生成过程中写入数据库的间隔(秒)
+    "stream_checkpoint_chars": 500,     # 积累超过该字符数时立即写入
+    "stream_stale_seconds": 300,        # 生成中的回答超过该时间未更新时视为进程已中断(秒)
+    "use_job_queue": os.getenv("USE_JOB_QUEUE", "false").lower() == "true",  # 定时任务只添加任务，由工作进程执行
+}
+
+# MinIO读写配置
+MINIO_CONFIG = {
+    "chunk_size": 1024 * 1024,               # 下载时每次读取的字节数
+    "part_size": 16 * 1024 * 1024,           # 分片上传的分片大小
+    "spool_max_memory": 32 * 1024 * 1024,    # 下载内容在内存中保留的上限，超出写入临时文件
+    "num_pools": 4,          # urllib3连接池数量
+    "pool_maxsize": 16,      # 每个连接池保持的最大连接数
+    "connect_timeout": 5,    # 连接超时(秒)
+    "read_timeout": 60,      # 读取超时(秒)
+    "retries": 3,            # 失败重试次数
+    "retry_backoff": 0.2,    # 重试退避系数
+}
+
+# 报告缓存配置
+CACHE_CONFIG = {
+    "max_bytes": 512 * 1024 * 1024,  # 进程内缓存的字节预算
+    "shared_dir": os.getenv("SHARED_CACHE_DIR"),      # 多进程共享缓存目录，未配置时不启用
+    "shared_max_bytes": int(os.getenv("SHARED_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024)),  # 共享缓存的字节预算
+}
+
+# 列式快照配置
+SNAPSHOT_CONFIG = {
+    # 从报告文件名中去掉日期得到系列名，同一系列的报告按上传顺序互为上一期，
+    # 例如"周报_2024-05-12.xlsx"和"周报_2024-05-19.xlsx"都属于系列"周报"；为空时使用完整文件名
+    "series_pattern": os.getenv(
+        "REPORT_SERIES_PATTERN",
+        r"\d{4}[-_.年]?\d{1,2}[-_.月]?\d{1,2}日?|\d{1,2}[.月]\d{1,2}日?(?:[-~至]\d{1,2}[.月]\d{1,2}日?)?"
+    ),
+}
+
+# API服务配置
+SERVER_CONFIG = {
+    "host": os.getenv("API_HOST", "0.0.0.0"),
+    "port": int(os.getenv("API_PORT", 5000)),
+    "threads": int(os.getenv("API_THREADS", 16)),                  # 处理请求的线程数
+    "connection_limit": int(os.getenv("API_CONNECTION_LIMIT", 200)),  # 最大并发连接数
+    "parse_workers": int(os.getenv("PARSE_WORKERS", 2)),           # 同时解析Excel的线程数
+    "parse_queue_depth": int(os.getenv("PARSE_QUEUE_DEPTH", 8)),   # 排队等待解析的最大请求数
+    "parse_wait": 5,         # 请求等待解析结果的最长时间(秒)，超时后返回503，解析在后台继续
+    "parse_retry_after": 5,  # 解析繁忙时通知客户端重试的间隔(秒)，即Retry-After
+    "flight_max_waiters": int(os.getenv("FLIGHT_MAX_WAITERS", 8)),  # 等待同一报告加载的最大请求数，需小于threads
+    "stream_poll_interval": 1,       # SSE接口查询回答进度的间隔(秒)
+    "stream_keepalive": 15,          # SSE接口无新内容时发送心跳的间隔(秒)
+    "stream_max_duration": 60,       # 单个SSE连接的最长时间(秒)，超时后由浏览器通过Last-Event-ID重连
+    "stream_max_clients": int(os.getenv("API_STREAM_MAX_CLIENTS", 4)),  # 同时推送的SSE连接数，需小于threads
+    "stream_retry": 3000,            # 通知浏览器重连的等待时间(毫秒)
+}
+
+# 分析完成后的缓存预热配置
+WARMUP_CONFIG = {
+    "render_api_url": os.getenv("RENDER_API_URL"),  # API服务地址，如 http://localhost:5000，未配置时不预热
+    "timeout": 120,   # 预热请求的超时时间(秒)
+}
+
+# 分析任务队列配置
+JOB_CONFIG = {
+    "workers": int(os.getenv("JOB_WORKERS", 2)),  # 工作进程数
+    "lease_seconds": 120,       # 领取任务后的租约时长(秒)，工作进程崩溃后租约到期由其他进程接手
+    "heartbeat_interval": 30,   # 续约间隔(秒)
+    "poll_interval": 5,         # 没有任务时的轮询间隔(秒)
+    "max_attempts": 3,          # 单个任务最多执行次数
 }
 
 # 初始化日志
@@ -0,0 +1,80 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# ai_analysis 表需要补充的列: (列名, 列定义)
+AI_ANALYSIS_COLUMNS = [
+    ("file_hash", "CHAR(64) NULL COMMENT '报告文件内容的SHA-256'"),
+]
+
+# 程序自行创建的表: (表名, 建表语句)
+TABLES = [
+    ("ai_analysis_stream", """
+        CREATE TABLE IF NOT EXISTS ai_analysis_stream (
+            report_name VARCHAR(255) NOT NULL PRIMARY KEY COMMENT '报告名',
+            content LONGTEXT NOT NULL COMMENT '已生成的回答内容',
+            status VARCHAR(16) NOT NULL COMMENT 'streaming / done / failed',
+            error TEXT NULL COMMENT '失败原因',
+            started_time DATETIME NOT NULL COMMENT '开始生成时间',
+            updated_time DATETIME NOT NULL COMMENT '最后一次写入时间'
+        ) DEFAULT CHARSET=utf8mb4 COMMENT='AI分析回答的流式生成进度'
+    """),
+    ("analysis_jobs", """
+        CREATE TABLE IF NOT EXISTS analysis_jobs (
+            id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            report_name VARCHAR(255) NOT NULL COMMENT '报告名',
+            file_path VARCHAR(1024) NOT NULL COMMENT '待分析文件路径',
+            stage VARCHAR(16) NOT NULL COMMENT '已完成的阶段: queued / uploaded / parsing / parsed / answering / saved',
+            status VARCHAR(16) NOT NULL COMMENT 'pending / running / done / failed',
+            attempts INT NOT NULL DEFAULT 0 COMMENT '已领取次数',
+            max_attempts INT NOT NULL COMMENT '最多领取次数',
+            file_hash CHAR(64) NULL COMMENT '入队后计算的文件SHA-256',
+            document_id VARCHAR(64) NULL COMMENT 'RAGFlow文档ID',
+            question TEXT NULL COMMENT '提问内容',
+            error TEXT NULL COMMENT '最近一次失败原因',
+            lease_owner VARCHAR(128) NULL COMMENT '持有租约的工作进程',
+            lease_expires DATETIME NULL COMMENT '租约到期时间',
+            created_time DATETIME NOT NULL,
+            updated_time DATETIME NOT NULL,
+            finished_time DATETIME NULL,
+            KEY idx_status_lease (status, lease_expires),
+            KEY idx_report_name (report_name)
+        ) DEFAULT CHARSET=utf8mb4 COMMENT='分析任务队列'
+    """),
+]
+
+_ensured = False
+_lock = threading.Lock()
+
+
+def ensure_schema(connection):
+    """
+    检查并补齐程序依赖的表结构，每个进程只执行一次
+
+    参数:
+        connection: 数据库连接
+    """
+    global _ensured
+    if _ensured:
+        return
+    with _lock:
+        if _ensured:
+            return
+        cursor = connection.cursor()
+        try:
+            for column, definition in AI_ANALYSIS_COLUMNS:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM information_schema.COLUMNS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'ai_analysis' AND COLUMN_NAME = %s",
+                    (column,)
+                )
+                if cursor.fetchone()[0] == 0:
+                    cursor.execute(f"ALTER TABLE ai_analysis ADD COLUMN {column} {definition}")
+                    logger.info(f"ai_analysis 表新增列: {column}")
+            for table, ddl in TABLES:
+                cursor.execute(ddl)
+            connection.commit()
+            _ensured = True
+        finally:
+            cursor.close()
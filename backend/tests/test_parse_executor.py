@@ -0,0 +1,45 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.parse_executor import ParseExecutor, ParseQueueFull, ParseTimeout
+
+
+def test_timeout_keeps_task_running_and_retry_reuses_it():
+    executor = ParseExecutor(workers=1, queue_depth=0, timeout=0.05, retry_after=3)
+    release = threading.Event()
+    calls = []
+
+    def parse():
+        calls.append(1)
+        release.wait(5)
+        return "sheets"
+
+    with pytest.raises(ParseTimeout) as info:
+        executor.run("report", parse)
+    assert info.value.retry_after == 3
+
+    assert executor.metrics()["pending"] == 1
+
+    # 重试的请求等待同一个任务，不会重新解析，也不占用新的名额
+    with pytest.raises(ParseTimeout):
+        executor.run("report", parse)
+    assert len(calls) == 1
+    release.set()
+    executor.shutdown()
+    assert executor.metrics()["pending"] == 0
+
+
+def test_saturated_executor_rejects_immediately():
+    executor = ParseExecutor(workers=1, queue_depth=0, timeout=0.05)
+    release = threading.Event()
+    with pytest.raises(ParseTimeout):
+        executor.run("a", release.wait, 5)
+    with pytest.raises(ParseQueueFull):
+        executor.run("b", lambda: None)
+    assert executor.metrics()["rejected"] == 1
+    release.set()
+    executor.shutdown()
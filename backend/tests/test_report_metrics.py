@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.report_metrics import CategoryIndex, compute_period_ratios
+
+
+def test_ratios_are_computed_against_base_period():
+    current = pd.DataFrame({"三级分类": ["上衣", "裤子"], "上周货值": [120.0, 50.0]})
+    base = pd.DataFrame({"三级分类": ["上衣", "裤子"], "上周货值": [100.0, 0.0]})
+    result = compute_period_ratios(current, base, "三级分类")
+    assert result["货值环比"].tolist() == [20.0, None]
+
+
+def test_existing_ratio_column_is_kept_where_ratio_cannot_be_computed():
+    current = pd.DataFrame({
+        "三级分类": ["上衣", "是", "裙子"],
+        "上周货值": [120.0, 30.0, 80.0],
+        "货值环比": [1.5, 2.5, 3.5],
+    })
+    base = pd.DataFrame({"三级分类": ["上衣", "是"], "上周货值": [100.0, 10.0]})
+    result = compute_period_ratios(current, base, "三级分类")
+    # "是"子分类和没有基期的分类保留工作表中的原值
+    assert result["货值环比"].tolist() == [20.0, 2.5, 3.5]
+    assert current["货值环比"].tolist() == [1.5, 2.5, 3.5]
+
+
+def test_category_index_without_category_column_has_zero_metrics():
+    df = pd.DataFrame({"上周货号数": [3, 4], "上周货值": [10000.0, 20000.0]})
+    index = CategoryIndex(df, "三级分类")
+    assert index.metrics() == {"total_goods": 0, "total_value": 0.0, "total_inventory": 0, "total_sales": 0.0}
+
+
+def test_category_index_prefers_total_row():
+    df = pd.DataFrame({
+        "三级分类": ["上衣", "裤子", "总计"],
+        "上周货号数": [3, 4, 10],
+        "上周货值": [10000.0, 20000.0, 50000.0],
+    })
+    metrics = CategoryIndex(df, "三级分类").metrics()
+    assert metrics["total_goods"] == 10
+    assert metrics["total_value"] == 5.0
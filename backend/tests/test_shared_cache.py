@@ -0,0 +1,101 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.report_cache import ReportCache
+from utils.report_metrics import build_period_ratios
+from utils.shared_cache import SharedSheetCache, private_bytes
+from utils.sheet_loader import prepare_sheet
+
+pytest.importorskip("pyarrow")
+
+
+def _sheets():
+    df = prepare_sheet(pd.DataFrame({
+        "价格段": ["0-100", None, "100-200"],
+        "季节": ["春", "夏", None],
+        "上周货值": [100.0, None, 300.0],
+        "库存数": [1, 2, 3],
+    }))
+    return {"价格段": df}
+
+
+def test_put_and_get_prepared_sheets(tmp_path):
+    cache = SharedSheetCache(str(tmp_path), 1024 * 1024 * 1024)
+    sheets = _sheets()
+    assert cache.put("report.xlsx", "v1", sheets) is True
+
+    mapped = cache.get("report.xlsx", "v1")
+    assert mapped is not None
+    pd.testing.assert_frame_equal(mapped["价格段"], sheets["价格段"], check_categorical=False)
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["put_failures"] == 0
+
+
+def test_put_failure_is_counted(tmp_path, monkeypatch):
+    def fail(df):
+        raise ValueError("无法转换")
+
+    monkeypatch.setattr("utils.shared_cache.arrow_compatible", fail)
+    cache = SharedSheetCache(str(tmp_path), 1024 * 1024 * 1024)
+    assert cache.put("report.xlsx", "v1", _sheets()) is False
+    assert cache.get("report.xlsx", "v1") is None
+    stats = cache.stats()
+    assert stats["put_failures"] == 1
+    assert stats["last_error"].startswith("report.xlsx")
+
+
+def test_private_bytes_excludes_only_columns_still_mapped(tmp_path):
+    cache = SharedSheetCache(str(tmp_path), 1024 * 1024 * 1024)
+    sheets = {"价格段": pd.DataFrame({"价格段": ["0-100", "100-200"], "上周货值": [1.0, None], "库存数": [1, 2]})}
+    cache.put("report.xlsx", "v1", sheets)
+    mapped = cache.get("report.xlsx", "v1")
+    df = mapped["价格段"]
+    total = int(df.memory_usage(index=True, deep=True).sum())
+    # 无空值的整数列直接引用映射页面；含空值的浮点列转换时已复制，仍需计入
+    shared = int(df[["库存数"]].memory_usage(index=False, deep=True).sum())
+    assert private_bytes(mapped) == total - shared
+
+    # 复制后的列不再位于映射区间内
+    copied = type(mapped)({"价格段": df.copy()})
+    copied.mapped_ranges = mapped.mapped_ranges
+    assert private_bytes(copied) == total
+
+
+def test_private_bytes_counts_everything_without_mapping():
+    sheets = _sheets()
+    df = sheets["价格段"]
+    assert private_bytes(sheets) == int(df.memory_usage(index=True, deep=True).sum())
+
+
+def test_derived_ratios_are_charged_without_copying_sheets(tmp_path):
+    cache = SharedSheetCache(str(tmp_path), 1024 * 1024 * 1024)
+    current = prepare_sheet(pd.DataFrame({"价格段": ["0-100", "100-200"], "上周货值": [110, 300]}))
+    base = prepare_sheet(pd.DataFrame({"价格段": ["0-100", "100-200"], "上周货值": [100, 300]}))
+    cache.put("report.xlsx", "v1", {"价格段": current, "价格段_基期": base})
+    mapped = cache.get("report.xlsx", "v1")
+
+    report_cache = ReportCache(1024 * 1024 * 1024)
+    entry = report_cache.put("report.xlsx", "v1", mapped, size=private_bytes(mapped))
+    before = report_cache.stats()["bytes"]
+    ratios = entry.get_derived("period_ratios", build_period_ratios)
+
+    # 原有列仍与映射的数据共用，只有新增的环比列计入
+    assert np.shares_memory(ratios["价格段"]["上周货值"].to_numpy(), mapped["价格段"]["上周货值"].to_numpy())
+    assert report_cache.stats()["bytes"] > before
+    assert entry.size == report_cache.stats()["bytes"]
+
+
+def test_derived_growth_evicts_over_budget():
+    report_cache = ReportCache(10 * 1024)
+    first = report_cache.put("a.xlsx", "v1", {}, size=0)
+    report_cache.put("b.xlsx", "v1", {}, size=0)
+    first.get_derived("payload", lambda sheets: "x" * 20 * 1024)
+    stats = report_cache.stats()
+    assert stats["reports"] == ["b.xlsx"]
+    assert stats["evictions"] == 1
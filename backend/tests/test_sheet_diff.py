@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.sheet_diff import diff_reports, diff_sheet, sheet_fingerprint, summarize_changes
+
+
+def _sheet(rows):
+    return pd.DataFrame(rows, columns=["三级分类", "上周货值"])
+
+
+def test_diff_sheet_by_category():
+    old = _sheet([["上衣", 100], ["裤子", 50], ["裙子", 30]])
+    new = _sheet([["上衣", 120], ["裤子", 50], ["外套", 80]])
+    change = diff_sheet(old, new, "三级分类")
+    assert change["category_col"] == "三级分类"
+    assert change["added"] == ["外套"]
+    assert change["removed"] == ["裙子"]
+    assert change["modified"] == ["上衣"]
+
+
+def test_diff_sheet_without_category_counts_rows():
+    old = pd.DataFrame({"数量": [1, 2, 3]})
+    new = pd.DataFrame({"数量": [2, 3, 4, 5]})
+    change = diff_sheet(old, new, "汇总")
+    assert change["rows_added"] == 2
+    assert change["rows_removed"] == 1
+
+
+def test_diff_sheet_column_change():
+    old = _sheet([["上衣", 100]])
+    new = pd.DataFrame({"三级分类": ["上衣"], "上周销售": [100]})
+    assert diff_sheet(old, new, "三级分类")["columns_changed"] is True
+
+
+def test_diff_reports_statuses():
+    same = _sheet([["上衣", 100]])
+    old_changed = _sheet([["上衣", 100]])
+    new_changed = _sheet([["上衣", 200]])
+    previous_fingerprints = {
+        "不变": sheet_fingerprint(same),
+        "变化": sheet_fingerprint(old_changed),
+        "删除": "x",
+    }
+    sheets = {"不变": same, "变化": new_changed, "新增": same}
+    fingerprints = {name: sheet_fingerprint(df) for name, df in sheets.items()}
+    changes = diff_reports({"变化": old_changed}, sheets, previous_fingerprints, fingerprints)
+    assert changes["不变"]["status"] == "unchanged"
+    assert changes["变化"]["modified"] == ["上衣"]
+    assert changes["新增"]["status"] == "added"
+    assert changes["删除"]["status"] == "removed"
+
+
+def test_summarize_changes():
+    changes = {
+        "三级分类": {"status": "changed", "columns_changed": False, "rows": 3, "category_col": "三级分类",
+                 "added": ["外套"], "removed": [], "modified": ["上衣"]},
+        "价格段": {"status": "unchanged", "rows": 5},
+        "活动栏目": {"status": "removed"},
+    }
+    summary = summarize_changes(changes)
+    assert "- 工作表「三级分类」新增三级分类：外套；数据变化的三级分类：上衣" in summary
+    assert "- 工作表「活动栏目」已删除" in summary
+    assert summary.endswith("- 未变化的工作表：价格段")
+
+
+def test_summarize_changes_limits_listed_categories():
+    modified = [f"分类{i}" for i in range(12)]
+    changes = {"三级分类": {"status": "changed", "rows": 12, "category_col": "三级分类",
+                        "added": [], "removed": [], "modified": modified}}
+    assert "等12个" in summarize_changes(changes)
+
+
+def test_summarize_changes_without_previous_version():
+    assert summarize_changes(None) == ""
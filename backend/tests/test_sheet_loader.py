@@ -0,0 +1,75 @@
+import os
+import sys
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.sheet_loader import parse_excel_sheets, prepare_sheet
+
+pa = pytest.importorskip("pyarrow")
+
+
+def _workbook(path):
+    df = pd.DataFrame({
+        "时间": ["现期", "现期", "基期", "现期"],
+        "价格段": ["0-100", None, "0-100", "100-200"],
+        "季节": ["春", "夏", None, "秋"],
+        "商品": ["A", None, "A", "C"],
+        "上周货值": [100.0, None, 80.0, 300.0],
+    })
+    df.to_excel(path, sheet_name="价格段", index=False)
+
+
+def _parquet_round_trip(df):
+    buffer = BytesIO()
+    df.to_parquet(buffer, engine="pyarrow")
+    return pd.read_parquet(BytesIO(buffer.getvalue()), engine="pyarrow")
+
+
+def _arrow_ipc_round_trip(df):
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return pa.ipc.open_file(sink.getvalue()).read_all().to_pandas()
+
+
+def test_blank_cells_are_filled_by_column_type():
+    df = prepare_sheet(pd.DataFrame({
+        "价格段": ["0-100", None],
+        "商品": ["A", None],
+        "上周货值": [1.0, None],
+    }))
+    assert isinstance(df["价格段"].dtype, pd.CategoricalDtype)
+    assert list(df["价格段"]) == ["0-100", ""]
+    assert list(df["商品"]) == ["A", ""]
+    assert list(df["上周货值"]) == [1.0, 0.0]
+
+
+@pytest.mark.parametrize("round_trip", [_parquet_round_trip, _arrow_ipc_round_trip])
+def test_sheets_with_blank_text_cells_round_trip(tmp_path, round_trip):
+    path = tmp_path / "report.xlsx"
+    _workbook(path)
+    sheets = parse_excel_sheets(str(path))
+    assert set(sheets) == {"价格段", "价格段_基期"}
+
+    for sheet_name, df in sheets.items():
+        result = round_trip(df)
+        assert list(result.columns) == list(df.columns)
+        assert result["价格段"].astype(str).tolist() == df["价格段"].astype(str).tolist()
+        assert result["上周货值"].tolist() == df["上周货值"].tolist()
+    assert sheets["价格段"]["价格段"].tolist() == ["0-100", "", "100-200"]
+
+
+def test_explicit_dtypes_keep_text_and_numeric_columns_uniform(tmp_path):
+    path = tmp_path / "report.xlsx"
+    pd.DataFrame({
+        "三级分类": ["上衣", 100, "裤子"],
+        "上周货值": [100, "-", 300],
+    }).to_excel(path, sheet_name="三级分类", index=False)
+    df = parse_excel_sheets(str(path))["三级分类"]
+    assert df["三级分类"].tolist() == ["上衣", "100", "裤子"]
+    assert df["上周货值"].dtype == "float64"
+    assert df["上周货值"].tolist() == [100.0, 0.0, 300.0]
@@ -0,0 +1,55 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.single_flight import FlightBusy, SingleFlight
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        time.sleep(0.01)
+
+
+def test_waiters_above_cap_fail_fast():
+    flights = SingleFlight(max_waiters=2, retry_after=7)
+    release = threading.Event()
+    results = []
+
+    def load():
+        release.wait(5)
+        return "entry"
+
+    threads = [threading.Thread(target=lambda: results.append(flights.do("report", load))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    # 1个执行者 + 2个等待者
+    _wait_for(lambda: flights.stats()["waiting"] == 2)
+
+    with pytest.raises(FlightBusy) as info:
+        flights.do("report", load)
+    assert info.value.retry_after == 7
+
+    # 其他键不受影响
+    assert flights.do("other", lambda: "other") == "other"
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["entry"] * 3
+    stats = flights.stats()
+    assert stats["rejected"] == 1
+    assert stats["waiting"] == 0
+    assert stats["in_flight"] == 0
+
+
+def test_unbounded_by_default():
+    flights = SingleFlight()
+    assert flights.do("report", lambda: 1) == 1
+    assert flights.stats()["max_waiters"] is None
@@ -0,0 +1,65 @@
+import os
+import sys
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.snapshot import arrow_compatible, previous_report_name, series_key
+
+
+def _round_trip(df: pd.DataFrame) -> pd.DataFrame:
+    pytest.importorskip("pyarrow")
+    buffer = BytesIO()
+    df.to_parquet(buffer, engine="pyarrow")
+    return pd.read_parquet(BytesIO(buffer.getvalue()), engine="pyarrow")
+
+
+def test_mixed_object_column_is_written_as_text():
+    # 旧版本对整张表fillna(0)，文本列的空单元格变成数字0
+    df = pd.DataFrame({"商品": ["A", None, "C"], "库存": [1.0, None, 3.0]}).fillna(0)
+    result = _round_trip(arrow_compatible(df))
+    assert list(result["商品"]) == ["A", "0", "C"]
+    assert list(result["库存"]) == [1.0, 0.0, 3.0]
+
+
+def test_mixed_categories_are_written_as_text():
+    df = pd.DataFrame({"价格段": pd.Categorical(["0-100", 0, "100-200"])})
+    result = _round_trip(arrow_compatible(df))
+    assert isinstance(result["价格段"].dtype, pd.CategoricalDtype)
+    assert list(result["价格段"]) == ["0-100", "0", "100-200"]
+
+
+def test_missing_values_are_kept():
+    df = pd.DataFrame({"季节": pd.Series(["春", None, 1], dtype=object)})
+    result = arrow_compatible(df)
+    assert result["季节"].tolist()[:1] == ["春"]
+    assert pd.isna(result["季节"].iloc[1])
+    assert result["季节"].iloc[2] == "1"
+
+
+def test_uniform_frame_is_returned_unchanged():
+    df = pd.DataFrame({"商品": ["A", "B"], "库存": [1, 2]})
+    assert arrow_compatible(df) is df
+
+
+def test_series_key_ignores_dates_in_file_name():
+    assert series_key("周报_2024-05-12.xlsx") == "周报"
+    assert series_key("周报20240519.xlsx") == "周报"
+    assert series_key("周报(5.6-5.12).xlsx") == "周报"
+    assert series_key("周报.xlsx") == "周报"
+
+
+def test_series_key_without_pattern_uses_file_name():
+    assert series_key("周报_2024-05-12.xlsx", pattern=None) == "周报_2024-05-12"
+
+
+def test_previous_report_name():
+    # 新的一期与最近一期比较
+    assert previous_report_name({"latest": "周报_0512.xlsx"}, "周报_0519.xlsx") == "周报_0512.xlsx"
+    # 同一期重新上传时与再上一期比较
+    series = {"latest": "周报_0519.xlsx", "previous": "周报_0512.xlsx"}
+    assert previous_report_name(series, "周报_0519.xlsx") == "周报_0512.xlsx"
+    # 没有系列记录时与同名报告的上一版本比较
+    assert previous_report_name({}, "周报.xlsx") == "周报.xlsx"
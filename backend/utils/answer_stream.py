@@ -0,0 +1,159 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from config.db_connector import get_db_pool
+from config.general_config import ANALYSIS_CONFIG
+from config.schema import ensure_schema
+
+logger = logging.getLogger(__name__)
+
+STATUS_STREAMING = "streaming"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class AnswerCheckpointer:
+    """
+    把流式生成的回答分批追加写入 ai_analysis_stream 表，进程中断时已生成的内容不会丢失，
+    API服务也可以读取该表实时推送给前端
+
+    每次只追加上次写入后新增的部分，距上次写入超过interval秒或积累超过min_chars个字符时写入
+    """
+
+    def __init__(self, report_name: str,
+                 interval: float = ANALYSIS_CONFIG["stream_checkpoint_interval"],
+                 min_chars: int = ANALYSIS_CONFIG["stream_checkpoint_chars"]):
+        self.report_name = report_name
+        self.interval = interval
+        self.min_chars = min_chars
+        self._pending = []
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+
+    def start(self):
+        """
+        开始新一轮生成，清空上次的内容
+
+        失败或中断时已生成的内容保留到下一轮start()为止，重试会重新生成完整回答；
+        已保存到报告中的分析结果不受影响
+        """
+        self._execute(
+            "INSERT INTO ai_analysis_stream (report_name, content, status, error, started_time, updated_time) "
+            "VALUES (%s, '', %s, NULL, NOW(), NOW()) "
+            "ON DUPLICATE KEY UPDATE content = '', status = VALUES(status), error = NULL, "
+            "started_time = NOW(), updated_time = NOW()",
+            (self.report_name, STATUS_STREAMING)
+        )
+        self._last_flush = time.monotonic()
+
+    def append(self, text: str):
+        """记录新生成的内容，达到阈值时写入数据库"""
+        if not text:
+            return
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if self._pending_chars >= self.min_chars or time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self) -> bool:
+        """把未写入的内容追加到数据库，失败时保留到下次写入"""
+        if not self._pending:
+            return True
+        delta = "".join(self._pending)
+        ok = self._execute(
+            "UPDATE ai_analysis_stream SET content = CONCAT(content, %s), updated_time = NOW() "
+            "WHERE report_name = %s",
+            (delta, self.report_name)
+        )
+        if ok:
+            self._pending = []
+            self._pending_chars = 0
+        self._last_flush = time.monotonic()
+        return ok
+
+    def finish(self):
+        """回答生成完毕"""
+        self.flush()
+        self._set_status(STATUS_DONE)
+
+    def fail(self, error: str):
+        """生成失败，已生成的内容保留到下一轮start()"""
+        self.flush()
+        self._set_status(STATUS_FAILED, error)
+
+    def _set_status(self, status: str, error: Optional[str] = None):
+        self._execute(
+            "UPDATE ai_analysis_stream SET status = %s, error = %s, updated_time = NOW() WHERE report_name = %s",
+            (status, error, self.report_name)
+        )
+
+    def _execute(self, sql: str, params) -> bool:
+        # 写入失败只影响实时进度，不中断回答的生成
+        try:
+            with get_db_pool().connection() as connection:
+                ensure_schema(connection)
+                cursor = connection.cursor()
+                cursor.execute(sql, params)
+                connection.commit()
+                cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"写入 {self.report_name} 的回答进度失败: {str(e)}")
+            return False
+
+
+# 进程崩溃时状态停留在streaming，超过阈值未更新的记录视为失败
+_STALE_STATUS = (
+    "CASE WHEN status = %s AND updated_time < NOW() - INTERVAL %s SECOND THEN %s ELSE status END"
+)
+_STALE_ERROR = (
+    "CASE WHEN status = %s AND updated_time < NOW() - INTERVAL %s SECOND THEN %s ELSE error END"
+)
+STALE_ERROR = "回答生成中断"
+
+
+def _stale_params(stale_seconds: int):
+    return (STATUS_STREAMING, stale_seconds, STATUS_FAILED, STATUS_STREAMING, stale_seconds, STALE_ERROR)
+
+
+def read_answer_stream(report_name: str, offset: int = 0,
+                       stale_seconds: int = ANALYSIS_CONFIG["stream_stale_seconds"]) -> Optional[Dict[str, Any]]:
+    """
+    读取报告回答的生成进度
+
+    参数:
+        offset: 已读取的字符数，只返回之后的内容
+        stale_seconds: streaming状态超过该秒数未更新时按失败返回
+
+    返回:
+        {"status", "error", "run", "length", "delta"}，run为本轮生成的开始时间戳，
+        重试会开始新一轮生成并清空内容；没有生成记录时返回None
+    """
+    with get_db_pool().connection() as connection:
+        ensure_schema(connection)
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(
+            f"SELECT {_STALE_STATUS} AS status, {_STALE_ERROR} AS error, "
+            "UNIX_TIMESTAMP(started_time) AS run, CHAR_LENGTH(content) AS length, SUBSTRING(content, %s) AS delta "
+            "FROM ai_analysis_stream WHERE report_name = %s",
+            _stale_params(stale_seconds) + (offset + 1, report_name)
+        )
+        row = cursor.fetchone()
+        cursor.close()
+    return row
+
+
+def answer_stream_status(report_name: str,
+                         stale_seconds: int = ANALYSIS_CONFIG["stream_stale_seconds"]) -> Optional[str]:
+    """返回报告回答的生成状态，没有生成记录时返回None，超时未更新的streaming记录返回failed"""
+    with get_db_pool().connection() as connection:
+        ensure_schema(connection)
+        cursor = connection.cursor()
+        cursor.execute(
+            f"SELECT {_STALE_STATUS} FROM ai_analysis_stream WHERE report_name = %s",
+            _stale_params(stale_seconds)[:3] + (report_name,)
+        )
+        row = cursor.fetchone()
+        cursor.close()
+    return row[0] if row else None
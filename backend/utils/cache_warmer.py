@@ -0,0 +1,39 @@
+import logging
+from typing import Any, Dict, Iterable
+
+import requests
+
+from config.general_config import WARMUP_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def warm_report_cache(report_names: Iterable[str]) -> Dict[str, Any]:
+    """
+    通知API服务预先加载报告并生成聚合和图表，首次打开报告时无需冷加载
+
+    返回:
+        API服务返回的每个报告的预热结果，未配置或请求失败时返回空字典，不抛出异常
+    """
+    report_names = list(report_names)
+    base_url = WARMUP_CONFIG["render_api_url"]
+    if not report_names or not base_url:
+        return {}
+
+    try:
+        response = requests.post(
+            f"{base_url.rstrip('/')}/cache/warm",
+            json={"report_names": report_names},
+            timeout=WARMUP_CONFIG["timeout"],
+        )
+        response.raise_for_status()
+        results = response.json().get("results", {})
+        for report_name, status in results.items():
+            if status.get("success"):
+                logger.info(f"报告 {report_name} 缓存预热完成，耗时 {status.get('elapsed')} 秒")
+            else:
+                logger.warning(f"报告 {report_name} 缓存预热失败: {status.get('error')}")
+        return results
+    except Exception as e:
+        logger.warning(f"缓存预热请求失败: {str(e)}")
+        return {}
@@ -0,0 +1,262 @@
+import json
+import logging
+from typing import Any, Dict
+
+import pandas as pd
+from pyecharts import options as opts
+from pyecharts.charts import Bar
+from pyecharts.globals import ThemeType
+
+from utils.report_metrics import TOTAL_LABEL, detect_category_column
+
+logger = logging.getLogger(__name__)
+
+CHART_TYPE_MOM = "环比"    # 环比百分比图
+CHART_TYPE_VALUE = "数值"  # 本期数值图
+
+# 图表子类型 -> (数值列, 环比列)
+CHART_METRICS = {
+    "货号": ("上周货号数", "货号环比"),
+    "货值": ("上周货值", "货值环比"),
+    "库存": ("库存数", "库存环比"),
+    "销售": ("上周销售", "销售环比"),
+    "UV": ("上周UV", "UV环比"),
+}
+
+# 工作表只有通用的"环比"列时，该列对应的子类型需要存在的数值列（None表示无需检查）
+GENERIC_RATIO_COLUMN = "环比"
+GENERIC_RATIO_REQUIRES = {
+    "货号": None,
+    "货值": "上周货值",
+    "库存": "库存数",
+    "销售": "上周销售",
+    "UV": "UV",
+}
+
+# 环比图正负值的颜色
+POSITIVE_COLOR = "#91cc75"
+NEGATIVE_COLOR = "#ee6666"
+POSITIVE_LABEL_COLOR = "#3f8600"
+NEGATIVE_LABEL_COLOR = "#cf1322"
+
+# 价格段和是否动销工作表中不单独展示的细分价格段
+PRICE_SEGMENTS = {
+    "100-149", "150-199", "200-249", "250-299", "300-349", "350-399",
+    "400-449", "450-499", "500-549", "550-599", "600以上",
+}
+
+
+# 图表创建函数
+def create_bar_chart(df, x_col, y_col, title=None, is_percentage=False, orientation="v"):
+    """创建柱状图"""
+    # 处理数据
+    df_chart = df.copy()
+    
+    # 检查是否为货值或销售相关图表，转换为万元单位
+    is_value_chart = '货值' in y_col or '销售' in y_col
+    unit_text = ""
+    
+    if is_value_chart and not is_percentage:
+        # 转换为万元
+        df_chart[y_col] = df_chart[y_col] / 10000
+        unit_text = "(万元)"
+    
+    # 创建柱状图
+    chart = Bar(init_opts=opts.InitOpts(width="100%", height="400px", theme=ThemeType.LIGHT))
+    
+    # 设置图表数据
+    if orientation == "h":
+        # 水平方向
+        chart.add_xaxis(df_chart[y_col].tolist())
+        chart.add_yaxis("", df_chart[x_col].tolist())
+    else:
+        # 垂直方向
+        chart.add_xaxis(df_chart[x_col].tolist())
+        chart.add_yaxis("", df_chart[y_col].tolist())
+    
+    # 添加单位到标题
+    if title and is_value_chart and not is_percentage:
+        title = f"{title}{unit_text}"
+    
+    # 设置标题和样式
+    chart.set_global_opts(
+        title_opts=opts.TitleOpts(title=title),
+        toolbox_opts=opts.ToolboxOpts(),
+        tooltip_opts=opts.TooltipOpts(trigger="axis"),
+        datazoom_opts=[opts.DataZoomOpts()],
+    )
+    
+    # 为环比和占比添加百分比格式化，并添加0值参考线
+    if is_percentage:
+        chart.set_series_opts(
+            label_opts=opts.LabelOpts(formatter="{c}%", position="top"),
+            markline_opts=opts.MarkLineOpts(
+                is_silent=True,
+                data=[opts.MarkLineItem(y=0)],
+                linestyle_opts=opts.LineStyleOpts(color="#333"),
+            ),
+        )
+    else:
+        # 为货值和销售额图表添加单位提示
+        if is_value_chart:
+            chart.set_series_opts(
+                label_opts=opts.LabelOpts(formatter="{c} 万元", position="top"),
+            )
+        else:
+            chart.set_series_opts(
+                label_opts=opts.LabelOpts(formatter="{c}", position="top"),
+            )
+    
+    return chart
+
+
+def _signed_percent(value: float) -> str:
+    return f"+{value:.2f}%" if value >= 0 else f"{value:.2f}%"
+
+
+def percent_chart_options(df: pd.DataFrame, x_col: str, y_col: str, title: str) -> Dict[str, Any]:
+    """
+    生成环比百分比柱状图的ECharts配置，与原先前端生成的样式一致：
+    正值绿色、负值红色，标签和提示带正负号，标签按正负放在柱子上方或下方
+
+    配置需要能JSON序列化，原先由函数计算的样式逐项写入数据中
+    """
+    categories = df[x_col].tolist()
+    data = []
+    for category, value in zip(categories, df[y_col].tolist()):
+        positive = value >= 0
+        text = _signed_percent(value)
+        data.append({
+            "name": category,
+            "value": value,
+            "label": {
+                "position": "top" if positive else "bottom",
+                "formatter": text,
+                "color": POSITIVE_LABEL_COLOR if positive else NEGATIVE_LABEL_COLOR,
+            },
+            "itemStyle": {"color": POSITIVE_COLOR if positive else NEGATIVE_COLOR},
+            "tooltip": {"formatter": f"{category}: {text}"},
+        })
+
+    return {
+        "title": {"text": title, "left": "center"},
+        # 提示内容随数据项给出，因此按数据项触发
+        "tooltip": {"trigger": "item"},
+        "grid": {"left": "5%", "right": "5%", "bottom": "10%", "top": "15%", "containLabel": True},
+        "xAxis": {
+            "type": "category",
+            "data": categories,
+            "axisLabel": {"interval": 0, "rotate": 30 if len(categories) > 8 else 0, "fontSize": 12},
+        },
+        "yAxis": {
+            "type": "value",
+            "name": "环比百分比(%)",
+            "axisLine": {"show": True},
+            "axisLabel": {"formatter": "{value}%"},
+        },
+        "series": [{
+            "name": "环比百分比",
+            "type": "bar",
+            "data": data,
+            "showBackground": True,
+            "backgroundStyle": {"color": "rgba(180, 180, 180, 0.2)"},
+            "label": {"show": True},
+            "markLine": {"silent": True, "lineStyle": {"color": "#333"}, "data": [{"yAxis": 0}]},
+        }],
+    }
+
+
+def chart_categories(categories, sheet_name: str) -> list:
+    """过滤掉不参与展示的分类值，规则与可视化面板保持一致"""
+    result = []
+    for cat in categories:
+        # 基本过滤条件
+        if cat in ("是", "否", "", None) or (isinstance(cat, float) and pd.isna(cat)):
+            continue
+        # 对于"是否周新款"工作表，保留总计数据
+        if cat == TOTAL_LABEL and sheet_name != "是否周新款":
+            continue
+        # 对价格段和是否动销sheet进行特殊处理
+        if sheet_name in ("价格段", "是否动销") and cat in PRICE_SEGMENTS:
+            continue
+        # 特别过滤"是否动销"工作表中的"-2146826246"字段
+        if sheet_name == "是否动销" and str(cat) == "-2146826246":
+            continue
+        result.append(cat)
+    return result
+
+
+def chart_frame(df: pd.DataFrame, category_col: str, value_col: str, sheet_name: str) -> pd.DataFrame:
+    """
+    准备单个图表的数据：每个分类取第一条非0值，按绝对值从大到小排序
+    """
+    categories = chart_categories(df[category_col].unique(), sheet_name)
+    frame = df.loc[df[category_col].isin(categories), [category_col, value_col]].copy()
+    values = frame[value_col]
+    if values.dtype == object:
+        # 兼容"12.5%"形式的百分比文本
+        values = values.map(lambda v: v.replace("%", "") if isinstance(v, str) else v)
+    frame[value_col] = pd.to_numeric(values, errors="coerce")
+    frame = frame[frame[value_col].notna() & (frame[value_col] != 0)]
+    frame = frame.drop_duplicates(subset=category_col, keep="first")
+    frame[value_col] = frame[value_col].round(2)
+    # 分类保持原始取值，前端按原值筛选
+    frame[category_col] = frame[category_col].astype(object)
+    order = frame[value_col].abs().sort_values(ascending=False).index
+    return frame.loc[order]
+
+
+def ratio_column(df: pd.DataFrame, sub_type: str, ratio_col: str):
+    """子类型使用的环比列，没有专门的环比列时使用通用的"环比"列"""
+    if ratio_col in df.columns:
+        return ratio_col
+    if GENERIC_RATIO_COLUMN in df.columns:
+        required = GENERIC_RATIO_REQUIRES.get(sub_type)
+        if required is None or required in df.columns:
+            return GENERIC_RATIO_COLUMN
+    return None
+
+
+def _chart_options(chart: Bar) -> Dict[str, Any]:
+    """导出ECharts配置，单个坐标轴展开为对象，便于前端直接修改data"""
+    options = json.loads(chart.dump_options())
+    for axis in ("xAxis", "yAxis"):
+        if isinstance(options.get(axis), list) and len(options[axis]) == 1:
+            options[axis] = options[axis][0]
+    return options
+
+
+def build_sheet_charts(df: pd.DataFrame, sheet_name: str) -> Dict[str, Any]:
+    """
+    为工作表生成所有可用的ECharts配置
+
+    参数:
+        df: 已附带环比列的现期数据
+
+    返回:
+        {"category_col": 分类列, "charts": {图表类型: {子类型: {"title": 标题, "options": ECharts配置}}}}
+    """
+    category_col = detect_category_column(df, sheet_name)
+    charts = {CHART_TYPE_MOM: {}, CHART_TYPE_VALUE: {}}
+    if category_col is None:
+        return {"category_col": None, "charts": charts}
+
+    for sub_type, (value_col, ratio_col) in CHART_METRICS.items():
+        for chart_type, column, title in (
+            (CHART_TYPE_MOM, ratio_column(df, sub_type, ratio_col), f"{sheet_name}{ratio_col}分析"),
+            (CHART_TYPE_VALUE, value_col, f"{sheet_name}{value_col}"),
+        ):
+            if column is None or column not in df.columns:
+                continue
+            try:
+                frame = chart_frame(df, category_col, column, sheet_name)
+                if frame.empty:
+                    continue
+                if chart_type == CHART_TYPE_MOM:
+                    options = percent_chart_options(frame, category_col, column, title)
+                else:
+                    options = _chart_options(create_bar_chart(frame, category_col, column, title=title))
+                charts[chart_type][sub_type] = {"title": title, "options": options}
+            except Exception as e:
+                logger.error(f"生成工作表 {sheet_name} 的 {column} 图表失败: {str(e)}")
+    return {"category_col": category_col, "charts": charts}
@@ -0,0 +1,192 @@
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from config.db_connector import get_db_pool
+from config.general_config import JOB_CONFIG
+from config.schema import ensure_schema
+
+logger = logging.getLogger(__name__)
+
+# 任务阶段，按执行顺序排列，stage记录最后完成的阶段
+STAGE_QUEUED = "queued"
+STAGE_UPLOADED = "uploaded"
+STAGE_PARSING = "parsing"
+STAGE_PARSED = "parsed"
+STAGE_ANSWERING = "answering"
+STAGE_SAVED = "saved"
+STAGES = [STAGE_QUEUED, STAGE_UPLOADED, STAGE_PARSING, STAGE_PARSED, STAGE_ANSWERING, STAGE_SAVED]
+
+# 任务状态
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# 允许随阶段一起更新的列
+_STAGE_FIELDS = ("file_hash", "document_id", "question")
+
+
+def _fetch_all(sql: str, params=()) -> List[Dict[str, Any]]:
+    with get_db_pool().connection() as connection:
+        ensure_schema(connection)
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+def _execute(sql: str, params=()) -> int:
+    """执行更新语句，返回受影响的行数"""
+    with get_db_pool().connection() as connection:
+        ensure_schema(connection)
+        cursor = connection.cursor()
+        cursor.execute(sql, params)
+        affected = cursor.rowcount
+        connection.commit()
+        cursor.close()
+    return affected
+
+
+def enqueue_job(file_path: str, max_attempts: int = JOB_CONFIG["max_attempts"]) -> Dict[str, Any]:
+    """
+    添加分析任务，同一报告已有未完成的任务时直接返回该任务
+
+    返回:
+        任务记录，包含 created 表示是否新建
+    """
+    report_name = os.path.basename(file_path)
+    with get_db_pool().connection() as connection:
+        ensure_schema(connection)
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(
+                "SELECT * FROM analysis_jobs WHERE report_name = %s AND status IN (%s, %s) "
+                "ORDER BY id LIMIT 1 FOR UPDATE",
+                (report_name, STATUS_PENDING, STATUS_RUNNING)
+            )
+            existing = cursor.fetchone()
+            if existing:
+                connection.commit()
+                return {**existing, "created": False}
+
+            cursor.execute(
+                "INSERT INTO analysis_jobs (report_name, file_path, stage, status, attempts, max_attempts, "
+                "created_time, updated_time) VALUES (%s, %s, %s, %s, 0, %s, NOW(), NOW())",
+                (report_name, file_path, STAGE_QUEUED, STATUS_PENDING, max_attempts)
+            )
+            job_id = cursor.lastrowid
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+    logger.info(f"新增分析任务 {job_id}: {report_name}")
+    return {**get_job(job_id), "created": True}
+
+
+def claim_job(worker_id: str, lease_seconds: int = JOB_CONFIG["lease_seconds"]) -> Optional[Dict[str, Any]]:
+    """
+    领取一个待执行的任务，租约已过期的运行中任务（工作进程崩溃）也会被重新领取
+
+    使用 FOR UPDATE SKIP LOCKED，多个工作进程同时领取时不会拿到同一个任务
+    """
+    with get_db_pool().connection() as connection:
+        ensure_schema(connection)
+        cursor = connection.cursor(dictionary=True)
+        try:
+            # 次数已用完且租约过期的任务不会再被领取，直接标记为失败
+            cursor.execute(
+                "UPDATE analysis_jobs SET status = %s, error = COALESCE(error, '工作进程多次中断'), "
+                "lease_owner = NULL, lease_expires = NULL, updated_time = NOW(), finished_time = NOW() "
+                "WHERE status = %s AND lease_expires < NOW() AND attempts >= max_attempts",
+                (STATUS_FAILED, STATUS_RUNNING)
+            )
+            cursor.execute(
+                "SELECT * FROM analysis_jobs "
+                "WHERE (status = %s OR (status = %s AND lease_expires < NOW())) AND attempts < max_attempts "
+                "ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED",
+                (STATUS_PENDING, STATUS_RUNNING)
+            )
+            job = cursor.fetchone()
+            if job is None:
+                connection.commit()
+                return None
+
+            cursor.execute(
+                "UPDATE analysis_jobs SET status = %s, lease_owner = %s, "
+                "lease_expires = NOW() + INTERVAL %s SECOND, attempts = attempts + 1, updated_time = NOW() "
+                "WHERE id = %s",
+                (STATUS_RUNNING, worker_id, lease_seconds, job["id"])
+            )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    job.update(status=STATUS_RUNNING, lease_owner=worker_id, attempts=job["attempts"] + 1)
+    logger.info(f"{worker_id} 领取任务 {job['id']}: {job['report_name']}，从阶段 {job['stage']} 继续")
+    return job
+
+
+def renew_lease(job_id: int, worker_id: str, lease_seconds: int = JOB_CONFIG["lease_seconds"]) -> bool:
+    """续约，租约已被其他进程接手时返回False"""
+    return _execute(
+        "UPDATE analysis_jobs SET lease_expires = NOW() + INTERVAL %s SECOND, updated_time = NOW() "
+        "WHERE id = %s AND lease_owner = %s AND status = %s",
+        (lease_seconds, job_id, worker_id, STATUS_RUNNING)
+    ) > 0
+
+
+def advance_stage(job_id: int, worker_id: str, stage: str, **fields) -> bool:
+    """记录任务完成的阶段，可同时更新file_hash、document_id、question"""
+    assignments = ["stage = %s", "updated_time = NOW()"]
+    params = [stage]
+    for name in _STAGE_FIELDS:
+        if name in fields:
+            assignments.append(f"{name} = %s")
+            params.append(fields[name])
+    params.extend([job_id, worker_id])
+    return _execute(
+        f"UPDATE analysis_jobs SET {', '.join(assignments)} WHERE id = %s AND lease_owner = %s",
+        params
+    ) > 0
+
+
+def complete_job(job_id: int, worker_id: str) -> bool:
+    return _execute(
+        "UPDATE analysis_jobs SET stage = %s, status = %s, error = NULL, lease_owner = NULL, lease_expires = NULL, "
+        "updated_time = NOW(), finished_time = NOW() WHERE id = %s AND lease_owner = %s",
+        (STAGE_SAVED, STATUS_DONE, job_id, worker_id)
+    ) > 0
+
+
+def fail_job(job_id: int, worker_id: str, error: str) -> bool:
+    """
+    记录失败，还有剩余次数时放回队列，从最后完成的阶段重试
+    """
+    return _execute(
+        "UPDATE analysis_jobs SET error = %s, lease_owner = NULL, lease_expires = NULL, updated_time = NOW(), "
+        "status = IF(attempts < max_attempts, %s, %s), "
+        "finished_time = IF(attempts < max_attempts, NULL, NOW()) "
+        "WHERE id = %s AND lease_owner = %s",
+        (error, STATUS_PENDING, STATUS_FAILED, job_id, worker_id)
+    ) > 0
+
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    rows = _fetch_all("SELECT * FROM analysis_jobs WHERE id = %s", (job_id,))
+    return rows[0] if rows else None
+
+
+def list_jobs(status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    """按创建时间倒序列出任务"""
+    if status:
+        return _fetch_all(
+            "SELECT * FROM analysis_jobs WHERE status = %s ORDER BY id DESC LIMIT %s", (status, limit)
+        )
+    return _fetch_all("SELECT * FROM analysis_jobs ORDER BY id DESC LIMIT %s", (limit,))
@@ -0,0 +1,129 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from config.general_config import SERVER_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class ParseBusy(Exception):
+    """解析暂时无法完成，retry_after秒后重试"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ParseQueueFull(ParseBusy):
+    """解析队列已满，调用方应提示稍后重试"""
+
+
+class ParseTimeout(ParseBusy):
+    """等待解析结果超时，解析仍在后台继续"""
+
+
+class ParseExecutor:
+    """
+    有界的解析线程池：最多 workers 个任务同时执行，另有 queue_depth 个任务排队，
+    超出后立即拒绝
+
+    请求线程最多等待 timeout 秒，超时后任务继续在后台执行，请求返回503由客户端稍后重试，
+    慢报告不会长时间占用请求线程；同一key的任务只执行一次，重试的请求等待同一个任务
+    """
+
+    def __init__(self, workers: int, queue_depth: int, timeout: Optional[float] = None,
+                 retry_after: int = 5):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="excel-parse")
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        self._lock = threading.Lock()
+        self._futures: Dict[Hashable, Future] = {}
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+
+    def run(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        在解析线程池中执行fn并最多等待timeout秒，同一key已在执行时等待该任务
+
+        队列已满时抛出ParseQueueFull；超时抛出ParseTimeout，任务继续执行，
+        fn应自行保存结果（如写入缓存），重试的请求直接读取
+        """
+        submitted = False
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                if not self._slots.acquire(blocking=False):
+                    self._rejected += 1
+                    raise ParseQueueFull(f"解析队列已满({self.workers}个执行中, {self.queue_depth}个排队)",
+                                         self.retry_after)
+                try:
+                    future = self._executor.submit(fn, *args, **kwargs)
+                except Exception:
+                    self._slots.release()
+                    raise
+                self._futures[key] = future
+                self._pending += 1
+                submitted = True
+        # 任务已完成时回调会立即执行，不能在持有锁时注册
+        if submitted:
+            future.add_done_callback(lambda _: self._release(key))
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # 任务仍在后台执行，完成后释放名额
+            with self._lock:
+                self._timeouts += 1
+            raise ParseTimeout(f"解析超过 {self.timeout} 秒未完成，请稍后重试", self.retry_after)
+
+    def _release(self, key: Hashable):
+        with self._lock:
+            self._futures.pop(key, None)
+            self._pending -= 1
+            self._completed += 1
+        self._slots.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_parse_executor = None
+_parse_executor_lock = threading.Lock()
+
+
+def get_parse_executor() -> ParseExecutor:
+    """获取进程内共享的解析线程池"""
+    global _parse_executor
+    if _parse_executor is None:
+        with _parse_executor_lock:
+            if _parse_executor is None:
+                _parse_executor = ParseExecutor(
+                    workers=SERVER_CONFIG["parse_workers"],
+                    queue_depth=SERVER_CONFIG["parse_queue_depth"],
+                    timeout=SERVER_CONFIG["parse_wait"],
+                    retry_after=SERVER_CONFIG["parse_retry_after"],
+                )
+                logger.info(
+                    f"解析线程池已创建: {SERVER_CONFIG['parse_workers']} 个线程, "
+                    f"队列深度 {SERVER_CONFIG['parse_queue_depth']}"
+                )
+    return _parse_executor
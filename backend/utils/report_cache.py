@@ -0,0 +1,219 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 内存区间 (起始地址, 结束地址)
+Range = Tuple[int, int]
+
+
+class CacheEntry:
+    """
+    缓存中的单个报告，保存处理后的sheets以及基于它派生出的数据
+    """
+
+    def __init__(self, report_name: str, version: str, sheets: Dict[str, pd.DataFrame],
+                 size: Optional[int] = None):
+        self.report_name = report_name
+        self.version = version
+        self.sheets = sheets
+        self.size = estimate_sheets_size(sheets) if size is None else size
+        self.derived: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._on_grow: Optional[Callable[["CacheEntry", int], None]] = None
+
+    def get_derived(self, name: str, builder: Callable[[Dict[str, pd.DataFrame]], Any]) -> Any:
+        """
+        获取派生数据（聚合、图表等），不存在时调用builder生成，随报告一起失效
+
+        派生数据中与sheets共用的列不重复计算，其余字节计入缓存预算
+        """
+        with self._lock:
+            if name not in self.derived:
+                value = builder(self.sheets)
+                self.derived[name] = value
+                added = estimate_object_size(value, sheet_ranges(self.sheets))
+                if self._on_grow is not None:
+                    self._on_grow(self, added)
+                else:
+                    self.size += added
+            return self.derived[name]
+
+
+def _column_range(series: pd.Series) -> Optional[Range]:
+    """数值列底层数组的内存区间，非numpy数组时返回None"""
+    if not (pd.api.types.is_integer_dtype(series.dtype) or pd.api.types.is_float_dtype(series.dtype)
+            or pd.api.types.is_bool_dtype(series.dtype)):
+        return None
+    try:
+        values = np.asarray(series.array)
+    except (TypeError, ValueError):
+        return None
+    start = values.__array_interface__["data"][0]
+    return start, start + values.nbytes
+
+
+def sheet_ranges(sheets: Dict[str, pd.DataFrame]) -> List[Range]:
+    """sheets中数值列占用的内存区间，派生数据引用这些列时不重复计算"""
+    ranges = []
+    for df in sheets.values():
+        for col in range(df.shape[1]):
+            column_range = _column_range(df.iloc[:, col])
+            if column_range is not None and column_range[1] > column_range[0]:
+                ranges.append(column_range)
+    return ranges
+
+
+def _within(column_range: Range, ranges: Iterable[Range]) -> bool:
+    start, end = column_range
+    return any(low <= start and end <= high for low, high in ranges)
+
+
+def frame_bytes(df: pd.DataFrame, shared: Iterable[Range] = ()) -> int:
+    """
+    DataFrame实际占用的字节数，底层数组位于shared区间内的数值列不计入
+    （如共享缓存映射的页面，或已经计入的sheets中的列）
+    """
+    shared = list(shared)
+    # 第一项为索引，之后按列的位置排列，列名可能重复
+    usage = df.memory_usage(index=True, deep=True)
+    total = int(usage.iloc[0])
+    for col in range(df.shape[1]):
+        column_range = _column_range(df.iloc[:, col])
+        if column_range is not None and shared and _within(column_range, shared):
+            continue
+        total += int(usage.iloc[col + 1])
+    return total
+
+
+def estimate_object_size(value: Any, shared: Iterable[Range] = (), _seen: Optional[set] = None) -> int:
+    """估算派生数据占用的字节数，递归统计容器和对象属性"""
+    shared = shared if isinstance(shared, list) else list(shared)
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return frame_bytes(value, shared)
+    if isinstance(value, pd.Series):
+        return frame_bytes(value.to_frame(), shared)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        items = [item for pair in value.items() for item in pair]
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = list(value)
+    elif hasattr(value, "__dict__") and not isinstance(value, type):
+        items = list(vars(value).values())
+    else:
+        items = []
+    return size + sum(estimate_object_size(item, shared, seen) for item in items)
+
+
+def estimate_sheets_size(sheets: Dict[str, pd.DataFrame]) -> int:
+    """估算sheets占用的内存字节数"""
+    total = 0
+    for df in sheets.values():
+        try:
+            total += int(df.memory_usage(index=True, deep=True).sum())
+        except Exception:
+            total += 0
+    return total
+
+
+class ReportCache:
+    """
+    进程内的报告缓存，按 (报告名, 版本) 作为键，超出字节预算时按LRU淘汰
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, report_name: str, version: str) -> Optional[CacheEntry]:
+        """
+        查询缓存，版本不一致时视为未命中并移除旧数据
+        """
+        with self._lock:
+            entry = self._entries.get(report_name)
+            if entry is None or entry.version != version:
+                if entry is not None:
+                    self._remove(report_name)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(report_name)
+            self.hits += 1
+            return entry
+
+    def put(self, report_name: str, version: str, sheets: Dict[str, pd.DataFrame],
+            size: Optional[int] = None) -> CacheEntry:
+        """
+        写入缓存，返回缓存条目
+
+        参数:
+            size: 计入预算的字节数，未提供时按sheets的内存占用估算
+        """
+        entry = CacheEntry(report_name, version, sheets, size)
+        with self._lock:
+            if report_name in self._entries:
+                self._remove(report_name)
+            # 单个报告超过预算时不缓存
+            if entry.size > self.max_bytes:
+                return entry
+            self._entries[report_name] = entry
+            self._current_bytes += entry.size
+            entry._on_grow = self._grow
+            self._evict()
+        return entry
+
+    def _grow(self, entry: CacheEntry, added: int):
+        """条目生成派生数据后增加占用，超出预算时按LRU淘汰"""
+        with self._lock:
+            entry.size += added
+            if self._entries.get(entry.report_name) is not entry:
+                return
+            self._current_bytes += added
+            self._evict()
+
+    def _evict(self):
+        while self._current_bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, report_name: Optional[str] = None):
+        """使指定报告（或全部报告）的缓存失效"""
+        with self._lock:
+            if report_name is None:
+                self._entries.clear()
+                self._current_bytes = 0
+            elif report_name in self._entries:
+                self._remove(report_name)
+
+    def _remove(self, report_name: str):
+        entry = self._entries.pop(report_name)
+        self._current_bytes -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "reports": list(self._entries.keys()),
+            }
@@ -0,0 +1,199 @@
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 环比列名 -> 计算所用的数值列
+MOM_COLUMNS = {
+    "货号环比": "上周货号数",
+    "货值环比": "上周货值",
+    "库存环比": "库存数",
+    "销售环比": "上周销售",
+    "UV环比": "上周UV",
+}
+
+# 常见的分类列名，顺序与前端一致
+CATEGORY_COLUMNS = ["三级分类", "是否本季新款", "是否周新款", "是否动销", "价格段", "四级分类", "资源分布"]
+
+BASE_PERIOD_SUFFIX = "_基期"
+
+
+def detect_category_column(df: pd.DataFrame, sheet_name: str) -> Optional[str]:
+    """
+    推断工作表用于分组展示的分类列，规则与可视化面板保持一致
+    """
+    if df.empty:
+        return None
+
+    # 货盘概况不使用"是否动销"作为分类列
+    if sheet_name == "货盘概况":
+        for col in CATEGORY_COLUMNS:
+            if col != "是否动销" and col in df.columns:
+                return col
+
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            return col
+
+    # 如果没有找到预设的分类列，返回第一个字符串列
+    first_row = df.iloc[0]
+    for col in df.columns:
+        if isinstance(first_row[col], str) and "时间" not in str(col):
+            return col
+    return None
+
+
+def compute_period_ratios(current: pd.DataFrame, base: pd.DataFrame, category_col: str) -> pd.DataFrame:
+    """
+    按分类列关联现期和基期数据，一次性计算所有环比(%)
+
+    参数:
+        current: 现期数据
+        base: 基期数据
+        category_col: 关联使用的分类列
+
+    返回:
+        增加了环比列的现期数据（浅拷贝，其余列与current共用），找不到基期或基期为0时对应值为None，
+        工作表已有的环比列在这些位置保留原值
+    """
+    value_cols = [col for col in MOM_COLUMNS.values() if col in current.columns and col in base.columns]
+    if category_col not in current.columns or category_col not in base.columns or not value_cols:
+        return current
+
+    # 同一分类在基期出现多次时取第一条
+    base_values = base[[category_col] + value_cols].drop_duplicates(subset=category_col, keep="first")
+    base_values = base_values.rename(columns={col: f"{col}__base" for col in value_cols})
+    merged = current[[category_col] + value_cols].merge(base_values, on=category_col, how="left")
+
+    # "是"/"否"子分类不计算环比
+    is_sub_category = merged[category_col].isin(["是", "否"]).to_numpy()
+
+    # 浅拷贝只新建列索引，原有列继续引用sheets（可能是共享缓存映射的页面），环比列整列替换
+    result = current.copy(deep=False)
+    for ratio_col, value_col in MOM_COLUMNS.items():
+        if value_col not in value_cols:
+            continue
+        base_series = pd.to_numeric(merged[f"{value_col}__base"], errors="coerce")
+        current_series = pd.to_numeric(merged[value_col], errors="coerce")
+        valid = base_series.notna() & (base_series != 0) & ~is_sub_category
+        if not valid.any():
+            continue
+        ratios = ((current_series - base_series) / base_series * 100).round(2).astype(object)
+        if ratio_col in result.columns:
+            # 工作表自带环比列时只替换能计算的位置，其余保留原值
+            original = result[ratio_col].to_numpy(dtype=object)
+            result[ratio_col] = np.where(valid.to_numpy(), ratios.to_numpy(), original)
+        else:
+            # 无法计算的位置用None，序列化为JSON null
+            result[ratio_col] = ratios.where(valid, None).to_numpy()
+    return result
+
+
+def build_period_ratios(sheets: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    为所有存在基期数据的工作表计算环比，返回替换后的sheets（基期数据保持不变）
+    """
+    enriched = dict(sheets)
+    for sheet_name, df in sheets.items():
+        base = sheets.get(f"{sheet_name}{BASE_PERIOD_SUFFIX}")
+        if base is None or sheet_name.endswith(BASE_PERIOD_SUFFIX):
+            continue
+        category_col = detect_category_column(df, sheet_name)
+        if category_col is None:
+            continue
+        try:
+            enriched[sheet_name] = compute_period_ratios(df, base, category_col)
+        except Exception as e:
+            logger.error(f"计算工作表 {sheet_name} 的环比失败: {str(e)}")
+    return enriched
+
+
+# 分类页展示的汇总指标 -> 对应的数值列
+SUMMARY_COLUMNS = {
+    "total_goods": "上周货号数",
+    "total_value": "上周货值",
+    "total_inventory": "库存数",
+    "total_sales": "上周销售",
+}
+
+TOTAL_LABEL = "总计"
+
+
+# 根据工作表名获取对应的分类列
+def get_category_column(sheet_name):
+    """根据工作表名称返回对应的分类列名称"""
+    
+    category_mapping = {
+        "是否动销": "价格段",
+        "季节": "是否动销",
+        "活动栏目": "资源分布",
+        "货盘概况": "是否动销"
+    }
+    
+    # 如果是特殊工作表，返回映射的分类列名
+    if sheet_name in category_mapping:
+        return category_mapping[sheet_name]
+    
+    # 对于其他工作表，默认使用工作表名作为分类列
+    return sheet_name
+
+
+class CategoryIndex:
+    """
+    单个工作表按分类列预先聚合的指标，加载报告后构建一次，随报告缓存一起失效
+    """
+
+    def __init__(self, df: pd.DataFrame, category_col: str):
+        self.category_col = category_col
+        value_cols = [col for col in SUMMARY_COLUMNS.values() if col in df.columns]
+        numeric = df[value_cols].apply(pd.to_numeric, errors="coerce").fillna(0)
+
+        if category_col in df.columns:
+            # 每个分类的合计
+            self.totals = numeric.groupby(df[category_col], sort=False, observed=True).sum()
+            total_rows = numeric[(df[category_col] == TOTAL_LABEL).to_numpy()]
+        else:
+            self.totals = pd.DataFrame(columns=value_cols)
+            total_rows = numeric.iloc[0:0]
+
+        if not total_rows.empty:
+            # 使用已有的总计行数据
+            self._summary = total_rows.iloc[0]
+            logger.info(f"检测到总计行: {self._summary.to_dict()}")
+        elif category_col in df.columns:
+            # 计算除总计行外的所有数据总和
+            self._summary = self.totals.drop(index=TOTAL_LABEL, errors="ignore").sum()
+        else:
+            # 没有分类列时各项指标为0，与原先的分类页一致
+            self._summary = pd.Series(dtype=float)
+        self._metrics = self._build_metrics()
+
+    def _build_metrics(self) -> Dict[str, float]:
+        def value(metric):
+            col = SUMMARY_COLUMNS[metric]
+            return self._summary[col] if col in self._summary.index else 0
+
+        return {
+            "total_goods": int(value("total_goods")),
+            "total_value": float(value("total_value")) / 10000,  # 已转换为万元单位
+            "total_inventory": int(value("total_inventory")),
+            "total_sales": float(value("total_sales")) / 10000  # 已转换为万元单位
+        }
+
+    def metrics(self) -> Dict[str, float]:
+        """返回分类页的汇总指标"""
+        return dict(self._metrics)
+
+
+def build_category_indexes(sheets: Dict[str, pd.DataFrame]) -> Dict[str, CategoryIndex]:
+    """为报告的每个工作表构建分类聚合索引"""
+    indexes = {}
+    for sheet_name, df in sheets.items():
+        try:
+            indexes[sheet_name] = CategoryIndex(df, get_category_column(sheet_name))
+        except Exception as e:
+            logger.error(f"构建工作表 {sheet_name} 的分类索引失败: {str(e)}")
+    return indexes
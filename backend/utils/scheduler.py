@@ -2,16 +2,113 @@ import os
 import glob
 import datetime
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from apscheduler.schedulers.blocking import BlockingScheduler
 import logging 
 logger = logging.getLogger(__name__)
 
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from analytics.ai_analysis import ai_analysis
-from config.general_config import APP_CONFIG
+from analytics.ai_analysis import ai_analysis, ai_analysis_batch
+from config.general_config import APP_CONFIG, ANALYSIS_CONFIG
+from utils.cache_warmer import warm_report_cache
+from utils.job_queue import enqueue_job
 
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER")
+
+
+def _finalize_result(file_path, result, total):
+    """补充文件名和总耗时，并记录失败日志"""
+    file_name = os.path.basename(file_path)
+    result["file_name"] = file_name
+    result.setdefault("timings", {})["total"] = round(total, 3)
+
+    if not result["success"]:
+        logger.error(f"分析失败: {file_name} {result['error']}")
+    return result
+
+
+def analyze_file(file_path):
+    """分析单个文件，记录总耗时，异常时也返回结果字典"""
+    logger.info(f"分析文件: {os.path.basename(file_path)}")
+    start = time.monotonic()
+    try:
+        result = ai_analysis(file_path, save_to_db=True)
+    except Exception as e:
+        result = {"success": False, "answer": "", "error": str(e), "timings": {}}
+    return _finalize_result(file_path, result, time.monotonic() - start)
+
+
+def run_batch_analysis(file_paths, max_workers=ANALYSIS_CONFIG["max_workers"],
+                       batch_parse=ANALYSIS_CONFIG["batch_parse"]):
+    """
+    并发分析多个文件
+
+    参数:
+        file_paths: 文件路径列表
+        max_workers: 同时分析的最大文件数
+        batch_parse: 是否一次上传并解析所有文件，再逐个提问
+
+    返回:
+        包含每个文件结果和汇总信息的字典
+    """
+    start = time.monotonic()
+    results = []
+    if batch_parse:
+        logger.info(f"批量上传并解析 {len(file_paths)} 个文件")
+        try:
+            batch_results = ai_analysis_batch(file_paths, max_workers=max(1, max_workers), save_to_db=True)
+        except Exception as e:
+            batch_results = {
+                file_path: {"success": False, "answer": "", "error": str(e), "timings": {}}
+                for file_path in file_paths
+            }
+        for file_path, result in batch_results.items():
+            # 批量模式下各文件共享上传和解析阶段，总耗时取各阶段之和
+            total = sum(result.get("timings", {}).values())
+            results.append(_finalize_result(file_path, result, total))
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="analysis") as executor:
+            futures = [executor.submit(analyze_file, file_path) for file_path in file_paths]
+            for future in as_completed(futures):
+                results.append(future.result())
+
+    # 汇总各阶段耗时
+    stage_totals = {}
+    for result in results:
+        for stage, seconds in result["timings"].items():
+            stage_totals[stage] = round(stage_totals.get(stage, 0) + seconds, 3)
+
+    summary = {
+        "total": len(results),
+        "succeeded": sum(1 for r in results if r["success"]),
+        "failed": sum(1 for r in results if not r["success"]),
+        "skipped": sum(1 for r in results if r.get("skipped")),
+        "elapsed": round(time.monotonic() - start, 3),
+        "max_workers": max_workers,
+        "batch_parse": batch_parse,
+        "stage_totals": stage_totals,
+        "failures": {r["file_name"]: r["error"] for r in results if not r["success"]},
+    }
+    logger.info(f"批量分析完成: {summary}")
+    return {"results": results, "summary": summary}
+
+
+def enqueue_analysis(file_paths):
+    """把文件添加到分析任务队列，由 analytics/job_worker.py 的工作进程执行"""
+    jobs = {}
+    for file_path in file_paths:
+        try:
+            job = enqueue_job(file_path)
+            jobs[os.path.basename(file_path)] = {"job_id": job["id"], "created": job["created"]}
+        except Exception as e:
+            logger.error(f"添加分析任务失败: {os.path.basename(file_path)} {str(e)}")
+            jobs[os.path.basename(file_path)] = {"job_id": None, "error": str(e)}
+    logger.info(f"已添加 {sum(1 for j in jobs.values() if j.get('created'))} 个分析任务")
+    return {"jobs": jobs}
+
+
 def scheduled_analysis():
     logger.info("开始执行定时任务")
     remote_dir = UPLOAD_FOLDER
@@ -22,14 +119,15 @@ def scheduled_analysis():
             logger.warning("未找到Excel文件，请检查目录路径")
             return
         
-        for file_path in excel_files:
-            file_name = os.path.basename(file_path)
-            logger.info(f"分析文件: {file_name}")
-            
-            result = ai_analysis(file_path, save_to_db=True)
-            
-            if not result["success"]:
-                logger.error(f"分析失败: {result['error']}")
+        if ANALYSIS_CONFIG["use_job_queue"]:
+            return enqueue_analysis(excel_files)
+
+        report = run_batch_analysis(excel_files)
+        # 未变化而跳过分析的报告也预热，API服务重启后首次打开同样无需冷加载
+        skipped = [r["file_name"] for r in report["results"] if r.get("skipped")]
+        if skipped:
+            report["warmup"] = warm_report_cache(skipped)
+        return report
     except Exception as e:
         logger.error(f"定时任务执行失败: {str(e)}")
 
@@ -0,0 +1,281 @@
+import gzip
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+JSON_MIMETYPE = "application/json"
+
+# 列的序列化方式
+KIND_NATIVE = "native"      # 整数/布尔，直接输出
+KIND_FLOAT = "float"        # 浮点数，NaN输出为null
+KIND_DATETIME = "datetime"  # 时间，输出为字符串
+KIND_BASIC = "basic"        # object列，值都是str/int/float/bool，只需处理缺失值
+KIND_MIXED = "mixed"        # object列，含其他类型的值，需要转成字符串
+
+_BASIC_TYPES = (str, int, float, bool)
+
+
+def build_schema(df: pd.DataFrame) -> Dict[str, str]:
+    """
+    预先计算每列的序列化方式，同一份数据只需计算一次
+    """
+    schema = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+            schema[col] = KIND_NATIVE
+        elif pd.api.types.is_float_dtype(series):
+            schema[col] = KIND_FLOAT
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            schema[col] = KIND_DATETIME
+        else:
+            values = series.dropna()
+            is_basic = all(isinstance(v, _BASIC_TYPES) for v in values.unique()) if len(values) else True
+            schema[col] = KIND_BASIC if is_basic else KIND_MIXED
+    return schema
+
+
+def coerce_frame(df: pd.DataFrame, schema: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    按列处理缺失值和类型，得到可以直接JSON序列化的object列
+    """
+    schema = schema or build_schema(df)
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        kind = schema.get(col, KIND_MIXED)
+        if kind == KIND_NATIVE:
+            columns[col] = series
+            continue
+        mask = series.isna()
+        if kind == KIND_DATETIME:
+            series = series.astype(str)
+        elif kind == KIND_MIXED:
+            series = series.map(lambda v: v if isinstance(v, _BASIC_TYPES) else str(v))
+        columns[col] = series.astype(object).where(~mask, None)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def frame_to_records(df: pd.DataFrame, schema: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """将DataFrame转为可序列化的记录列表，缺失值为None"""
+    return coerce_frame(df, schema).to_dict(orient="records")
+
+
+def _default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def dumps(payload: Any) -> bytes:
+    """编码为JSON，优先使用orjson"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    """一次编码生成JSON响应，替代jsonify"""
+    return Response(dumps(payload), status=status, mimetype=JSON_MIMETYPE)
+
+
+def ndjson_line(payload: Any) -> bytes:
+    """编码为NDJSON中的一行，用于分段流式响应"""
+    return dumps(payload) + b"\n"
+
+
+# ---------------- 列式传输格式 ----------------
+
+FORMAT_RECORDS = "records"
+FORMAT_COLUMNAR = "columnar"
+FORMAT_ARROW = "arrow"
+
+COLUMNAR_MIMETYPE = "application/vnd.excel-analysis.columnar+json"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# 可以压缩的响应类型
+COMPRESSIBLE_MIMETYPES = {JSON_MIMETYPE, COLUMNAR_MIMETYPE, ARROW_MIMETYPE, NDJSON_MIMETYPE}
+# 小于该字节数的响应不压缩
+MIN_COMPRESS_SIZE = 1024
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+def negotiate_format(request) -> str:
+    """
+    根据format参数或Accept头选择数据格式，默认按行输出
+    """
+    fmt = (request.args.get("format") or "").lower()
+    if fmt in (FORMAT_RECORDS, FORMAT_COLUMNAR, FORMAT_ARROW):
+        # 未安装pyarrow时退回按行输出
+        return FORMAT_RECORDS if fmt == FORMAT_ARROW and pa is None else fmt
+    accept = request.accept_mimetypes
+    if pa is not None and accept.quality(ARROW_MIMETYPE) > accept.quality(JSON_MIMETYPE):
+        return FORMAT_ARROW
+    if accept.quality(COLUMNAR_MIMETYPE) > accept.quality(JSON_MIMETYPE):
+        return FORMAT_COLUMNAR
+    return FORMAT_RECORDS
+
+
+def frame_to_columnar(df: pd.DataFrame, schema: Optional[Dict[str, str]] = None,
+                      dictionary_columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    将DataFrame转为列式结构，列名只出现一次
+
+    低基数的字符串列（以及dictionary_columns指定的列）使用字典编码:
+    dictionaries[列名]为取值列表，columns[列名]为取值下标，缺失值为null
+
+    返回:
+        {"length": 行数, "columns": {列名: 值数组}, "dictionaries": {列名: 取值列表}}
+    """
+    coerced = coerce_frame(df, schema)
+    schema = schema or build_schema(df)
+    forced = set(dictionary_columns or [])
+    columns = {}
+    dictionaries = {}
+    for col in coerced.columns:
+        series = coerced[col]
+        kind = schema.get(col, KIND_MIXED)
+        if kind in (KIND_BASIC, KIND_MIXED, KIND_DATETIME) and len(series) and (
+            col in forced or series.nunique(dropna=True) * 2 <= len(series)
+        ):
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            dictionaries[str(col)] = list(uniques)
+            columns[str(col)] = [None if code < 0 else int(code) for code in codes]
+        else:
+            columns[str(col)] = series.tolist()
+    return {"length": len(coerced), "columns": columns, "dictionaries": dictionaries}
+
+
+def frame_to_arrow(df: pd.DataFrame, schema: Optional[Dict[str, str]] = None,
+                   metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    将DataFrame编码为Arrow IPC流，字符串列使用字典编码，附加信息放在schema元数据中
+    """
+    coerced = coerce_frame(df, schema)
+    schema = schema or build_schema(df)
+    arrays = []
+    names = []
+    for col in coerced.columns:
+        series = coerced[col]
+        kind = schema.get(col, KIND_MIXED)
+        if kind == KIND_BASIC:
+            # object列可能同时包含数字和字符串，无法统一类型时转为字符串
+            try:
+                array = pa.array(series.tolist())
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                array = pa.array([None if v is None else str(v) for v in series.tolist()])
+        elif kind == KIND_NATIVE:
+            array = pa.array(df[col].to_numpy())
+        else:
+            array = pa.array(series.tolist())
+        if pa.types.is_string(array.type):
+            array = array.dictionary_encode()
+        arrays.append(array)
+        names.append(str(col))
+    table_metadata = {b"meta": dumps(metadata)} if metadata else None
+    table = pa.Table.from_arrays(arrays, names=names, metadata=table_metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_frame(df: pd.DataFrame, fmt: str, schema: Optional[Dict[str, str]] = None,
+                 dictionary_columns: Optional[List[str]] = None):
+    """按协商的格式编码数据部分（Arrow格式由调用方单独处理）"""
+    if fmt == FORMAT_COLUMNAR:
+        return frame_to_columnar(df, schema, dictionary_columns)
+    return frame_to_records(df, schema)
+
+
+def format_response(payload: Dict[str, Any], fmt: str) -> Response:
+    """按格式生成JSON响应，列式格式使用单独的Content-Type"""
+    if fmt == FORMAT_COLUMNAR:
+        payload = {**payload, "format": FORMAT_COLUMNAR}
+        return Response(dumps(payload), mimetype=COLUMNAR_MIMETYPE)
+    return json_response(payload)
+
+
+def arrow_response(df: pd.DataFrame, schema: Optional[Dict[str, str]] = None,
+                   metadata: Optional[Dict[str, Any]] = None) -> Response:
+    """生成Arrow IPC流响应"""
+    return Response(frame_to_arrow(df, schema, metadata), mimetype=ARROW_MIMETYPE)
+
+
+# ---------------- 压缩与缓存协商 ----------------
+
+def request_etag(version: str, request, fmt: str) -> str:
+    """由报告版本、请求路径和参数、数据格式生成ETag，命中时无需重新序列化"""
+    raw = f"{version}|{request.full_path}|{fmt}".encode("utf-8")
+    return hashlib.md5(raw).hexdigest()
+
+
+def not_modified(request, etag: str) -> Optional[Response]:
+    """客户端缓存仍然有效时返回304响应"""
+    if request.if_none_match and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {item.split(";")[0].strip().lower() for item in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def finalize_response(response: Response, request) -> Response:
+    """
+    为数据响应补充ETag（未设置时按内容计算）、处理条件请求并按Accept-Encoding压缩
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES or "Content-Encoding" in response.headers):
+        return response
+
+    data = response.get_data()
+    etag, _ = response.get_etag()
+    if etag is None:
+        etag = hashlib.md5(data).hexdigest()
+        response.set_etag(etag, weak=True)
+    # 同一内容压缩与否ETag一致，因此使用弱ETag
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    response.vary.add("Accept-Encoding")
+    encoding = _choose_encoding(request.headers.get("Accept-Encoding", ""))
+    if encoding and len(data) >= MIN_COMPRESS_SIZE:
+        if encoding == "br":
+            compressed = brotli.compress(data, quality=5)
+        else:
+            compressed = gzip.compress(data, compresslevel=6)
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.report_cache import Range, frame_bytes
+from utils.snapshot import arrow_compatible
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    ARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for name in os.listdir(path):
+        try:
+            total += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass
+    return total
+
+
+class MappedSheets(dict):
+    """从共享缓存读取的sheets，mapped_ranges记录映射文件的内存区间"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mapped_ranges: List[Range] = []
+
+
+class SharedSheetCache:
+    """
+    多个进程共享的报告缓存：处理后的sheets以Arrow IPC文件保存在缓存目录中，
+    读取时通过内存映射加载，数值列直接引用映射的页面，多个进程共用操作系统的页缓存
+
+    目录结构: {cache_dir}/{报告名哈希}/{版本哈希}/{序号}.arrow + manifest.json
+    超出字节预算时按最近访问时间淘汰整个版本目录
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.put_failures = 0
+        self.last_error: Optional[str] = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _report_dir(self, report_name: str) -> str:
+        return os.path.join(self.cache_dir, _digest(report_name))
+
+    def _version_dir(self, report_name: str, version: str) -> str:
+        return os.path.join(self._report_dir(report_name), _digest(version))
+
+    def get(self, report_name: str, version: str) -> Optional[MappedSheets]:
+        """读取缓存的sheets，不存在或读取失败时返回None"""
+        path = self._version_dir(report_name, version)
+        try:
+            with open(os.path.join(path, MANIFEST_NAME), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            sheets = MappedSheets()
+            for item in manifest["sheets"]:
+                source = pa.memory_map(os.path.join(path, item["file"]), "r")
+                mapped = source.read_buffer()
+                sheets.mapped_ranges.append((mapped.address, mapped.address + mapped.size))
+                source.seek(0)
+                table = pa.ipc.open_file(source).read_all()
+                # split_blocks避免把同类型的列合并成一个新数组，数值列保持对映射内存的引用
+                sheets[item["name"]] = table.to_pandas(split_blocks=True)
+            # 更新访问时间，用于跨进程的LRU淘汰
+            os.utime(path)
+        except Exception as e:
+            logger.warning(f"读取共享缓存 {report_name} 失败: {str(e)}")
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return sheets
+
+    def put(self, report_name: str, version: str, sheets: Dict[str, pd.DataFrame]) -> bool:
+        """
+        写入sheets，先写入临时目录再整体改名，其他进程不会读到写了一半的数据
+        """
+        report_dir = self._report_dir(report_name)
+        final_dir = self._version_dir(report_name, version)
+        if os.path.exists(os.path.join(final_dir, MANIFEST_NAME)):
+            return True
+
+        tmp_dir = os.path.join(report_dir, f".tmp-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(tmp_dir)
+            entries = []
+            for index, (sheet_name, df) in enumerate(sheets.items()):
+                file_name = f"{index}.arrow"
+                table = pa.Table.from_pandas(arrow_compatible(df), preserve_index=True)
+                with pa.OSFile(os.path.join(tmp_dir, file_name), "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+                entries.append({"name": sheet_name, "file": file_name})
+
+            manifest = {"report_name": report_name, "version": version, "sheets": entries}
+            with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.rename(tmp_dir, final_dir)
+        except OSError as e:
+            # 其他进程已经写入了同一版本
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if os.path.exists(os.path.join(final_dir, MANIFEST_NAME)):
+                return True
+            self._record_failure(report_name, e)
+            return False
+        except Exception as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            self._record_failure(report_name, e)
+            return False
+
+        # 同一报告的旧版本不再需要
+        for name in os.listdir(report_dir):
+            path = os.path.join(report_dir, name)
+            if path != final_dir and not name.startswith(".tmp-"):
+                self._remove(path)
+        self.evict()
+        return True
+
+    def _record_failure(self, report_name: str, error: Exception):
+        logger.error(f"写入共享缓存 {report_name} 失败: {str(error)}")
+        with self._lock:
+            self.put_failures += 1
+            self.last_error = f"{report_name}: {str(error)}"
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """返回所有版本目录的 (访问时间, 字节数, 路径)"""
+        entries = []
+        for report in os.listdir(self.cache_dir):
+            report_dir = os.path.join(self.cache_dir, report)
+            if not os.path.isdir(report_dir):
+                continue
+            for name in os.listdir(report_dir):
+                path = os.path.join(report_dir, name)
+                if name.startswith(".tmp-") or not os.path.isdir(path):
+                    continue
+                try:
+                    entries.append((os.path.getmtime(path), _dir_size(path), path))
+                except OSError:
+                    continue
+        return entries
+
+    def _remove(self, path: str) -> bool:
+        try:
+            shutil.rmtree(path)
+            return True
+        except OSError as e:
+            # Windows下仍被其他进程映射的文件无法删除，下次再淘汰
+            logger.warning(f"删除共享缓存目录 {path} 失败: {str(e)}")
+            return False
+
+    def evict(self):
+        """总大小超出预算时，从最久未访问的版本开始删除"""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if self._remove(path):
+                    total -= size
+                    self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回共享缓存统计"""
+        entries = self._entries()
+        with self._lock:
+            return {
+                "cache_dir": self.cache_dir,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "put_failures": self.put_failures,
+                "last_error": self.last_error,
+                "oldest_access": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(min(entries)[0])) if entries else None,
+            }
+
+
+def private_bytes(sheets: Dict[str, pd.DataFrame]) -> int:
+    """
+    统计从共享缓存映射出的sheets在本进程私有的字节数
+
+    按列检查底层数组是否仍位于映射文件的内存区间内：直接引用映射页面的数值列
+    由各进程共用操作系统的页缓存，不计入；含空值的数值列在转换时会复制，
+    文本、category等其他列以及索引在每个进程中各有一份，都按实际占用计入
+    """
+    ranges = getattr(sheets, "mapped_ranges", [])
+    return sum(frame_bytes(df, ranges) for df in sheets.values())
+
+
+def create_shared_cache(cache_dir: Optional[str], max_bytes: int) -> Optional[SharedSheetCache]:
+    """未配置缓存目录或未安装pyarrow时不启用共享缓存"""
+    if not cache_dir:
+        return None
+    if not ARROW_AVAILABLE:
+        logger.warning("未安装pyarrow，不启用共享缓存")
+        return None
+    try:
+        return SharedSheetCache(cache_dir, max_bytes)
+    except OSError as e:
+        logger.warning(f"创建共享缓存目录 {cache_dir} 失败: {str(e)}")
+        return None
@@ -0,0 +1,145 @@
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from utils.report_metrics import detect_category_column
+
+logger = logging.getLogger(__name__)
+
+# 变化摘要中每个工作表最多列出的分类数
+MAX_LISTED_CATEGORIES = 10
+
+
+def row_hashes(df: pd.DataFrame) -> pd.Series:
+    """计算每一行内容的哈希，与行索引无关"""
+    return pd.util.hash_pandas_object(df, index=False)
+
+
+def sheet_fingerprint(df: pd.DataFrame) -> str:
+    """计算整个工作表（列名和全部行）的指纹，用于判断工作表是否变化"""
+    digest = hashlib.sha256()
+    digest.update("\x1f".join(str(col) for col in df.columns).encode("utf-8"))
+    if not df.empty:
+        digest.update(row_hashes(df).values.tobytes())
+    return digest.hexdigest()
+
+
+def diff_sheet(old: pd.DataFrame, new: pd.DataFrame, sheet_name: str) -> Dict[str, Any]:
+    """
+    按行哈希比较同一工作表的两个版本
+
+    有分类列时以分类值作为行键，分别统计新增、删除和数据变化的分类；
+    否则按行内容比较，只统计新增和删除的行数
+    """
+    if [str(col) for col in old.columns] != [str(col) for col in new.columns]:
+        return {"status": "changed", "columns_changed": True, "rows": len(new)}
+
+    old_hashes = row_hashes(old).values
+    new_hashes = row_hashes(new).values
+    category_col = detect_category_column(new, sheet_name)
+
+    if category_col is not None:
+        old_rows = pd.Series(old_hashes, index=old[category_col].astype(str).values)
+        new_rows = pd.Series(new_hashes, index=new[category_col].astype(str).values)
+        old_rows = old_rows[~old_rows.index.duplicated(keep="first")]
+        new_rows = new_rows[~new_rows.index.duplicated(keep="first")]
+        common = new_rows.index.intersection(old_rows.index)
+        return {
+            "status": "changed",
+            "columns_changed": False,
+            "rows": len(new),
+            "category_col": category_col,
+            "added": [str(key) for key in new_rows.index.difference(old_rows.index)],
+            "removed": [str(key) for key in old_rows.index.difference(new_rows.index)],
+            "modified": [str(key) for key in common if new_rows[key] != old_rows[key]],
+        }
+
+    old_counts = pd.Series(old_hashes).value_counts()
+    new_counts = pd.Series(new_hashes).value_counts()
+    delta = new_counts.sub(old_counts, fill_value=0)
+    return {
+        "status": "changed",
+        "columns_changed": False,
+        "rows": len(new),
+        "rows_added": int(delta[delta > 0].sum()),
+        "rows_removed": int(-delta[delta < 0].sum()),
+    }
+
+
+def diff_reports(previous: Dict[str, pd.DataFrame], sheets: Dict[str, pd.DataFrame],
+                 previous_fingerprints: Dict[str, str], fingerprints: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """
+    比较报告与上一版本快照的差异
+
+    参数:
+        previous: 上一版本中发生变化的工作表（未变化的工作表无需读取）
+        sheets: 当前版本的全部工作表
+        previous_fingerprints / fingerprints: 两个版本各工作表的指纹
+
+    返回:
+        工作表名到差异信息的字典，status为 added / removed / changed / unchanged
+    """
+    changes = {}
+    for sheet_name, df in sheets.items():
+        old_fingerprint = previous_fingerprints.get(sheet_name)
+        if old_fingerprint is None:
+            changes[sheet_name] = {"status": "added", "rows": len(df)}
+        elif old_fingerprint == fingerprints[sheet_name]:
+            changes[sheet_name] = {"status": "unchanged", "rows": len(df)}
+        elif sheet_name in previous:
+            try:
+                changes[sheet_name] = diff_sheet(previous[sheet_name], df, sheet_name)
+            except Exception as e:
+                logger.warning(f"比较工作表 {sheet_name} 失败: {str(e)}")
+                changes[sheet_name] = {"status": "changed", "rows": len(df)}
+        else:
+            changes[sheet_name] = {"status": "changed", "rows": len(df)}
+    for sheet_name in previous_fingerprints:
+        if sheet_name not in sheets:
+            changes[sheet_name] = {"status": "removed"}
+    return changes
+
+
+def _join_limited(values: List[str]) -> str:
+    listed = "、".join(values[:MAX_LISTED_CATEGORIES])
+    if len(values) > MAX_LISTED_CATEGORIES:
+        listed += f" 等{len(values)}个"
+    return listed
+
+
+def summarize_changes(changes: Optional[Dict[str, Dict[str, Any]]]) -> str:
+    """把差异信息整理为简短的文字摘要，供提问时使用；没有可比较的上一版本时返回空字符串"""
+    if not changes:
+        return ""
+
+    lines = []
+    unchanged = []
+    for sheet_name, change in changes.items():
+        status = change["status"]
+        if status == "unchanged":
+            unchanged.append(sheet_name)
+        elif status == "added":
+            lines.append(f"- 新增工作表「{sheet_name}」，共{change['rows']}行")
+        elif status == "removed":
+            lines.append(f"- 工作表「{sheet_name}」已删除")
+        elif change.get("columns_changed"):
+            lines.append(f"- 工作表「{sheet_name}」的列结构发生变化，共{change['rows']}行")
+        elif "modified" in change:
+            parts = []
+            if change["added"]:
+                parts.append(f"新增{change['category_col']}：{_join_limited(change['added'])}")
+            if change["removed"]:
+                parts.append(f"减少{change['category_col']}：{_join_limited(change['removed'])}")
+            if change["modified"]:
+                parts.append(f"数据变化的{change['category_col']}：{_join_limited(change['modified'])}")
+            lines.append(f"- 工作表「{sheet_name}」" + ("；".join(parts) if parts else "数据有变化"))
+        elif "rows_added" in change:
+            lines.append(f"- 工作表「{sheet_name}」新增{change['rows_added']}行，删除{change['rows_removed']}行")
+        else:
+            lines.append(f"- 工作表「{sheet_name}」数据有变化")
+
+    if unchanged:
+        lines.append(f"- 未变化的工作表：{'、'.join(unchanged)}")
+    return "\n".join(lines)
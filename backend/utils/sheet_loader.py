@@ -0,0 +1,160 @@
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from utils.report_metrics import BASE_PERIOD_SUFFIX, CATEGORY_COLUMNS, MOM_COLUMNS
+from utils.snapshot import arrow_compatible
+
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = None  # 使用pandas默认引擎(openpyxl)
+
+logger = logging.getLogger(__name__)
+
+PERIOD_COLUMN = "时间"
+CURRENT_PERIOD = "现期"
+BASE_PERIOD = "基期"
+
+# 取值很少的列使用category类型，每个取值只保存一份
+CATEGORICAL_COLUMNS = ["时间", "价格段", "是否动销", "季节", "资源分布"]
+
+# 读取时显式指定的类型：分类列按文本读取，不会因为个别单元格是数字而推断成混合类型；
+# 工作表中不存在的列会被忽略
+SHEET_DTYPES = {col: str for col in dict.fromkeys(CATEGORY_COLUMNS + CATEGORICAL_COLUMNS)}
+
+# 环比计算使用的数值列，无法转换的单元格（如"-"）按缺失值处理
+NUMERIC_COLUMNS = list(MOM_COLUMNS.values())
+
+
+def open_workbook(excel_file) -> pd.ExcelFile:
+    """打开工作簿，优先使用calamine引擎，当前pandas不支持时退回默认引擎"""
+    if EXCEL_ENGINE is not None:
+        try:
+            return pd.ExcelFile(excel_file, engine=EXCEL_ENGINE)
+        except (ValueError, ImportError) as e:
+            logger.warning(f"{EXCEL_ENGINE}引擎不可用，使用默认引擎: {str(e)}")
+            if hasattr(excel_file, "seek"):
+                excel_file.seek(0)
+    return pd.ExcelFile(excel_file)
+
+
+def prepare_sheet(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    填充缺失值并把低基数列转换为category类型
+
+    已知的数值列转换为float64，数值列的缺失值填0，文本列填空字符串，其他类型（如时间）保留缺失值；
+    文本列填0会让一列同时包含字符串和数字，无法写入Parquet/Arrow
+    """
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns and not pd.api.types.is_float_dtype(df[col].dtype):
+            df = df.assign(**{col: pd.to_numeric(df[col], errors="coerce").astype("float64")})
+    fills = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_numeric_dtype(dtype):
+            fills[col] = 0
+        elif dtype == object or pd.api.types.is_string_dtype(dtype):
+            fills[col] = ""
+    df = arrow_compatible(df.fillna(fills))
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def _take_rows(df: pd.DataFrame, positions) -> pd.DataFrame:
+    part = df.take(positions)
+    for col in part.select_dtypes("category").columns:
+        part[col] = part[col].cat.remove_unused_categories()
+    return part
+
+
+def split_sheet(sheet_name: str, df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    按时间列一次分组拆分现期和基期
+
+    返回:
+        {sheet_name: 现期数据, "{sheet_name}_基期": 基期数据}，没有时间列或没有现期数据时sheet_name对应整张表
+    """
+    result = {sheet_name: df}
+    if PERIOD_COLUMN not in df.columns:
+        return result
+
+    groups = df.groupby(PERIOD_COLUMN, observed=True, sort=False).indices
+    if CURRENT_PERIOD in groups:
+        result[sheet_name] = _take_rows(df, groups[CURRENT_PERIOD])
+    if BASE_PERIOD in groups:
+        result[f"{sheet_name}{BASE_PERIOD_SUFFIX}"] = _take_rows(df, groups[BASE_PERIOD])
+    return result
+
+
+class SheetLoader:
+    """
+    打开工作簿一次，按需解析单个工作表
+
+    示例:
+        with SheetLoader(excel_file) as loader:
+            sheets = loader.load("三级分类")
+    """
+
+    def __init__(self, excel_file):
+        self._xls = open_workbook(excel_file)
+        self.sheet_names: List[str] = list(self._xls.sheet_names)
+
+    def load(self, sheet_name: str) -> Dict[str, pd.DataFrame]:
+        """解析单个工作表，返回拆分后的现期/基期数据"""
+        return split_sheet(sheet_name, prepare_sheet(self._xls.parse(sheet_name, dtype=SHEET_DTYPES)))
+
+    def load_all(self, sheet_names: Optional[Iterable[str]] = None) -> Dict[str, pd.DataFrame]:
+        """解析多个工作表（默认全部），单个工作表失败时跳过"""
+        sheets = {}
+        for sheet_name in (self.sheet_names if sheet_names is None else sheet_names):
+            try:
+                sheets.update(self.load(sheet_name))
+                logger.info(f"成功加载工作表: {sheet_name}")
+            except Exception as e:
+                logger.error(f"加载工作表 {sheet_name} 失败: {str(e)}")
+        return sheets
+
+    def close(self):
+        self._xls.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def source_sheet_name(sheet_name: str) -> str:
+    """处理后的工作表名对应的原始工作表名，"{sheet_name}_基期"对应sheet_name"""
+    if sheet_name.endswith(BASE_PERIOD_SUFFIX):
+        return sheet_name[:-len(BASE_PERIOD_SUFFIX)]
+    return sheet_name
+
+
+def parse_excel_sheets(excel_file, sheet_names: Optional[Iterable[str]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    读取Excel的工作表，并按现期/基期拆分
+
+    参数:
+        excel_file: 文件路径或类文件对象
+        sheet_names: 只读取这些工作表，可以使用"{sheet_name}_基期"，默认读取全部
+
+    返回:
+        处理后的sheets字典，基期数据以"{sheet_name}_基期"作为键
+    """
+    with SheetLoader(excel_file) as loader:
+        logger.info(f"Excel文件中的工作表: {loader.sheet_names}")
+        if sheet_names is not None:
+            wanted = {source_sheet_name(name) for name in sheet_names}
+            sheet_names = [name for name in loader.sheet_names if name in wanted]
+        sheets = loader.load_all(sheet_names)
+
+    logger.info(f"成功加载所有工作表，共 {len(sheets)} 个工作表")
+    logger.info(f"工作表列表: {list(sheets.keys())}")
+    return sheets
+
@@ -0,0 +1,88 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class FlightBusy(Exception):
+    """同一键的等待者已达上限，调用方应提示稍后重试"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Call:
+    """一次进行中的加载，等待者共享它的结果或异常"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    合并同一键的并发调用：第一个调用者执行加载，其余调用者等待并共享结果，
+    加载完成后键即被移除，后续调用重新执行
+
+    每个键最多 max_waiters 个等待者，超出时立即抛出FlightBusy，
+    避免大量请求同时打开同一个冷报告时占满所有请求线程
+    """
+
+    def __init__(self, max_waiters: Optional[int] = None, retry_after: int = 5):
+        self.max_waiters = max_waiters
+        self.retry_after = retry_after
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+        self.rejected = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                if self.max_waiters is not None and call.waiters >= self.max_waiters:
+                    self.rejected += 1
+                    raise FlightBusy(f"等待同一加载的请求已达上限({self.max_waiters})", self.retry_after)
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            try:
+                call.done.wait()
+            finally:
+                with self._lock:
+                    call.waiters -= 1
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, Any]:
+        """返回合并统计"""
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "waiting": sum(call.waiters for call in self._calls.values()),
+                "executed": self.executed,
+                "shared": self.shared,
+                "rejected": self.rejected,
+                "max_waiters": self.max_waiters,
+            }
@@ -0,0 +1,328 @@
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from io import BytesIO
+from typing import Any, Dict, Iterable, Optional
+
+import pandas as pd
+
+from config.general_config import SNAPSHOT_CONFIG
+from utils.sheet_diff import diff_reports, sheet_fingerprint
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_SUFFIX = ".snapshot"
+MANIFEST_NAME = "manifest.json"
+# 每个报告系列最近两期的报告名，用于找到上一期快照
+SERIES_PREFIX = "_series/"
+
+# pandas.api.types.infer_dtype 中Arrow无法统一类型的结果
+_MIXED_TYPES = {"mixed", "mixed-integer"}
+
+# 快照写入统计，通过 /cache/stats 查看
+_stats_lock = threading.Lock()
+_write_stats = {"written": 0, "failed": 0, "last_error": None}
+
+
+def _to_text(value):
+    if isinstance(value, str) or pd.isna(value):
+        return value
+    return str(value)
+
+
+def arrow_compatible(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Arrow要求一列只有一种类型，把同时包含字符串和其他类型的object列、category列的取值统一为字符串，
+    缺失值保持不变，没有需要转换的列时返回原数据框
+    """
+    result = df
+    for position, col in enumerate(df.columns):
+        series = df.iloc[:, position]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            if pd.api.types.infer_dtype(series.cat.categories, skipna=True) not in _MIXED_TYPES:
+                continue
+            converted = series.astype(object).map(_to_text).astype("category")
+        elif series.dtype == object:
+            if pd.api.types.infer_dtype(series, skipna=True) not in _MIXED_TYPES:
+                continue
+            converted = series.map(_to_text)
+        else:
+            continue
+        if result is df:
+            result = df.copy()
+        result.isetitem(position, converted)
+    return result
+
+
+def _record_write(error: Optional[str] = None):
+    with _stats_lock:
+        if error is None:
+            _write_stats["written"] += 1
+        else:
+            _write_stats["failed"] += 1
+            _write_stats["last_error"] = error
+
+
+def snapshot_stats() -> Dict[str, Any]:
+    """返回快照写入的成功、失败次数和最近一次失败原因"""
+    with _stats_lock:
+        return dict(_write_stats)
+
+
+def snapshot_prefix(report_name: str) -> str:
+    """报告列式快照在MinIO中的目录，与原始文件放在一起"""
+    return f"{report_name}{SNAPSHOT_SUFFIX}/"
+
+
+def sheet_object_name(prefix: str, fingerprint: str) -> str:
+    """按内容指纹命名工作表对象，内容未变化的工作表在不同版本间共用同一个对象"""
+    return f"{prefix}{fingerprint[:32]}.parquet"
+
+
+def write_snapshot(minio_client, bucket: str, report_name: str,
+                   sheets: Dict[str, pd.DataFrame], source_version: str,
+                   fingerprints: Optional[Dict[str, str]] = None,
+                   previous: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    将处理后的sheets以Parquet格式写入MinIO，只上传与上一版本快照相比有变化的工作表
+
+    参数:
+        minio_client: Minio客户端
+        bucket: 存储桶
+        report_name: 报告名（原始xlsx对象名）
+        sheets: 处理后的sheets字典，包括"{sheet_name}_基期"
+        source_version: 原始xlsx的ETag，用于判断快照是否过期
+        fingerprints: 各工作表的内容指纹，未提供时现场计算
+        previous: 上一版本的快照清单，未提供时从MinIO读取
+
+    返回:
+        是否写入成功
+    """
+    if not PARQUET_AVAILABLE:
+        logger.warning("未安装pyarrow，跳过列式快照")
+        return False
+
+    prefix = snapshot_prefix(report_name)
+    try:
+        if fingerprints is None:
+            fingerprints = {sheet_name: sheet_fingerprint(df) for sheet_name, df in sheets.items()}
+        if previous is None:
+            previous = read_manifest(minio_client, bucket, report_name) or {}
+        previous_objects = {item.get("fingerprint"): item["object"] for item in previous.get("sheets", [])}
+
+        # 先全部序列化，任何一个sheet失败都不写入，避免产生残缺快照
+        entries = []
+        payloads = []
+        for sheet_name, df in sheets.items():
+            fingerprint = fingerprints[sheet_name]
+            object_name = previous_objects.get(fingerprint)
+            if object_name is None:
+                object_name = sheet_object_name(prefix, fingerprint)
+                buffer = BytesIO()
+                try:
+                    arrow_compatible(df).to_parquet(buffer, engine="pyarrow")
+                except Exception as e:
+                    raise ValueError(f"工作表 {sheet_name} 无法序列化为Parquet: {str(e)}") from e
+                payloads.append((object_name, buffer.getvalue()))
+            entries.append({"name": sheet_name, "object": object_name, "fingerprint": fingerprint})
+
+        for object_name, data in payloads:
+            minio_client.put_object(bucket, object_name, BytesIO(data), len(data),
+                                    content_type="application/vnd.apache.parquet")
+
+        # 清单最后写入，读取方以清单为准
+        manifest = {
+            "source_version": source_version,
+            "created_time": datetime.now().isoformat(timespec="seconds"),
+            "sheets": entries,
+        }
+        manifest_bytes = json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+        minio_client.put_object(bucket, f"{prefix}{MANIFEST_NAME}", BytesIO(manifest_bytes),
+                                len(manifest_bytes), content_type="application/json")
+        logger.info(f"已写入报告 {report_name} 的列式快照，共 {len(entries)} 个工作表，"
+                    f"其中 {len(payloads)} 个有变化")
+
+        # 删除新清单不再引用的旧对象
+        referenced = {entry["object"] for entry in entries}
+        for object_name in set(previous_objects.values()) - referenced:
+            try:
+                minio_client.remove_object(bucket, object_name)
+            except Exception as e:
+                logger.warning(f"删除过期快照对象 {object_name} 失败: {str(e)}")
+        _record_write()
+        return True
+    except Exception as e:
+        # 写入失败时每次冷加载都要重新解析xlsx，记录为错误并计入统计
+        logger.error(f"写入报告 {report_name} 的列式快照失败: {str(e)}")
+        _record_write(f"{report_name}: {str(e)}")
+        return False
+
+
+def series_key(report_name: str, pattern: Optional[str] = SNAPSHOT_CONFIG["series_pattern"]) -> str:
+    """
+    报告所属的系列名：去掉扩展名和文件名中的日期，
+    "周报_2024-05-12.xlsx"与"周报_2024-05-19.xlsx"得到同一个系列"周报"
+    """
+    stem = os.path.splitext(os.path.basename(report_name))[0]
+    key = re.sub(pattern, "", stem) if pattern else stem
+    key = key.strip(" _-.()（）[]【】")
+    return key or stem
+
+
+def _series_object(report_name: str) -> str:
+    return f"{SERIES_PREFIX}{series_key(report_name)}.json"
+
+
+def read_series(minio_client, bucket: str, report_name: str) -> Dict[str, Any]:
+    """读取报告所属系列的记录 {"latest": 最近一期报告名, "previous": 再上一期报告名}，不存在时返回空字典"""
+    try:
+        return json.loads(_get_object_bytes(minio_client, bucket, _series_object(report_name)))
+    except Exception:
+        return {}
+
+
+def previous_report_name(series: Dict[str, Any], report_name: str) -> str:
+    """
+    系列中的上一期报告名
+
+    同名重新上传时（最近一期就是该报告）与再上一期比较；
+    系列中没有其他报告时退回与同名报告的上一版本比较，每期使用相同文件名的系列也能得到差异
+    """
+    latest = series.get("latest")
+    if latest and latest != report_name:
+        return latest
+    return series.get("previous") or report_name
+
+
+def update_series(minio_client, bucket: str, report_name: str, series: Dict[str, Any]):
+    """把报告记为系列的最近一期"""
+    if series.get("latest") != report_name:
+        series = {"latest": report_name, "previous": series.get("latest")}
+    payload = {**series, "updated_time": datetime.now().isoformat(timespec="seconds")}
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    try:
+        minio_client.put_object(bucket, _series_object(report_name), BytesIO(data), len(data),
+                                content_type="application/json")
+    except Exception as e:
+        logger.warning(f"更新报告 {report_name} 的系列记录失败: {str(e)}")
+
+
+def read_manifest(minio_client, bucket: str, report_name: str) -> Optional[Dict[str, Any]]:
+    """读取报告的快照清单，不存在时返回None"""
+    try:
+        return json.loads(_get_object_bytes(minio_client, bucket, f"{snapshot_prefix(report_name)}{MANIFEST_NAME}"))
+    except Exception:
+        return None
+
+
+def read_manifest_sheets(minio_client, bucket: str, manifest: Dict[str, Any],
+                         names: Optional[Iterable[str]] = None) -> Dict[str, pd.DataFrame]:
+    """按清单读取快照中的工作表，names为None时读取全部"""
+    wanted = None if names is None else set(names)
+    sheets = {}
+    for item in manifest["sheets"]:
+        if wanted is None or item["name"] in wanted:
+            data = _get_object_bytes(minio_client, bucket, item["object"])
+            sheets[item["name"]] = pd.read_parquet(BytesIO(data), engine="pyarrow")
+    return sheets
+
+
+def read_snapshot(minio_client, bucket: str, report_name: str,
+                  source_version: str) -> Optional[Dict[str, pd.DataFrame]]:
+    """
+    读取报告的列式快照，快照不存在或与原始文件版本不一致时返回None
+    """
+    if not PARQUET_AVAILABLE:
+        return None
+
+    manifest = read_manifest(minio_client, bucket, report_name)
+    if manifest is None:
+        return None
+
+    if manifest.get("source_version") != source_version:
+        logger.info(f"报告 {report_name} 的列式快照已过期")
+        return None
+
+    try:
+        sheets = read_manifest_sheets(minio_client, bucket, manifest)
+        logger.info(f"从列式快照加载报告 {report_name}，共 {len(sheets)} 个工作表")
+        return sheets
+    except Exception as e:
+        logger.warning(f"读取报告 {report_name} 的列式快照失败: {str(e)}")
+        return None
+
+
+def _get_object_bytes(minio_client, bucket: str, object_name: str) -> bytes:
+    response = minio_client.get_object(bucket, object_name)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def materialize_report(minio_client, bucket: str, report_name: str,
+                       excel_file, source_version: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    解析Excel并写入列式快照，在上传报告时调用
+
+    与同一系列（见 series_key）上一期报告的快照逐个工作表比较指纹，
+    变化的工作表再按行哈希比较，得出新增、删除和数据变化的分类；
+    写入时只重新上传与同名报告上一版本相比有变化的工作表
+
+    参数:
+        excel_file: 本地文件路径或类文件对象
+        source_version: 上传后原始xlsx的ETag
+
+    返回:
+        各工作表相对上一版本的差异（见 sheet_diff.diff_reports），
+        没有可比较的上一版本或写入失败时返回None
+    """
+    from utils.sheet_loader import parse_excel_sheets
+
+    if not PARQUET_AVAILABLE:
+        logger.warning("未安装pyarrow，跳过列式快照")
+        return None
+
+    try:
+        sheets = parse_excel_sheets(excel_file)
+    except Exception as e:
+        logger.warning(f"解析报告 {report_name} 失败，跳过列式快照: {str(e)}")
+        return None
+
+    # 同名报告的上一版本，写入时复用其中未变化的对象
+    previous = read_manifest(minio_client, bucket, report_name) or {}
+    series = read_series(minio_client, bucket, report_name)
+    base_name = previous_report_name(series, report_name)
+    base = previous if base_name == report_name else (read_manifest(minio_client, bucket, base_name) or {})
+
+    fingerprints = {sheet_name: sheet_fingerprint(df) for sheet_name, df in sheets.items()}
+    base_fingerprints = {item["name"]: item["fingerprint"]
+                         for item in base.get("sheets", []) if item.get("fingerprint")}
+
+    changes = None
+    if base_fingerprints:
+        logger.info(f"报告 {report_name} 与上一期 {base_name} 比较")
+        # 只读取上一期中内容变化的工作表做行级比较
+        changed = [sheet_name for sheet_name, fingerprint in fingerprints.items()
+                   if base_fingerprints.get(sheet_name) not in (None, fingerprint)]
+        try:
+            base_sheets = read_manifest_sheets(minio_client, bucket, base, changed)
+        except Exception as e:
+            logger.warning(f"读取报告 {base_name} 的快照失败: {str(e)}")
+            base_sheets = {}
+        changes = diff_reports(base_sheets, sheets, base_fingerprints, fingerprints)
+
+    if not write_snapshot(minio_client, bucket, report_name, sheets, source_version, fingerprints, previous):
+        return None
+    update_series(minio_client, bucket, report_name, series)
+    return changes
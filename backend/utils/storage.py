@@ -0,0 +1,141 @@
+import logging
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from tempfile import SpooledTemporaryFile
+from typing import Any, Dict
+
+import certifi
+import urllib3
+from dotenv import load_dotenv
+from minio import Minio
+from minio.error import S3Error
+from urllib3.util import Retry, Timeout
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.general_config import MINIO_CONFIG
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT")
+MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY")
+MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY")
+MINIO_SECURE = os.getenv("MINIO_SECURE", "False").lower() == "true"
+
+_client = None
+_http_client = None
+_checked_buckets = set()
+_client_lock = threading.Lock()
+_bucket_lock = threading.Lock()
+
+
+def _build_http_client() -> urllib3.PoolManager:
+    """创建带连接池、超时和重试配置的urllib3 PoolManager"""
+    return urllib3.PoolManager(
+        num_pools=MINIO_CONFIG["num_pools"],
+        maxsize=MINIO_CONFIG["pool_maxsize"],
+        block=False,
+        timeout=Timeout(connect=MINIO_CONFIG["connect_timeout"], read=MINIO_CONFIG["read_timeout"]),
+        retries=Retry(
+            total=MINIO_CONFIG["retries"],
+            backoff_factor=MINIO_CONFIG["retry_backoff"],
+            status_forcelist=[500, 502, 503, 504],
+        ),
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+    )
+
+
+def get_minio_client() -> Minio:
+    """
+    获取进程内共享的MinIO客户端，所有请求复用同一个连接池
+    """
+    global _client, _http_client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _http_client = _build_http_client()
+                _client = Minio(
+                    MINIO_ENDPOINT,
+                    access_key=MINIO_ACCESS_KEY,
+                    secret_key=MINIO_SECRET_KEY,
+                    secure=MINIO_SECURE,
+                    http_client=_http_client,
+                )
+                logger.info(f"Minio客户端初始化成功，连接到: {MINIO_ENDPOINT}")
+    return _client
+
+
+def ensure_bucket(bucket: str):
+    """确保存储桶存在，每个进程对每个存储桶只检查一次，检查和创建不持有锁"""
+    if bucket in _checked_buckets:
+        return
+    client = get_minio_client()
+    if not client.bucket_exists(bucket):
+        try:
+            client.make_bucket(bucket)
+            logger.info(f"创建Minio存储桶: {bucket}")
+        except S3Error as e:
+            # 其他线程或进程已经创建了该存储桶
+            if e.code not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+                raise
+    with _bucket_lock:
+        _checked_buckets.add(bucket)
+
+
+def minio_pool_metrics() -> Dict[str, Any]:
+    """返回MinIO连接池的使用情况"""
+    if _http_client is None:
+        return {"pools": []}
+    pools = []
+    for key in list(_http_client.pools.keys()):
+        pool = _http_client.pools.get(key)
+        if pool is None:
+            continue
+        pools.append({
+            "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+            "maxsize": MINIO_CONFIG["pool_maxsize"],
+            "idle": pool.pool.qsize() if pool.pool is not None else 0,
+            "connections_created": pool.num_connections,
+            "requests": pool.num_requests,
+        })
+    return {"pools": pools}
+
+
+def upload_file(minio_client, bucket: str, object_name: str, file_path: str):
+    """
+    按分片流式上传本地文件，内存中最多保留一个分片(part_size)
+
+    返回:
+        MinIO上传结果，etag即上传后对象的版本
+    """
+    return minio_client.fput_object(bucket, object_name, file_path,
+                                    part_size=MINIO_CONFIG["part_size"], num_parallel_uploads=1)
+
+
+@contextmanager
+def open_object(minio_client, bucket: str, object_name: str):
+    """
+    分块下载MinIO对象到SpooledTemporaryFile，内存占用有上限，超出部分写入临时文件
+
+    示例:
+        with open_object(client, bucket, name) as f:
+            xls = pd.ExcelFile(f)
+    """
+    response = minio_client.get_object(bucket, object_name)
+    spooled = SpooledTemporaryFile(max_size=MINIO_CONFIG["spool_max_memory"])
+    try:
+        try:
+            for chunk in response.stream(MINIO_CONFIG["chunk_size"]):
+                spooled.write(chunk)
+        finally:
+            # 及时归还urllib3连接，避免连接池耗尽
+            response.close()
+            response.release_conn()
+        spooled.seek(0)
+        yield spooled
+    finally:
+        spooled.close()
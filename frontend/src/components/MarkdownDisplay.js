@@ -1,9 +1,54 @@
-import React from 'react';
-import { Card } from 'antd';
+import React, { useState, useEffect } from 'react';
+import { Card, Tag } from 'antd';
 import { marked } from 'marked';
 import './MarkdownDisplay.css';
 
-const MarkdownDisplay = ({ markdownContent }) => {
+// streamUrl: 报告正在生成时传入SSE地址，实时展示生成中的内容；结束后通过onStreamEnd返回完整内容
+const MarkdownDisplay = ({ markdownContent, streamUrl, onStreamEnd }) => {
+  const [liveContent, setLiveContent] = useState('');
+  const [streaming, setStreaming] = useState(false);
+
+  useEffect(() => {
+    if (!streamUrl) {
+      setStreaming(false);
+      return;
+    }
+
+    let content = '';
+    setLiveContent('');
+    setStreaming(true);
+    const source = new EventSource(streamUrl);
+
+    source.addEventListener('delta', (event) => {
+      content += JSON.parse(event.data).text;
+      setLiveContent(content);
+    });
+    source.addEventListener('reset', () => {
+      // 重试开始了新一轮生成，丢弃上一轮的内容
+      content = '';
+      setLiveContent('');
+    });
+    source.addEventListener('done', (event) => {
+      // 服务端结束后必须主动关闭，否则浏览器会自动重连
+      source.close();
+      setStreaming(false);
+      const { status, error } = JSON.parse(event.data);
+      if (status !== 'done') {
+        console.error('分析报告生成失败:', error);
+      }
+      if (onStreamEnd) onStreamEnd(content);
+    });
+    source.addEventListener('failed', (event) => {
+      source.close();
+      setStreaming(false);
+      console.error('获取分析报告进度失败:', JSON.parse(event.data).error);
+    });
+
+    return () => {
+      source.close();
+    };
+  }, [streamUrl]);
+
   // 设置marked选项
   marked.setOptions({
     breaks: true, // 启用换行符转换为<br>
@@ -11,7 +56,7 @@ const MarkdownDisplay = ({ markdownContent }) => {
   });
 
   // 如果没有内容，显示默认信息
-  const content = markdownContent || '暂无分析报告';
+  const content = (streamUrl ? liveContent : markdownContent) || (streaming ? '正在生成分析报告...' : '暂无分析报告');
   
   // 将markdown转换为HTML
   const createMarkup = () => {
@@ -19,7 +64,11 @@ const MarkdownDisplay = ({ markdownContent }) => {
   };
 
   return (
-    <Card title="数据分析报告" className="markdown-display">
+    <Card
+      title="数据分析报告"
+      className="markdown-display"
+      extra={streaming ? <Tag color="processing">生成中</Tag> : null}
+    >
       <div 
         className="markdown-content"
         dangerouslySetInnerHTML={createMarkup()} 
@@ -28,4 +77,4 @@ const MarkdownDisplay = ({ markdownContent }) => {
   );
 };
 
-export default MarkdownDisplay; 
\ No newline at end of file
+export default MarkdownDisplay;
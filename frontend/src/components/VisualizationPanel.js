@@ -1,15 +1,26 @@
 import React, { useState, useEffect } from 'react';
 import ReactECharts from 'echarts-for-react';
 import { Card, Spin, Tabs, Select, Empty, Row, Col, Statistic, Checkbox, Button, Space } from 'antd';
+import { getSheetData, fetchSheetCharts } from '../services/api';
 import './VisualizationPanel.css';
 
 const { TabPane } = Tabs;
 const { Option } = Select;
 
-const VisualizationPanel = ({ sheetsData, reportName }) => {
+const VisualizationPanel = ({ sheets, reportName, initialSheet }) => {
   const [activeSheet, setActiveSheet] = useState('');
+  // 详情页合并接口已返回的初始工作表
+  const seedSheetsData = () => (initialSheet && initialSheet.data ? { [initialSheet.sheet]: initialSheet.data } : {});
+  const seedChartsData = () => (initialSheet && initialSheet.charts ? { [initialSheet.sheet]: initialSheet.charts } : {});
+  const seedServerMetrics = () => (initialSheet && initialSheet.metrics ? { [initialSheet.sheet]: initialSheet.metrics } : {});
+  // 已加载的工作表数据，切换工作表时按需请求
+  const [sheetsData, setSheetsData] = useState(seedSheetsData);
+  // 服务端生成的图表配置，按工作表缓存
+  const [chartsData, setChartsData] = useState(seedChartsData);
   const [visualizations, setVisualizations] = useState([]);
   const [metrics, setMetrics] = useState({});
+  // 合并接口返回的服务端指标，按工作表缓存
+  const [serverMetrics, setServerMetrics] = useState(seedServerMetrics);
   const [loading, setLoading] = useState(false);
   const [selectedCategories, setSelectedCategories] = useState({});
   const [categoryOptions, setCategoryOptions] = useState({});
@@ -17,7 +28,7 @@ const VisualizationPanel = ({ sheetsData, reportName }) => {
 
   // 生成可视化
   useEffect(() => {
-    if (!sheetsData || !activeSheet || !sheetsData[activeSheet]) {
+    if (!activeSheet || !sheetsData[activeSheet] || !chartsData[activeSheet]) {
       setVisualizations([]);
       setMetrics({});
       setCategoryOptions({});
@@ -27,69 +38,16 @@ const VisualizationPanel = ({ sheetsData, reportName }) => {
 
     setLoading(true);
     try {
-      // 获取当前工作表数据
-      let sheetData = sheetsData[activeSheet];
+      // 获取当前工作表数据（环比已由服务端按基期计算好）
+      const sheetData = sheetsData[activeSheet];
       
-      const basePeriodSheetKey = `${activeSheet}_基期`;
-      if (sheetsData[basePeriodSheetKey]) {
-        const basePeriodSheet = sheetsData[basePeriodSheetKey];
-        const categoryColumn = getCategoryColumn(sheetData, activeSheet);
-        
-        if (categoryColumn) {
-          // 计算环比数据
-          sheetData = sheetData.map(currentItem => {
-            // 跳过"是"和"否"的处理
-            if (currentItem[categoryColumn] === '是' || currentItem[categoryColumn] === '否') {
-              return currentItem;
-            }
-            
-            // 查找对应的基期项目
-            const baseItem = basePeriodSheet.find(
-              baseRecord => baseRecord[categoryColumn] === currentItem[categoryColumn]
-            );
-            
-            // 如果找到匹配的基期数据，计算环比
-            if (baseItem) {
-              const result = { ...currentItem };
-              
-              // 计算货号环比
-              if (currentItem['上周货号数'] !== undefined && baseItem['上周货号数'] !== undefined && baseItem['上周货号数'] !== 0) {
-                result['货号环比'] = calculateMoM(currentItem['上周货号数'], baseItem['上周货号数']);
-              } 
-              
-              // 计算货值环比
-              if (currentItem['上周货值'] !== undefined && baseItem['上周货值'] !== undefined && baseItem['上周货值'] !== 0) {
-                result['货值环比'] = calculateMoM(currentItem['上周货值'], baseItem['上周货值']);
-              } 
-              
-              // 计算库存环比
-              if (currentItem['库存数'] !== undefined && baseItem['库存数'] !== undefined && baseItem['库存数'] !== 0) {
-                result['库存环比'] = calculateMoM(currentItem['库存数'], baseItem['库存数']);
-              }
-              
-              // 计算销售环比
-              if (currentItem['上周销售'] !== undefined && baseItem['上周销售'] !== undefined && baseItem['上周销售'] !== 0) {
-                result['销售环比'] = calculateMoM(currentItem['上周销售'], baseItem['上周销售']);
-              } 
-              
-              // 计算UV环比
-              if (currentItem['上周UV'] !== undefined && baseItem['上周UV'] !== undefined && baseItem['上周UV'] !== 0) {
-                result['UV环比'] = calculateMoM(currentItem['上周UV'], baseItem['上周UV']);
-              } 
-              return result;
-            }
-            
-            return currentItem;
-          });
-        }
-      }
-      
-      // 获取数据指标
-      const extractedMetrics = extractMetrics(sheetData);
-      setMetrics(extractedMetrics);
+      // 获取数据指标，优先使用服务端聚合好的结果
+      const sheetMetrics = serverMetrics[activeSheet];
+      setMetrics(sheetMetrics ? fromServerMetrics(sheetMetrics) : extractMetrics(sheetData));
       
-      // 获取分类列
-      const categoryColumn = getCategoryColumn(sheetData, activeSheet);
+      // 分类列由服务端识别
+      const sheetCharts = chartsData[activeSheet];
+      const categoryColumn = sheetCharts.category_col;
       
       // 获取分类列的唯一值
       if (categoryColumn) {
@@ -130,22 +88,76 @@ const VisualizationPanel = ({ sheetsData, reportName }) => {
         setSelectedCategories(newSelectedCategories);
       }
       
-      // 生成可视化选项
-      const generatedVisualizations = generateVisualizations(sheetData, activeSheet);
-      setVisualizations(generatedVisualizations);
+      // 使用服务端生成的环比图表配置
+      const momCharts = sheetCharts.charts.filter(chart => chart.chart_type === '环比');
+      setVisualizations(momCharts.map(chart => ({
+        title: `${chart.sub_type}环比分析`,
+        type: 'bar',
+        options: chart.options
+      })));
     } catch (error) {
       console.error('生成可视化出错:', error);
     } finally {
       setLoading(false);
     }
-  }, [sheetsData, activeSheet]);
+  }, [sheetsData, chartsData, serverMetrics, activeSheet]);
 
-  // 当sheets数据变化时，默认选择第一个sheet
+  // 当sheets列表变化时，默认选择第一个sheet
   useEffect(() => {
-    if (sheetsData && Object.keys(sheetsData).length > 0) {
-      setActiveSheet(Object.keys(sheetsData)[0]);
+    setSheetsData(seedSheetsData());
+    setChartsData(seedChartsData());
+    setServerMetrics(seedServerMetrics());
+    if (sheets && sheets.length > 0) {
+      setActiveSheet(initialSheet && sheets.includes(initialSheet.sheet) ? initialSheet.sheet : sheets[0]);
     }
-  }, [sheetsData]);
+  }, [sheets, reportName, initialSheet]);
+
+  // 只请求当前工作表的数据
+  useEffect(() => {
+    if (!activeSheet || sheetsData[activeSheet]) {
+      return;
+    }
+    let cancelled = false;
+    setLoading(true);
+    getSheetData(reportName, { sheet: activeSheet })
+      .then(response => {
+        if (!cancelled && response && response.success) {
+          setSheetsData(prev => ({ ...prev, [activeSheet]: response.data || [] }));
+        } else if (!cancelled) {
+          console.error('获取Sheet数据失败:', response?.error);
+        }
+      })
+      .catch(error => console.error('获取Sheet数据失败:', error))
+      .finally(() => {
+        if (!cancelled) setLoading(false);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [activeSheet, reportName]);
+
+  // 请求当前工作表的图表配置
+  useEffect(() => {
+    if (!activeSheet || chartsData[activeSheet]) {
+      return;
+    }
+    let cancelled = false;
+    fetchSheetCharts(activeSheet, reportName)
+      .then(response => {
+        if (!cancelled && response && response.success) {
+          setChartsData(prev => ({
+            ...prev,
+            [activeSheet]: { category_col: response.category_col, charts: response.charts || [] }
+          }));
+        } else if (!cancelled) {
+          console.error('获取图表配置失败:', response?.error);
+        }
+      })
+      .catch(error => console.error('获取图表配置失败:', error));
+    return () => {
+      cancelled = true;
+    };
+  }, [activeSheet, reportName]);
 
   // 处理图表实例保存
   const onChartReady = (chart, index) => {
@@ -212,6 +224,14 @@ const VisualizationPanel = ({ sheetsData, reportName }) => {
   }, [selectedCategories, activeSheet, chartInstances]);
 
   // 提取关键指标
+  // 服务端指标（货值、销售额已是万元）转换为面板使用的字段
+  const fromServerMetrics = (serverMetric) => ({
+    totalGoods: serverMetric.total_goods || 0,
+    totalValue: serverMetric.total_value || 0,
+    totalInventory: serverMetric.total_inventory || 0,
+    totalSales: serverMetric.total_sales || 0,
+  });
+
   const extractMetrics = (data) => {
     try {
       // 检查是否有总计行
@@ -270,400 +290,6 @@ const VisualizationPanel = ({ sheetsData, reportName }) => {
     }
   };
 
-  // 根据数据生成可视化
-  const generateVisualizations = (data, sheetName) => {
-    try {
-      if (!Array.isArray(data) || data.length === 0) {
-        return [];
-      }
-      
-      const visualizations = [];
-      
-      // 确定关键的分类列
-      const categoryColumn = getCategoryColumn(data, sheetName);
-      if (!categoryColumn) {
-        return [];
-      }
-      
-      // 获取分类列的唯一值
-      const categories = [...new Set(data.map(item => item[categoryColumn]))];
-      // 过滤掉非分类值和特定价格段
-      const filteredCategories = categories.filter(cat => {
-        // 基本过滤条件
-        if (cat === '是' || cat === '否' || cat === undefined || cat === null || cat === '') {
-          return false;
-        }
-        
-        // 对于"是否周新款"工作表，保留总计数据
-        if (cat === '总计' && sheetName !== '是否周新款') {
-          return false;
-        }
-        
-        // 对价格段和是否动销sheet进行特殊处理
-        if ((sheetName === '价格段' || sheetName === '是否动销') && 
-            (cat === '100-149' || cat === '150-199' || cat === '200-249' || cat === '250-299' || 
-             cat === '300-349' || cat === '350-399' || cat === '400-449' || 
-             cat === '450-499' || cat === '500-549' || cat === '550-599' || 
-             cat === '600以上')) {
-          return false;
-        }
-        
-        // 特别过滤"是否动销"工作表中的"-2146826246"字段
-        if (sheetName === '是否动销' && cat === '-2146826246') {
-          return false;
-        }
-        
-        return true;
-      });
-      
-      // 生成环比分析图表
-      // 货号环比
-      if (hasProductNumberData(data)) {
-        visualizations.push({
-          title: '货号环比分析',
-          type: 'bar',
-          options: generatePercentBarChartOptions(
-            data,
-            categoryColumn,
-            '货号环比',
-            `${sheetName}货号环比分析`,
-            filteredCategories
-          )
-        });
-      }
-      
-      // 货值环比
-      if (hasProductValueData(data)) {
-        visualizations.push({
-          title: '货值环比分析',
-          type: 'bar',
-          options: generatePercentBarChartOptions(
-            data,
-            categoryColumn,
-            '货值环比',
-            `${sheetName}货值环比分析`,
-            filteredCategories
-          )
-        });
-      }
-      
-      // 库存环比
-      if (hasStockData(data)) {
-        visualizations.push({
-          title: '库存环比分析',
-          type: 'bar',
-          options: generatePercentBarChartOptions(
-            data,
-            categoryColumn,
-            '库存环比',
-            `${sheetName}库存环比分析`,
-            filteredCategories
-          )
-        });
-      }
-      
-      // 销售环比
-      if (hasSaleData(data)) {
-        visualizations.push({
-          title: '销售环比分析',
-          type: 'bar',
-          options: generatePercentBarChartOptions(
-            data,
-            categoryColumn,
-            '销售环比',
-            `${sheetName}销售环比分析`,
-            filteredCategories
-          )
-        });
-      }
-      
-      // UV环比
-      if (hasUVsData(data)) {
-        visualizations.push({
-          title: 'UV环比分析',
-          type: 'bar',
-          options: generatePercentBarChartOptions(
-            data,
-            categoryColumn,
-            'UV环比',
-            `${sheetName}UV环比分析`,
-            filteredCategories
-          )
-        });
-      }
-      
-      return visualizations;
-    } catch (error) {
-      console.error('生成可视化出错:', error);
-      return [];
-    }
-  };
-
-  // 获取分类列
-  const getCategoryColumn = (data, sheetName) => {
-    if (!Array.isArray(data) || data.length === 0) return null;
-    
-    // 常见的分类列名
-    const possibleColumns = ['三级分类', '是否本季新款', '是否周新款', '是否动销', '价格段', '四级分类', '资源分布'];
-    // 根据sheet名称可能会有特定的分类列
-    if (sheetName === '货盘概况') {
-      // 不再特殊处理"是否动销"，使用其他可能的列
-      for (const col of possibleColumns) {
-        if (col !== '是否动销' && data[0].hasOwnProperty(col)) {
-          return col;
-        }
-      }
-    }
-    
-    // 检查这些列是否存在于数据中
-    for (const col of possibleColumns) {
-      if (data[0].hasOwnProperty(col)) {
-        return col;
-      }
-    }
-    
-    // 如果没有找到预设的分类列，返回第一个非数值列
-    const firstRow = data[0];
-    for (const key in firstRow) {
-      if (typeof firstRow[key] === 'string' && !key.includes('时间')) {
-        return key;
-      }
-    }
-    return null;
-  };
-
-  // 检查数据是否包含特定字段
-  const hasSalesData = (data) => {
-    return data.some(item => 
-      item.hasOwnProperty('上周销售')
-    );
-  };
-  
-  const hasGoodsData = (data) => {
-    return data.some(item => 
-      item.hasOwnProperty('上周货号数')
-    );
-  };
-  
-  const hasValueData = (data) => {
-    return data.some(item => 
-      item.hasOwnProperty('上周货值') 
-    );
-  };
-  
-  const hasInventoryData = (data) => {
-    return data.some(item => item.hasOwnProperty('库存数'));
-  };
-  
-  // 环比计算函数
-  const calculateMoM = (current, base) => {
-    if (base === 0) return 0;
-    return parseFloat(((current - base) / base * 100).toFixed(2));
-  };
-  
-  // 检查环比数据是否存在的
-  const hasProductNumberData = (data) => {
-    return data.some(item => 
-      item.hasOwnProperty('货号环比') || item.hasOwnProperty('环比')
-    );
-  };
-  
-  const hasProductValueData = (data) => {
-    return data.some(item => 
-      item.hasOwnProperty('货值环比') || 
-      (item.hasOwnProperty('环比') && hasValueData(data))
-    );
-  };
-  
-  const hasStockData = (data) => {
-    return data.some(item => 
-      item.hasOwnProperty('库存环比') || 
-      (item.hasOwnProperty('环比') && hasInventoryData(data))
-    );
-  };
-  
-  const hasSaleData = (data) => {
-    return data.some(item => 
-      item.hasOwnProperty('销售环比') || 
-      (item.hasOwnProperty('环比') && hasSalesData(data))
-    );
-  };
-
-  // 添加UV环比检查函数
-  const hasUVsData = (data) => {
-    return data.some(item => 
-      item.hasOwnProperty('UV环比') || 
-      (item.hasOwnProperty('环比') && hasUVData(data))
-    );
-  };
-
-  // 检查数据是否包含UV数据
-  const hasUVData = (data) => {
-    return data.some(item => 
-      item.hasOwnProperty('UV')
-    );
-  };
-
-  // 生成环比分析图表（百分比柱状图）
-  const generatePercentBarChartOptions = (data, categoryColumn, valueColumn, title, categories) => {
-    // 获取数据
-    const chartData = categories.map(category => {
-      // 跳过"是"和"否"分类，对于"是否周新款"工作表不跳过"总计"
-      if (category === '是' || category === '否' || (category === '总计' && title.indexOf('是否周新款') === -1)) {
-        return { name: category, value: 0, originalValue: 0, baseValue: 0 };
-      }
-      
-      const categoryData = data.filter(item => item[categoryColumn] === category);
-      let value = 0;
-      let valueType = '';
-      
-      // 确定数据类型
-      if (valueColumn === '货号环比') {
-        valueType = '货号数';
-      } else if (valueColumn === '货值环比') {
-        valueType = '货值';
-      } else if (valueColumn === '库存环比') {
-        valueType = '库存数';
-      } else if (valueColumn === '销售环比') {
-        valueType = '销售额';
-      } else if (valueColumn === 'UV环比') {
-        valueType = 'UV';
-      }
-      
-      // 尝试不同的环比列名
-      const possibleColumns = [valueColumn, '环比'];
-      
-      if (categoryData.length > 0) {
-        // 获取环比值
-        for (const item of categoryData) {
-          for (const col of possibleColumns) {
-            if (item.hasOwnProperty(col)) {
-              // 处理可能的字符串百分比格式（如"12.5%"）
-              let rawValue = item[col];
-              // console.log("百分比", rawValue, typeof rawValue)
-              if (typeof rawValue === 'string' && rawValue.includes('%')) {
-                rawValue = parseFloat(rawValue.replace('%', ''));
-              }
-              if (typeof rawValue === 'number') {
-                value = parseFloat(rawValue.toFixed(2));
-              } else {
-                value = 0;
-              }
-              break;
-            }
-          }
-          if (value !== 0) break;
-        }
-      }
-      return { name: category, value, valueType };
-    });
-    
-    // 过滤掉没有环比数据的项目和"是"/"否"分类
-    const filteredChartData = chartData.filter(item => 
-      item.value !== 0 && 
-      item.name !== '是' && 
-      item.name !== '否' && 
-      (item.name !== '总计' || title.indexOf('是否周新款') !== -1)
-    );
-    
-    // 排序数据（按绝对值从大到小）
-    filteredChartData.sort((a, b) => Math.abs(b.value) - Math.abs(a.value));
-    
-    // 处理后的类别和值
-    const xAxisData = filteredChartData.map(item => item.name);
-    const seriesData = filteredChartData.map(item => item.value);
-    
-    // 创建参考线
-    const markLine = {
-      silent: true,
-      lineStyle: {
-        color: '#333'
-      },
-      data: [{
-        yAxis: 0
-      }]
-    };
-    
-    // 生成ECharts配置
-    return {
-      title: {
-        text: title,
-        left: 'center'
-      },
-      tooltip: {
-        trigger: 'axis',
-        formatter: function(params) {
-          const param = params[0];
-          // 显示带正负号的百分比
-          const value = parseFloat(param.value).toFixed(2);
-          const valueStr = param.value >= 0 ? `+${value}%` : `${value}%`;
-          return `${param.name}: ${valueStr}`;
-        }
-      },
-      grid: {
-        left: '5%',
-        right: '5%',
-        bottom: '10%',
-        top: '15%',
-        containLabel: true
-      },
-      xAxis: {
-        type: 'category',
-        data: xAxisData,
-        axisLabel: {
-          interval: 0,
-          rotate: xAxisData.length > 8 ? 30 : 0,
-          textStyle: {
-            fontSize: 12
-          }
-        }
-      },
-      yAxis: {
-        type: 'value',
-        name: '环比百分比(%)',
-        axisLine: {
-          show: true
-        },
-        axisLabel: {
-          formatter: '{value}%'
-        }
-      },
-      series: [{
-        name: '环比百分比',
-        data: seriesData,
-        type: 'bar',
-        showBackground: true,
-        backgroundStyle: {
-          color: 'rgba(180, 180, 180, 0.2)'
-        },
-        label: {
-          show: true,
-          position: function(params) {
-            // 正值在顶部，负值在底部
-            return params.value >= 0 ? 'top' : 'bottom';
-          },
-          formatter: function(params) {
-            // 显示带正负号的百分比
-            const value = parseFloat(params.value).toFixed(2);
-            return params.value >= 0 ? `+${value}%` : `${value}%`;
-          },
-          textStyle: function(params) {
-            return {
-              color: params.value >= 0 ? '#3f8600' : '#cf1322'
-            };
-          }
-        },
-        itemStyle: {
-          color: function(params) {
-            // 正值使用绿色，负值使用红色
-            return params.data >= 0 ? '#91cc75' : '#ee6666';
-          }
-        },
-        markLine: markLine
-      }]
-    };
-  };
-
   // 渲染类别选择器
   const renderCategorySelector = () => {
     const options = categoryOptions[activeSheet] || [];
@@ -693,7 +319,7 @@ const VisualizationPanel = ({ sheetsData, reportName }) => {
   return (
     <div className="visualization-panel">
       <Card title="可视化分析面板">
-        {!sheetsData || Object.keys(sheetsData).length === 0 ? (
+        {!sheets || sheets.length === 0 ? (
           <Empty description="暂无数据" />
         ) : (
           <>
@@ -704,7 +330,7 @@ const VisualizationPanel = ({ sheetsData, reportName }) => {
                 onChange={setActiveSheet}
                 style={{ width: 300 }}
               >
-                {Object.keys(sheetsData).map(sheet => (
+                {sheets.map(sheet => (
                   <Option key={sheet} value={sheet}>{sheet}</Option>
                 ))}
               </Select>
@@ -12,69 +12,115 @@ import {
   Tabs 
 } from 'antd';
 import { HomeOutlined, FileExcelOutlined, BarChartOutlined, FileTextOutlined } from '@ant-design/icons';
-import { fetchExcelDetails, loadExcelData, getSheetData } from '../services/api';
+import { fetchReportBundle, getReportStreamUrl } from '../services/api';
 import VisualizationPanel from '../components/VisualizationPanel';
 import MarkdownDisplay from '../components/MarkdownDisplay';
 import './ExcelDetail.css';
 
 const { Title } = Typography;
 const { TabPane } = Tabs;
+// 报告解析繁忙时最多重新请求的次数
+const MAX_BUSY_RETRIES = 5;
 
 const ExcelDetail = () => {
   const { id } = useParams(); // Excel文件名或ID
-  const [excelData, setExcelData] = useState(null);
-  const [sheetsData, setSheetsData] = useState(null);
   const [description, setDescription] = useState('');
+  // 分析报告正在生成时实时展示
+  const [streaming, setStreaming] = useState(false);
   const [sheets, setSheets] = useState([]);
+  // 合并接口返回的初始工作表数据和图表
+  const [initialSheet, setInitialSheet] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [sheetsLoading, setSheetsLoading] = useState(true);
   const [error, setError] = useState(null);
   const [activeTab, setActiveTab] = useState('1');
   const decodedId = decodeURIComponent(id);
 
   useEffect(() => {
+    let cancelled = false;
+    let retryTimer = null;
+    let busyRetries = 0;
+
+    const handleSection = (section) => {
+      if (cancelled) return;
+      switch (section.section) {
+        case 'description':
+          // 分析内容最先返回，无需等待工作表解析
+          if (section.success) {
+            setDescription(section.description || '');
+            setStreaming(Boolean(section.streaming));
+          } else {
+            console.error('获取Excel分析描述失败:', section.error);
+            message.error('获取Excel分析描述失败');
+          }
+          setLoading(false);
+          break;
+        case 'sheets':
+          setSheets(section.sheets || []);
+          break;
+        case 'metrics':
+          // 服务端按分类聚合好的关键指标，可视化面板直接展示
+          setInitialSheet(prev => ({ ...prev, sheet: section.sheet, metrics: section.metrics || {} }));
+          break;
+        case 'charts':
+          setInitialSheet(prev => ({
+            ...prev,
+            sheet: section.sheet,
+            charts: { category_col: section.category_col, charts: section.charts || [] }
+          }));
+          break;
+        case 'sheet_data':
+          setInitialSheet(prev => ({ ...prev, sheet: section.sheet, data: section.data || [] }));
+          break;
+        case 'error':
+          // 报告仍在后台解析，按服务端提示的间隔重新请求
+          if (section.retry_after && busyRetries < MAX_BUSY_RETRIES) {
+            busyRetries += 1;
+            retryTimer = setTimeout(loadExcelDetails, section.retry_after * 1000);
+            break;
+          }
+          console.error('加载Excel数据失败:', section.error);
+          message.error('加载Excel数据失败');
+          break;
+        default:
+          break;
+      }
+    };
+
     const loadExcelDetails = async () => {
+      retryTimer = null;
       setLoading(true);
+      setSheetsLoading(true);
       setError(null);
+      setDescription('');
+      setStreaming(false);
+      setSheets([]);
+      setInitialSheet(null);
 
       try {
-        // 获取Excel分析描述
-        const descriptionResponse = await fetchExcelDetails(decodedId);
-        if (descriptionResponse && descriptionResponse.success) {
-          setDescription(descriptionResponse.description || '');
-        } else {
-          console.error('获取Excel分析描述失败:', descriptionResponse?.error);
-          message.error('获取Excel分析描述失败');
-        }
-
-        // 加载Excel数据
-        const dataResponse = await loadExcelData(decodedId);
-        if (dataResponse && dataResponse.success) {
-          setSheets(dataResponse.sheets || []);
-          setExcelData(dataResponse);
-        } else {
-          setError('加载Excel数据失败');
-          console.error('加载Excel数据失败:', dataResponse?.error);
-        }
-        
-        // 获取完整的sheet数据供可视化使用
-        const sheetsResponse = await getSheetData(decodedId);
-        if (sheetsResponse && sheetsResponse.success) {
-          setSheetsData(sheetsResponse.data || {});
-        } else {
-          console.error('获取Sheet数据失败:', sheetsResponse?.error);
-        }
+        await fetchReportBundle(decodedId, handleSection);
       } catch (error) {
         console.error('获取Excel详情出错:', error);
-        setError('获取Excel详情失败');
-        message.error('获取Excel详情失败');
+        if (!cancelled) {
+          setError('获取Excel详情失败');
+          message.error('获取Excel详情失败');
+        }
       } finally {
-        setLoading(false);
+        if (!cancelled) {
+          setLoading(false);
+          // 等待重试期间保持加载状态
+          setSheetsLoading(retryTimer !== null);
+        }
       }
     };
 
     if (decodedId) {
       loadExcelDetails();
     }
+    return () => {
+      cancelled = true;
+      clearTimeout(retryTimer);
+    };
   }, [decodedId]);
 
   const handleTabChange = (key) => {
@@ -136,7 +182,14 @@ const ExcelDetail = () => {
         >
           <Row gutter={[24, 24]}>
             <Col xs={24} lg={24}>
-              <MarkdownDisplay markdownContent={description} />
+              <MarkdownDisplay
+                markdownContent={description}
+                streamUrl={streaming ? getReportStreamUrl(decodedId) : null}
+                onStreamEnd={(content) => {
+                  setDescription(content);
+                  setStreaming(false);
+                }}
+              />
             </Col>
           </Row>
         </TabPane>
@@ -147,10 +200,15 @@ const ExcelDetail = () => {
         >
           <Row gutter={[24, 24]}>
             <Col xs={24}>
-              {sheetsData ? (
+              {sheetsLoading ? (
+                <div className="loading-container">
+                  <Spin size="large" tip="加载Excel数据..." />
+                </div>
+              ) : sheets.length > 0 ? (
                 <VisualizationPanel 
-                  sheetsData={sheetsData} 
+                  sheets={sheets} 
                   reportName={decodedId}
+                  initialSheet={initialSheet}
                 />
               ) : (
                 <div className="no-sheets">
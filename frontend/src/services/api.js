@@ -2,6 +2,22 @@ import axios from 'axios';
 
 const API_URL = 'http://192.168.10.155:5000';
 
+// 报告解析繁忙时服务端返回503和Retry-After，解析在后台继续，按提示的间隔重试
+const MAX_BUSY_RETRIES = 5;
+axios.interceptors.response.use(undefined, async (error) => {
+  const { config, response } = error;
+  if (!config || !response || response.status !== 503) {
+    return Promise.reject(error);
+  }
+  config.busyRetries = (config.busyRetries || 0) + 1;
+  if (config.busyRetries > MAX_BUSY_RETRIES) {
+    return Promise.reject(error);
+  }
+  const retryAfter = Number(response.headers['retry-after']) || 5;
+  await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+  return axios(config);
+});
+
 export const fetchExcelFiles = async () => {
   try {
     const response = await axios.get(`${API_URL}/get/report`);
@@ -32,9 +48,12 @@ export const loadExcelData = async (reportName) => {
   }
 };
 
-export const getSheetData = async (reportName) => {
+// options: { sheet, columns, categories, offset, limit }，不传sheet时返回全部工作表
+export const getSheetData = async (reportName, options = {}) => {
   try {
-    const response = await axios.get(`${API_URL}/get_sheet_data?report_name=${reportName}`);
+    const response = await axios.get(`${API_URL}/get_sheet_data`, {
+      params: { report_name: reportName, ...options }
+    });
     return response.data;
   } catch (error) {
     console.error('获取Sheet数据失败:', error);
@@ -60,4 +79,54 @@ export const fetchChartData = async (category, chartType, subType, reportName) =
     console.error('获取图表数据失败:', error);
     throw error;
   }
-}; 
\ No newline at end of file
+};
+
+// 获取工作表的全部图表配置（服务端生成并按报告版本缓存）
+export const fetchSheetCharts = async (category, reportName) => {
+  try {
+    const response = await axios.get(`${API_URL}/charts/${category}?report_name=${reportName}`);
+    return response.data;
+  } catch (error) {
+    console.error('获取图表配置失败:', error);
+    throw error;
+  }
+};
+
+// 详情页合并接口：按NDJSON分段读取，每收到一段调用一次onSection
+// 分段: description / sheets / metrics / charts / sheet_data / done / error
+// error段带retry_after时报告仍在后台解析，调用方可按该间隔重新请求
+export const fetchReportBundle = async (reportName, onSection, options = {}) => {
+  try {
+    const params = new URLSearchParams(options).toString();
+    const url = `${API_URL}/report/${encodeURIComponent(reportName)}/bundle${params ? `?${params}` : ''}`;
+    const response = await fetch(url);
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder('utf-8');
+    let buffer = '';
+    const emit = (line) => {
+      if (line.trim()) {
+        onSection(JSON.parse(line));
+      }
+    };
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      lines.forEach(emit);
+    }
+    emit(buffer + decoder.decode());
+  } catch (error) {
+    console.error('获取报告数据失败:', error);
+    throw error;
+  }
+};
+
+// 报告分析内容的实时生成进度（SSE）
+export const getReportStreamUrl = (reportName) => `${API_URL}/report/${encodeURIComponent(reportName)}/stream`;